@@ -0,0 +1,149 @@
+''' This file contains JSON HTTP API on the application server (app.server),
+so that other services can calculate mortgages without the dashboard:
+- /api/v1/first-installment - first installment,
+- /api/v1/summary - first & last installment, totals and APR (RRSO, %),
+- /api/v1/schedule - monthly schedule, /api/v1/schedule/yearly - yearly one,
+- /api/v1/rate-grid - installments for a grid of base rates & balances.
+A loan is given in the query string (GET) or as JSON object (POST); a batch
+of loans as JSON list (POST) - results are returned in the same order.
+Loan fields: amount, bank_rate & base_rate (in %, as in the dashboard),
+term (months), type ('fixed' / 'desc'), optional id and optional fees & insurance
+(PLN - one-off & monthly, included in the APR of the summary); rate grid also takes
+rate_min, rate_max, rate_step (in %) and rows (base_rate is not needed).
+With ?format=ndjson (or Accept: application/x-ndjson) results are streamed
+as NDJSON: one line per loan, for schedules one line per month.
+Calculations are the memoized functions of the dashboard callbacks, so
+the API and the dashboard share the same cache of results.
+Can be configured with environment variables:
+- MORTGAGE_API_MAX_BATCH: maximum number of loans in a request'''
+
+import json
+import math
+import os
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+import portfolio
+import schedule_engine as engine
+import schedule_store
+from data_calc_callbacks import calc_first_installment, calc_installments, calc_installments_yr, calc_wibor_effect
+
+API_MAX_BATCH = int(os.environ.get('MORTGAGE_API_MAX_BATCH', 1000))
+NDJSON = 'application/x-ndjson'
+# Schedule rows serialized at once when streaming
+STREAM_ROWS = 1000
+GRID_FIELDS = ["rate_min", "rate_max", "rate_step", "rows"]
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def init_api(server):
+    server.register_blueprint(api)
+
+
+@api.errorhandler(ValueError)
+def bad_request(error):
+    return jsonify({'error': str(error)}), 400
+
+
+def requested_loans(defaults=None, options=()):
+    ''' Returns list of loans (with optional numeric fields `options`) and whether it is a batch request '''
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if not isinstance(body, (dict, list)):
+            raise ValueError("Request body has to be JSON object (loan) or list of objects (batch)")
+    else:
+        body = request.args.to_dict()
+    batch = isinstance(body, list)
+    rows = body if batch else [body]
+    if len(rows) > API_MAX_BATCH:
+        raise ValueError(f"Batch of {len(rows)} loans exceeds the limit of {API_MAX_BATCH}")
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Every loan has to be JSON object")
+    loans = []
+    for number, row in enumerate(rows, 1):
+        loan = portfolio.parse_loan(dict(defaults or {}, **row), number)
+        try:
+            loan.update((field, None if row.get(field) in (None, '') else float(row[field])) for field in options)
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"Loan {number}: {error}") from None
+        if not all(math.isfinite(loan[field]) for field in options if loan[field] is not None):
+            raise ValueError(f"Loan {number}: {', '.join(options)} have to be finite")
+        loans.append(loan)
+    return loans, batch
+
+
+def schedule_args(loan):
+    # The same arguments as used by the dashboard callbacks (shared cache keys)
+    total_interest = (loan["bank_rate"] + loan["base_rate"]) / 100
+    first = calc_first_installment(loan["amount"], loan["term"], loan["type"], total_interest)
+    return first, loan["amount"], loan["term"], loan["type"], total_interest
+
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == NDJSON
+
+
+def respond(calculate, defaults=None, options=()):
+    ''' Response with calculate(loan) result (dictionary or data frame - schedule) for every requested loan.
+    All loans are validated before calculation - a stream is not broken by an invalid loan '''
+    loans, batch = requested_loans(defaults, options)
+    if wants_ndjson():
+        def lines():
+            for loan in loans:
+                result = calculate(loan)
+                if isinstance(result, dict):
+                    yield json.dumps(dict({"id": loan["id"]}, **result)) + "\n"
+                    continue
+                result.insert(0, "id", loan["id"])
+                for first in range(0, len(result), STREAM_ROWS):
+                    yield result.iloc[first:first + STREAM_ROWS].to_json(orient='records', lines=True).rstrip("\n") + "\n"
+        return Response(stream_with_context(lines()), mimetype=NDJSON)
+    results = []
+    for loan in loans:
+        result = calculate(loan)
+        if not isinstance(result, dict):
+            result = result.to_dict('split', index=False)
+        results.append(dict({"id": loan["id"]}, **result))
+    return jsonify(results if batch else results[0])
+
+
+@api.route('/first-installment', methods=['GET', 'POST'])
+def first_installment():
+    return respond(lambda loan: {"first_installment": schedule_args(loan)[0]})
+
+
+@api.route('/summary', methods=['GET', 'POST'])
+def summary():
+    def calculate(loan):
+        args = schedule_args(loan)
+        df = schedule_store.load(calc_installments(*args))
+        payments = df["Installment"].to_numpy() + loan["insurance"]
+        apr = engine.apr(loan["amount"], payments, loan["fees"], guess=(1 + args[-1] / 12) ** 12 - 1)
+        return {
+            "first_installment": args[0],
+            "last_installment": round(float(df["Installment"].iloc[-1]), 2),
+            "total_payment": round(float(df["Total Payment"].iloc[-1]), 2),
+            "total_interest": round(float(df["Total Interest"].iloc[-1]), 2),
+            "total_principal": round(float(df["Total Principal"].iloc[-1]), 2),
+            "apr": round(float(apr) * 100, 2),
+        }
+    return respond(calculate)
+
+
+@api.route('/schedule', methods=['GET', 'POST'])
+def schedule():
+    return respond(lambda loan: schedule_store.load(calc_installments(*schedule_args(loan))).round(2))
+
+
+@api.route('/schedule/yearly', methods=['GET', 'POST'])
+def schedule_yearly():
+    return respond(lambda loan: schedule_store.load(calc_installments_yr(*schedule_args(loan))).round(2))
+
+
+@api.route('/rate-grid', methods=['GET', 'POST'])
+def rate_grid():
+    def calculate(loan):
+        grid = [loan[field] for field in GRID_FIELDS]
+        return calc_wibor_effect(loan["amount"], loan["term"], loan["type"], loan["bank_rate"], *grid)
+    return respond(calculate, defaults={"base_rate": 0}, options=GRID_FIELDS)
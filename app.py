@@ -1,19 +1,26 @@
 ''' This file contains application main body '''
 
+import time
+STARTUP_BEGIN = time.perf_counter()
+
 import logging
 
 import dash
 
-from flask_caching import Cache
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template
 
 import app_layout
+import engine_kernels
+from app_cache import init_cache
+from app_coalesce import init_coalescing
+from app_metrics import init_metrics
+from api import init_api
 from data_calc_callbacks import data_callbacks
 from input_tab import input_callbacks
 from output_tab import output_callbacks
 from language_mod import lang_callbacks
-import mortgage as mD
+IMPORTS_DONE = time.perf_counter()
 
 # Start logging
 logging.basicConfig(level=logging.DEBUG)
@@ -21,10 +28,10 @@ logging.basicConfig(level=logging.DEBUG)
 # Set up APP
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY], title='Mortgage Calculator')
 server = app.server  # used by gunicorn in production mode
-cache = Cache(app.server, config={
-    'CACHE_TYPE': 'filesystem',
-    'CACHE_DIR': 'cache-directory'
-})
+init_cache(server)  # cache of calculation results (see app_cache.py for configuration)
+init_metrics(server)  # callback timing & /metrics endpoint (see app_metrics.py)
+init_coalescing(server)  # dropping of superseded callback requests (see app_coalesce.py)
+init_api(server)  # JSON HTTP API (see api.py)
 
 load_figure_template('FLATLY')
 
@@ -37,6 +44,11 @@ input_callbacks(app)
 output_callbacks(app)
 lang_callbacks(app)
 
+# Startup timing (per worker process) - pandas is loaded on first use
+logging.info("Startup: imports %.0f ms, application set up %.0f ms",
+             (IMPORTS_DONE - STARTUP_BEGIN) * 1000, (time.perf_counter() - IMPORTS_DONE) * 1000)
+logging.info("Schedule engine backend: %s (numba: %s)", engine_kernels.BACKEND, engine_kernels.NUMBA_VERSION or 'not installed')
+
 # Run app
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
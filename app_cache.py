@@ -0,0 +1,141 @@
+''' This file contains set up of the application cache (Flask-Caching)
+used to memoize heavy calculation callbacks, so that repeated
+scenarios cost a lookup instead of a recalculation.
+Cache can be configured with environment variables:
+- MORTGAGE_CACHE_TYPE: 'filesystem' (default, shared by all workers) or 'lru' (in-memory, per worker)
+- MORTGAGE_CACHE_DIR: directory used by the filesystem cache
+- MORTGAGE_CACHE_TIMEOUT: time to live of cached results (seconds)
+- MORTGAGE_CACHE_THRESHOLD: maximum number of cached results
+- MORTGAGE_ADMIN_TOKEN: if set, required (?token=...) to see cache statistics (/admin/cache)
+  or to clear the cache (DELETE /admin/cache)'''
+
+import functools
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from time import time
+
+from flask import current_app, jsonify, request, abort
+from flask_caching import Cache
+from flask_caching.backends.simplecache import SimpleCache
+
+CACHE_TYPES = {
+    'filesystem': 'filesystem',
+    'lru': 'app_cache.LRUCache',
+}
+
+CACHE_CONFIG = {
+    'CACHE_TYPE': CACHE_TYPES[os.environ.get('MORTGAGE_CACHE_TYPE', 'filesystem')],
+    'CACHE_DIR': os.environ.get('MORTGAGE_CACHE_DIR', 'cache-directory'),
+    'CACHE_DEFAULT_TIMEOUT': int(os.environ.get('MORTGAGE_CACHE_TIMEOUT', 3600)),
+    'CACHE_THRESHOLD': int(os.environ.get('MORTGAGE_CACHE_THRESHOLD', 1000)),
+}
+
+cache = Cache(config=CACHE_CONFIG)
+
+# Statistics are counted per worker process
+stats = {'hits': 0, 'misses': 0}
+
+
+class LRUCache(SimpleCache):
+    ''' In-memory cache evicting expired and then least recently used entries '''
+
+    def __init__(self, threshold=500, default_timeout=300, ignore_errors=False):
+        super().__init__(threshold, default_timeout, ignore_errors)
+        self._cache = OrderedDict()
+        # SimpleCache binds clear to its own dictionary (returning None) - replaced by the method below
+        del self.clear
+
+    def clear(self):
+        self._cache.clear()
+        return True
+
+    def _prune(self):
+        if len(self._cache) < self._threshold:
+            return
+        now = time()
+        for key in [key for key, (expires, _) in self._cache.items() if expires != 0 and expires <= now]:
+            del self._cache[key]
+        while len(self._cache) >= self._threshold:
+            self._cache.popitem(last=False)
+
+    def get(self, key):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        return super().get(key)
+
+
+def init_cache(server):
+    cache.init_app(server)
+    server.add_url_rule('/admin/cache', 'cache_stats', cache_stats_view, methods=['GET', 'DELETE'])
+
+
+def canonical(value):
+    # The same scenario has to give the same key, e.g. 300000 == 300000.0 == 3e5
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 10) + 0.0
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items())}
+    return value
+
+
+def make_key(name, args):
+    payload = json.dumps([name, canonical(list(args))], separators=(',', ':'))
+    return 'mortgage:' + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def cache_ready():
+    # Cache is available only within the Flask application (not e.g. in scripts)
+    return bool(current_app) and cache in current_app.extensions.get('cache', {})
+
+
+def memoize(func):
+    # Memoize function result on canonicalized positional arguments.
+    # Outside of the Flask application the function is just called.
+    @functools.wraps(func)
+    def wrapper(*args):
+        if not cache_ready():
+            return func(*args)
+        key = make_key(func.__name__, args)
+        result = cache.get(key)
+        if result is not None:
+            stats['hits'] += 1
+            return result
+        stats['misses'] += 1
+        result = func(*args)
+        cache.set(key, result)
+        return result
+    return wrapper
+
+
+def cache_size():
+    backend = cache.cache
+    if hasattr(backend, '_list_dir'):
+        return len(backend._list_dir())
+    return len(getattr(backend, '_cache', ()))
+
+
+def cache_stats_view():
+    token = os.environ.get('MORTGAGE_ADMIN_TOKEN')
+    if token and request.args.get('token') != token:
+        abort(403)
+    if request.method == 'DELETE':
+        # backends report whether the cache was cleared (e.g. a file could not be removed)
+        return jsonify({'cleared': bool(cache.clear())})
+    lookups = stats['hits'] + stats['misses']
+    return jsonify({
+        'type': CACHE_CONFIG['CACHE_TYPE'],
+        'timeout': CACHE_CONFIG['CACHE_DEFAULT_TIMEOUT'],
+        'threshold': CACHE_CONFIG['CACHE_THRESHOLD'],
+        'size': cache_size(),
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+        'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else None,
+    })
@@ -0,0 +1,118 @@
+''' This file contains coalescing of callback requests: while the user
+drags a slider or types, the browser sends requests for values that are
+already outdated. Every request of a browser tab carries the tab id and
+a counter increased by the tab with every request (X-Mortgage-Tab header:
+'<tab>.<counter>', see assets/inputs.js), so the order of requests does not
+depend on the order they reach the server. Requests of the same callback
+outputs (ids of components matched by pattern-matching callbacks included)
+from the same tab are calculated one at a time: a request is dropped if
+a request with a higher counter has been seen - when it arrives, while it
+waits for its turn or when its result is ready. Dropped requests get '204 No Content'
+(no update, as PreventUpdate). Requests are coalesced per worker process -
+use threads (e.g. gunicorn --threads 4), so that requests of a tab can be
+seen by the process while one is calculated.
+Can be configured with environment variables:
+- MORTGAGE_COALESCE_CALLBACKS: '1' (default) or '0' - every request is calculated'''
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+COALESCE_CALLBACKS = os.environ.get('MORTGAGE_COALESCE_CALLBACKS', '1') == '1'
+
+CALLBACK_PATH = '_dash-update-component'
+TAB_HEADER = 'X-Mortgage-Tab'
+
+HEADER_PATTERN = re.compile(r'([0-9a-z]{1,64})\.([0-9]{1,15})')
+# Number of (tab, outputs) keys whose highest counter is remembered
+MAX_KEYS = 10000
+
+# (tab, callback outputs) -> highest counter seen (the MAX_KEYS most recently used keys)
+latest = OrderedDict()
+# (tab, callback outputs) -> {'running': bool, 'requests': requests in progress}
+pending = {}
+condition = threading.Condition()
+# Dropped requests per callback id (per worker process)
+dropped = {}
+
+
+def init_coalescing(server):
+    if not COALESCE_CALLBACKS:
+        return
+    server.before_request(wait_for_turn)
+    server.after_request(drop_superseded)
+    server.teardown_request(finish)
+
+
+def no_update(callback_id):
+    dropped[callback_id] = dropped.get(callback_id, 0) + 1
+    return Response(status=204)
+
+
+def callback_request():
+    ''' Returns (tab, outputs) key, counter and callback id of a callback request, None for other requests '''
+    match = HEADER_PATTERN.fullmatch(request.headers.get(TAB_HEADER, ''))
+    if match is None or not request.path.endswith(CALLBACK_PATH):
+        return None
+    body = request.get_json(silent=True) or {}
+    # concrete outputs - the callback id ('output') is the same for all components matched by a pattern
+    outputs = json.dumps(body.get('outputs'), sort_keys=True)
+    return (match.group(1), outputs), int(match.group(2)), body.get('output', 'unknown')
+
+
+def superseded(key, counter):
+    return latest.get(key, 0) > counter
+
+
+def wait_for_turn():
+    coalesce = callback_request()
+    if coalesce is None:
+        return None
+    key, counter, callback_id = coalesce
+    with condition:
+        if superseded(key, counter):
+            return no_update(callback_id)
+        latest[key] = counter
+        latest.move_to_end(key)
+        while len(latest) > MAX_KEYS:
+            latest.popitem(last=False)
+        state = pending.setdefault(key, {'running': False, 'requests': 0})
+        state['requests'] += 1
+        g.coalesce = coalesce
+        condition.notify_all()
+        while state['running'] and not superseded(key, counter):
+            condition.wait()
+        if superseded(key, counter):
+            return no_update(callback_id)
+        state['running'] = True
+        g.coalesce_running = True
+    return None
+
+
+def drop_superseded(response):
+    if not g.get('coalesce_running') or response.status_code != 200:
+        return response
+    key, counter, callback_id = g.coalesce
+    with condition:
+        if superseded(key, counter):
+            return no_update(callback_id)
+    return response
+
+
+def finish(error=None):
+    coalesce = g.pop('coalesce', None)
+    if coalesce is None:
+        return
+    key = coalesce[0]
+    with condition:
+        state = pending[key]
+        if g.pop('coalesce_running', False):
+            state['running'] = False
+        state['requests'] -= 1
+        if not state['requests']:
+            del pending[key]
+        condition.notify_all()
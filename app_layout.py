@@ -8,27 +8,33 @@ used for INPUT tab definition.'''
 from dash import dcc, html
 
 import dash_bootstrap_components as dbc
-from mortgage import mortgageData as mD
+from translations import translation_table
 
 # Import layout components
 import input_tab as itab
 import output_tab as otab
 
-# Initial Data:
-mortgage = mD(.02, .075, 300000, 360, 'fixed')
-
 # LAYOUT
 layout = html.Div(className='app-body', children=[
     # Stores - storing data used for visualization creation
-    dcc.Store(id='total_interest', data=mortgage.totalInterestRate),
-    dcc.Store(id='first_installment'),
-    dcc.Store(id='installments_df'),
-    dcc.Store(id='installments_df_yr'),
-    dcc.Store(id='installments_df_sel'),
+    dcc.Store(id='schedule_periods'),
     dcc.Store(id='installments_df_sel_amort'),
-    dcc.Store(id='table_mo_def'),
-    dcc.Store(id='table_yr_def'),
     dcc.Store(id='wibor_eff_store'),
+    dcc.Store(id='wibor_stress_store'),
+    dcc.Store(id='offers_store'),
+    dcc.Store(id='solver_store'),
+    # Figures & tables before translation (see language_mod.py) and the translation table
+    dcc.Store(id='pie_plot_split_store'),
+    dcc.Store(id='monthly_install_chart_store'),
+    dcc.Store(id='amort_table_store'),
+    dcc.Store(id='wibor_effect_chart_store'),
+    dcc.Store(id='wibor_stress_chart_store'),
+    dcc.Store(id='wibor_stress_summary_store'),
+    dcc.Store(id='offers_summary_store'),
+    dcc.Store(id='solver_chart_store'),
+    dcc.Store(id='solver_result_store'),
+    dcc.Store(id='translations', data=translation_table()),
+    dcc.Store(id='figure_templates', data=otab.figure_templates()),
     # About the app
     ##HEADER
     html.Div([
@@ -0,0 +1,126 @@
+''' This file contains instrumentation of Dash callbacks: every
+callback request (/_dash-update-component) is timed on the Flask server
+and recorded per callback id (its outputs, e.g. 'installments_df.data'):
+number of calls, errors, wall time (histogram), bytes of serialized inputs
+and outputs. Metrics (with the schedule engine backend - see engine_kernels)
+are exposed in Prometheus text format at /metrics (counted per worker
+process, like cache statistics).
+Can be configured with environment variables:
+- MORTGAGE_SLOW_CALLBACK_MS: if set, callbacks slower than that are logged
+- MORTGAGE_ADMIN_TOKEN: if set, required (?token=...) to see the metrics'''
+
+import logging
+import os
+import threading
+from time import perf_counter
+
+from flask import Response, abort, g, request
+
+import app_coalesce
+import engine_kernels
+from app_cache import CACHE_CONFIG, cache_size, stats as cache_stats
+
+SLOW_CALLBACK_MS = float(os.environ['MORTGAGE_SLOW_CALLBACK_MS']) if os.environ.get('MORTGAGE_SLOW_CALLBACK_MS') else None
+
+CALLBACK_PATH = '_dash-update-component'
+# Upper bounds (s) of the callback duration histogram
+DURATION_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# Maximum number of recorded callback ids (ids come from requests) - further ones are counted as 'other'
+MAX_CALLBACK_IDS = 100
+
+# callback id -> {'calls', 'errors', 'seconds', 'input_bytes', 'output_bytes', 'buckets'}
+callbacks = {}
+lock = threading.Lock()
+
+
+def init_metrics(server):
+    server.before_request(start_timer)
+    server.after_request(record_callback)
+    server.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def start_timer():
+    if request.path.endswith(CALLBACK_PATH):
+        g.callback_start = perf_counter()
+
+
+def record_callback(response):
+    start = g.pop('callback_start', None)
+    if start is None:
+        return response
+    duration = perf_counter() - start
+    body = request.get_json(silent=True) or {}
+    callback_id = body.get('output', 'unknown')
+    input_bytes = request.content_length or 0
+    output_bytes = response.calculate_content_length() or 0
+    with lock:
+        if callback_id not in callbacks and len(callbacks) >= MAX_CALLBACK_IDS:
+            callback_id = 'other'
+        metrics = callbacks.get(callback_id)
+        if metrics is None:
+            metrics = callbacks[callback_id] = {'calls': 0, 'errors': 0, 'seconds': 0., 'input_bytes': 0,
+                                                'output_bytes': 0, 'buckets': [0] * len(DURATION_BUCKETS)}
+        metrics['calls'] += 1
+        metrics['errors'] += response.status_code >= 400
+        metrics['seconds'] += duration
+        metrics['input_bytes'] += input_bytes
+        metrics['output_bytes'] += output_bytes
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                metrics['buckets'][i] += 1
+                break
+    if SLOW_CALLBACK_MS is not None and duration * 1000 > SLOW_CALLBACK_MS:
+        logging.warning("Slow callback %s: %.0f ms (input %d B, output %d B, status %d)",
+                        callback_id, duration * 1000, input_bytes, output_bytes, response.status_code)
+    return response
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metrics_text():
+    ''' Returns metrics in Prometheus text exposition format '''
+    lines = []
+    def metric(name, kind, help_text, samples):
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+    with lock:
+        snapshot = {callback_id: dict(metrics, buckets=list(metrics['buckets'])) for callback_id, metrics in callbacks.items()}
+    ids = sorted(snapshot)
+    metric("mortgage_callback_calls_total", "counter", "Number of callback calls",
+           [(f'{{callback="{label(i)}"}}', snapshot[i]['calls']) for i in ids])
+    metric("mortgage_callback_errors_total", "counter", "Number of failed callback calls (HTTP status >= 400)",
+           [(f'{{callback="{label(i)}"}}', snapshot[i]['errors']) for i in ids])
+    duration = []
+    for i in ids:
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, snapshot[i]['buckets']):
+            cumulative += count
+            duration.append((f'_bucket{{callback="{label(i)}",le="{bound}"}}', cumulative))
+        duration.append((f'_bucket{{callback="{label(i)}",le="+Inf"}}', snapshot[i]['calls']))
+        duration.append((f'_sum{{callback="{label(i)}"}}', round(snapshot[i]['seconds'], 6)))
+        duration.append((f'_count{{callback="{label(i)}"}}', snapshot[i]['calls']))
+    metric("mortgage_callback_duration_seconds", "histogram", "Wall time of callback requests", duration)
+    metric("mortgage_callback_input_bytes_total", "counter", "Bytes of serialized callback inputs (request body)",
+           [(f'{{callback="{label(i)}"}}', snapshot[i]['input_bytes']) for i in ids])
+    metric("mortgage_callback_output_bytes_total", "counter", "Bytes of serialized callback outputs (response body)",
+           [(f'{{callback="{label(i)}"}}', snapshot[i]['output_bytes']) for i in ids])
+    with app_coalesce.condition:
+        dropped = sorted(app_coalesce.dropped.items())
+    metric("mortgage_callback_dropped_total", "counter", "Callback requests dropped as superseded by newer ones (see app_coalesce)",
+           [(f'{{callback="{label(i)}"}}', count) for i, count in dropped])
+    metric("mortgage_cache_hits_total", "counter", "Calculation cache hits", [("", cache_stats['hits'])])
+    metric("mortgage_cache_misses_total", "counter", "Calculation cache misses", [("", cache_stats['misses'])])
+    metric("mortgage_cache_size", "gauge", f"Number of cached results ({CACHE_CONFIG['CACHE_TYPE']} cache)", [("", cache_size())])
+    engine = engine_kernels.backend_info()
+    metric("mortgage_engine_backend_info", "gauge", "Schedule engine backend (numba: version or 'none')",
+           [(f'{{backend="{label(engine["backend"])}",numba="{label(engine["numba"] or "none")}"}}', 1)])
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view():
+    token = os.environ.get('MORTGAGE_ADMIN_TOKEN')
+    if token and request.args.get('token') != token:
+        abort(403)
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,79 @@
+/* Pie, scatter & offers charts put together in the browser: static templates (figure_templates store)
+   filled with values sent by the server and translated (see i18n.js & output_tab.py).
+   Also the stress test summary table built from its header & rows and the monthly / yearly view
+   of the schedule picked from results of both periods (schedule_periods store) */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figures: {
+        pie: function(data, lang, table, templates) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            var figure = window.dash_clientside.i18n.translate(templates.pie, lang, table);
+            figure.data[0].values = data.values;
+            figure.layout.template = templates.theme;
+            return figure;
+        },
+        scatter: function(data, lang, table, templates) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            var figure = window.dash_clientside.i18n.translate(templates.scatter[data.period], lang, table);
+            figure.data.forEach(function(trace, i) {
+                trace.x = data.x;
+                trace.y = data.y[i];
+            });
+            figure.layout.template = templates.theme;
+            return figure;
+        },
+        offers: function(data, lang, table, templates) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            var figure = window.dash_clientside.i18n.translate(templates.offers, lang, table);
+            figure.data = data.names.map(function(name, i) {
+                return Object.assign({}, figure.trace, {x: data.x, y: data.cost[i], name: name});
+            });
+            delete figure.trace;
+            figure.layout.template = templates.theme;
+            return figure;
+        },
+        summary: function(data, lang, table) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            data = window.dash_clientside.i18n.translate(data, lang, table);
+            var component = function(type, children, props, namespace) {
+                return {type: type, namespace: namespace || 'dash_html_components',
+                        props: Object.assign({children: children}, props)};
+            };
+            var money = function(value) {
+                return value.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2}) + ' zł';
+            };
+            var header = component('Thead', component('Tr', data.header.map(function(text) {
+                return component('Th', text);
+            })));
+            var body = component('Tbody', data.rows.map(function(row) {
+                return component('Tr', [component('Td', row[0])].concat(row.slice(1).map(function(value) {
+                    return component('Td', money(value));
+                })));
+            }));
+            return component('Table', [header, body], {striped: true, bordered: true, hover: true, size: 'sm'},
+                             'dash_bootstrap_components');
+        }
+    },
+    schedule: {
+        chart: function(schedule, period) {
+            if (!schedule) {
+                return window.dash_clientside.no_update;
+            }
+            var data = schedule[period === 1 ? 'monthly' : 'yearly'];
+            return {period: period, x: data.x, y: data.y};
+        },
+        table: function(schedule, period) {
+            if (!schedule) {
+                return window.dash_clientside.no_update;
+            }
+            return schedule[period === 1 ? 'monthly' : 'yearly'].store;
+        }
+    }
+});
@@ -0,0 +1,39 @@
+/* Language switching in the browser - see translations.py & language_mod.py */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    i18n: {
+        // Texts of all translated components (in the order of LABELS)
+        labels: function(lang, table) {
+            return table[lang].labels;
+        },
+        // Figure / component tree with {{key}} placeholders replaced by texts of the selected language
+        translate: function(data, lang, table) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            var texts = table[lang].texts;
+            var replace = function(value) {
+                if (typeof value === 'string') {
+                    if (value.indexOf('{{') < 0) {
+                        return value;
+                    }
+                    return value.replace(/\{\{([^}]+)\}\}/g, function(match, key) {
+                        return key in texts ? texts[key] : match;
+                    });
+                }
+                if (Array.isArray(value)) {
+                    // numeric data series are not copied
+                    return value.length && typeof value[0] === 'number' ? value : value.map(replace);
+                }
+                if (value && typeof value === 'object') {
+                    var result = {};
+                    for (var key in value) {
+                        result[key] = replace(value[key]);
+                    }
+                    return result;
+                }
+                return value;
+            };
+            return replace(data);
+        }
+    }
+});
@@ -0,0 +1,23 @@
+/* Inputs handled in the browser: total number of installments (no server call before the schedule
+   is calculated) and id of the tab with a counter of requests sent with callback requests - the server
+   drops requests superseded by newer ones of the same tab (see app_coalesce.py) */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    inputs: {
+        total_installments: function(years, months) {
+            return (parseInt(years, 10) || 0) * 12 + (parseInt(months, 10) || 0);
+        }
+    }
+});
+
+(function() {
+    var tab = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    var counter = 0;
+    var fetch = window.fetch;
+    window.fetch = function(url, options) {
+        if (typeof url === 'string' && url.indexOf('_dash-update-component') >= 0) {
+            options = Object.assign({}, options);
+            options.headers = Object.assign({}, options.headers, {'X-Mortgage-Tab': tab + '.' + (++counter)});
+        }
+        return fetch.apply(this, [url, options]);
+    };
+})();
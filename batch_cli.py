@@ -0,0 +1,170 @@
+''' This file contains command-line (headless) batch calculation of
+many loans - e.g. nightly recalculation of the whole loan book.
+Loans are read from CSV or JSONL (one loan per row / line) with fields:
+- id (optional - row number is used if missing),
+- amount, bank_rate & base_rate (in %, as in the dashboard),
+- term (number of monthly installments), type ('fixed' or 'desc'),
+- fees & insurance (optional, PLN): one-off fees and monthly insurance - included in the APR.
+Loans are read and written in chunks, calculated by a pool of processes
+(portfolio batch API), and results are written as they are ready - so
+memory is bounded by the chunk size & number of chunks in progress:
+- summary: one row per loan (first installment, totals & APR in %),
+- schedules: one row per loan & month (all schedule columns).
+Output format (CSV or Parquet - requires pyarrow) follows file extension.
+With --fixed-point schedules are calculated in int64 grosz (bit-reproducible
+on every machine, see schedule_engine).
+Run:
+  python batch_cli.py loans.csv summary.csv
+  python batch_cli.py loans.jsonl schedules.parquet --schedules --workers 8'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import portfolio
+import schedule_engine as engine
+
+CHUNK_SIZE = 500
+# Chunks in progress (submitted or waiting to be written) per worker
+CHUNKS_PER_WORKER = 2
+
+
+def read_loans(path):
+    ''' Yields loans (dictionaries) read from CSV or JSONL file ('-' - CSV from standard input) '''
+    jsonl = path.lower().endswith(('.jsonl', '.ndjson'))
+    file = sys.stdin if path == '-' else open(path, newline='')
+    try:
+        rows = (json.loads(line) for line in file if line.strip()) if jsonl else csv.DictReader(file)
+        for number, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                raise ValueError(f"Loan {number}: has to be a JSON object")
+            yield portfolio.parse_loan(row, number)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def chunks(loans, size):
+    chunk = []
+    for loan in loans:
+        chunk.append(loan)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def calculate_chunk(task):
+    ''' Returns number of loans & data frame with results for a chunk of loans (run in worker processes) '''
+    loans, schedules, fixed_point = task
+    ids = np.array([loan["id"] for loan in loans], dtype=object)
+    values = {field: np.array([loan[field] for loan in loans]) for field in portfolio.LOAN_FIELDS + portfolio.COST_FIELDS}
+    args = (values["amount"], values["bank_rate"] / 100, values["base_rate"] / 100, values["term"], values["type"])
+    if not schedules:
+        result = {"id": ids}
+        result.update(values)
+        summary = portfolio.batch_summary(*args, fixed_point=fixed_point, fees=values["fees"], insurance=values["insurance"])
+        result.update((column, engine.round2(values)) for column, values in summary.items())
+        return len(loans), pd.DataFrame(result)
+    arrays = portfolio.batch_schedules(*args, fixed_point=fixed_point)
+    mask = arrays["mask"]
+    months = np.broadcast_to(np.arange(1, mask.shape[1] + 1), mask.shape)[mask]
+    result = {"id": np.repeat(ids, values["term"]), "Month": months, "Year": (months - 1) // 12 + 1}
+    # cumulative sums are rounded - all values are in grosz
+    result.update((column, engine.round2(arrays[column][mask])) for column in engine.AGGREGATE_COLUMNS)
+    return len(loans), pd.DataFrame(result)
+
+
+def imap_bounded(executor, func, tasks, in_progress):
+    ''' Like executor.map, but with at most `in_progress` tasks submitted and not yet consumed '''
+    futures = deque()
+    for task in tasks:
+        futures.append(executor.submit(func, task))
+        if len(futures) >= in_progress:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+class ChunkWriter:
+    ''' Appends data frames to CSV ('-' - standard output) or Parquet file (as row groups) '''
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith('.parquet')
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401 - optional, only for Parquet output
+            except ImportError:
+                raise ValueError("Parquet output requires pyarrow (pip install pyarrow)") from None
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df.astype({"id": str}), preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            target = sys.stdout if self.path == '-' else self.path
+            df.to_csv(target, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def run_batch(input_path, output_path, schedules=False, workers=None, chunk_size=CHUNK_SIZE, fixed_point=False):
+    ''' Calculates all loans of the input file and writes results - returns number of loans & rows written '''
+    workers = workers or os.cpu_count() or 1
+    writer = ChunkWriter(output_path)
+    tasks = ((chunk, schedules, fixed_point) for chunk in chunks(read_loans(input_path), chunk_size))
+    loans = 0
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for chunk_loans, df in imap_bounded(executor, calculate_chunk, tasks, workers * CHUNKS_PER_WORKER):
+                    writer.write(df)
+                    loans += chunk_loans
+        else:
+            for chunk_loans, df in map(calculate_chunk, tasks):
+                writer.write(df)
+                loans += chunk_loans
+    finally:
+        writer.close()
+    return loans, writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch calculation of loans from CSV / JSONL file")
+    parser.add_argument("input", help="loans file (.csv or .jsonl, '-' - CSV from standard input)")
+    parser.add_argument("output", help="results file (.csv or .parquet, '-' - CSV to standard output)")
+    parser.add_argument("--schedules", action="store_true", help="write monthly schedules instead of loan summary")
+    parser.add_argument("--fixed-point", action="store_true", help="calculate in integer grosz (bit-reproducible)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: number of cores)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="loans calculated at once by a process")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("chunk size has to be positive")
+    try:
+        loans, rows = run_batch(args.input, args.output, args.schedules, args.workers, args.chunk_size, args.fixed_point)
+    except (OSError, ValueError) as error:
+        parser.exit(2, f"{parser.prog}: error: {error}\n")
+    print(f"{loans} loans calculated, {rows} rows written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
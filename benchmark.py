@@ -0,0 +1,91 @@
+''' This file contains a simple benchmark comparing
+the array-based schedule engine with the original
+month-by-month loop (monthly schedule), with
+grouping of the monthly schedule (yearly schedule),
+with the loop for a base rate reset every 3 months and
+the float engine with the fixed-point (int64 grosz) mode.
+Run: python benchmark.py'''
+
+import timeit
+
+import numpy as np
+
+import schedule_engine as engine
+
+# Benchmark scenarios: loan amount, total interest, number of installments
+SCENARIOS = [(300000, .095, 120), (300000, .095, 360), (300000, .095, 600)]
+REPEAT = 200
+# Base rate path: reset every 3 months
+RESET_EVERY = 3
+
+
+def time_call(func, *args):
+    return min(timeit.repeat(lambda: func(*args), number=REPEAT, repeat=3)) / REPEAT
+
+
+def yearly_from_monthly(amount, rate, n, inst_type):
+    df = engine.schedule_df(amount, rate, n, inst_type)
+    groups = df.groupby(["Year"]).sum()
+    df_grouped = groups[["Installment", "Interest", "Principal"]].copy()
+    df_grouped["Ending Balance"] = amount - df_grouped["Principal"].cumsum()
+    df_grouped["Balance"] = df_grouped["Ending Balance"] + df_grouped["Principal"]
+    df_grouped["Total Payment"] = df_grouped["Installment"].cumsum()
+    df_grouped["Total Interest"] = df_grouped["Interest"].cumsum()
+    df_grouped["Total Principal"] = df_grouped["Principal"].cumsum()
+    return df_grouped[engine.AGGREGATE_COLUMNS].reset_index()
+
+
+def main():
+    print(f"{'type':<6} {'months':>6} {'loop [ms]':>10} {'engine [ms]':>12} {'speedup':>8}")
+    for inst_type in engine.INSTALLMENT_TYPES:
+        for amount, rate, n in SCENARIOS:
+            df_loop = engine.reference_schedule_df(amount, rate, n, inst_type)
+            df_engine = engine.schedule_df(amount, rate, n, inst_type)
+            # Results have to be identical - not only close
+            assert np.array_equal(df_loop.to_numpy(dtype=float), df_engine.to_numpy(dtype=float))
+            t_loop = time_call(engine.reference_schedule_df, amount, rate, n, inst_type)
+            t_engine = time_call(engine.schedule_df, amount, rate, n, inst_type)
+            print(f"{inst_type:<6} {n:>6} {t_loop * 1e3:>10.3f} {t_engine * 1e3:>12.3f} {t_loop / t_engine:>7.1f}x")
+    print()
+    print(f"{'type':<6} {'months':>6} {'groupby [ms]':>12} {'engine [ms]':>12} {'speedup':>8}")
+    for inst_type in engine.INSTALLMENT_TYPES:
+        for amount, rate, n in SCENARIOS:
+            df_grouped = yearly_from_monthly(amount, rate, n, inst_type)
+            df_engine = engine.yearly_schedule_df(amount, rate, n, inst_type)
+            # Results have to be the same (up to rounding of the grouped sums)
+            assert np.array_equal(engine.round2(df_grouped.to_numpy(dtype=float)), df_engine.to_numpy(dtype=float))
+            t_grouped = time_call(yearly_from_monthly, amount, rate, n, inst_type)
+            t_engine = time_call(engine.yearly_schedule_df, amount, rate, n, inst_type)
+            print(f"{inst_type:<6} {n:>6} {t_grouped * 1e3:>12.3f} {t_engine * 1e3:>12.3f} {t_grouped / t_engine:>7.1f}x")
+    print()
+    print(f"{'type':<6} {'months':>6} {'resets':>6} {'loop [ms]':>10} {'engine [ms]':>12} {'flat [ms]':>10}")
+    rng = np.random.default_rng(0)
+    for inst_type in engine.INSTALLMENT_TYPES:
+        for amount, rate, n in SCENARIOS:
+            resets = -(-n // RESET_EVERY)
+            base_rates = np.round(rate - .02 + rng.normal(0, .01, resets), 4)
+            df_engine = engine.rate_path_schedule_df(amount, .02, base_rates, n, inst_type, RESET_EVERY)
+            df_loop = engine.reference_rate_path_df(amount, df_engine["Interest Rate"].to_numpy(), inst_type)
+            assert np.array_equal(df_loop.to_numpy(dtype=float), df_engine.to_numpy(dtype=float))
+            t_loop = time_call(engine.reference_rate_path_df, amount, df_engine["Interest Rate"].to_numpy(), inst_type)
+            t_engine = time_call(engine.rate_path_schedule_df, amount, .02, base_rates, n, inst_type, RESET_EVERY)
+            t_flat = time_call(engine.schedule_df, amount, rate, n, inst_type)
+            print(f"{inst_type:<6} {n:>6} {resets:>6} {t_loop * 1e3:>10.3f} {t_engine * 1e3:>12.3f} {t_flat * 1e3:>10.3f}")
+
+    print()
+    # the fixed-point mode should be at least as fast as the float engine - slower cases are marked
+    print(f"{'type':<6} {'months':>6} {'float [ms]':>10} {'grosz [ms]':>11} {'grosz/float':>12} {'differing rows':>15}")
+    for inst_type in engine.INSTALLMENT_TYPES:
+        for amount, rate, n in SCENARIOS:
+            df_float = engine.schedule_df(amount, rate, n, inst_type)
+            df_grosz = engine.schedule_df(amount, rate, n, inst_type, fixed_point=True)
+            # rows differing by a grosz or more: exact ties (e.g. 2315.625) are rounded half up, not by float noise
+            differing = (np.abs(df_float - df_grosz) > .005).any(axis=1).sum()
+            t_float = time_call(engine.schedule_arrays, amount, rate, n, inst_type)
+            t_grosz = time_call(engine.schedule_arrays, amount, rate, n, inst_type, None, True)
+            slower = "  slower" if t_grosz > t_float else ""
+            print(f"{inst_type:<6} {n:>6} {t_float * 1e3:>10.3f} {t_grosz * 1e3:>11.3f} {t_grosz / t_float:>11.2f}x {differing:>15}{slower}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+''' This file contains benchmark suite of the calculation engine
+(mortgageData) and of the Dash callbacks, run for a matrix of mortgage
+terms, installment types and interest rates. For every case it measures:
+- time: best time of a single call (timeit, best of repeats),
+- memory: peak memory allocated by a single call (tracemalloc),
+- payload: size of the result as JSON - i.e. bytes sent to the browser
+  for callbacks (data frames: JSON as previously kept in dcc.Store).
+Results are compared with baselines saved on the same machine
+(benchmark_baseline.json - timings depend on the hardware, so the file is
+not kept in the repository: save it with --save-baseline before a change);
+a case slower / bigger than baseline by more than the threshold is
+reported as regression (exit status 1).
+Callbacks are called directly - registered on CallbackRecorder instead of
+the Dash application - and outside of the Flask application, i.e. without
+the cache (every call is calculated) and with schedules kept as JSON.
+Run:
+  python benchmark_suite.py                  - compare with baselines
+  python benchmark_suite.py --save-baseline  - save results as new baselines
+  python benchmark_suite.py --quick -k callback:  - 360 months only, callbacks only
+  MORTGAGE_ENGINE_BACKEND=python python benchmark_suite.py -k mortgage:  - engine with another backend'''
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+from dash import Output
+import plotly.utils
+
+import engine_kernels
+import mortgage as mD
+import schedule_engine as engine
+from data_calc_callbacks import data_callbacks, WIBOR_GRID_DEFAULTS, STRESS_DEFAULTS, SOLVER_DEFAULTS
+from output_tab import output_callbacks, AMORT_PAGE_SIZE
+
+# Benchmark matrix: number of installments, installment types, total interest (bank + base)
+TERMS = (12, 60, 120, 240, 360, 600)
+QUICK_TERMS = (360,)
+RATES = (.03, .095, .15)
+LOAN_AMOUNT = 300000
+BANK_RATE = .02
+# Stress test paths per call (defaults of the dashboard would make the suite long)
+STRESS_PATHS = 500
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# Allowed relative increase over the baseline: time (noisy) and memory / payload (deterministic)
+TIME_THRESHOLD = .25
+SIZE_THRESHOLD = .1
+# Allowed absolute increase (very fast / small cases): time (s) and memory / payload (bytes)
+TIME_SLACK = 5e-5
+SIZE_SLACK = 1024
+# Minimum measured time of a repeat (calls are repeated until it is reached) and number of repeats
+MIN_REPEAT_TIME = .02
+REPEAT = 5
+
+# Figures of mortgageData (memoized properties)
+FIGURE_PROPERTIES = ["monthlyInstallmentsScatter_fig", "yearlyInstallmentsScatter_fig", "paymentSplit_piePlot_fig",
+                     "wiborEffect_HeatMap_fig", "installmentsTable_monthly", "installmentsTable_yearly"]
+
+
+class CallbackRecorder:
+    ''' Stands in for the Dash application - callbacks are recorded
+    (by the first output, e.g. 'installments_df.data') instead of registered '''
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def callback(self, *dependencies, **kwargs):
+        output = next(dependency for dependency in dependencies if isinstance(dependency, Output))
+        def record(func):
+            self.callbacks[f"{output.component_id}.{output.component_property}"] = func
+            return func
+        return record
+
+    def clientside_callback(self, *args, **kwargs):
+        pass
+
+
+def payload_size(value):
+    if hasattr(value, 'to_plotly_json'):  # figure
+        return len(value.to_json())
+    if hasattr(value, 'to_json'):  # data frame
+        return len(value.to_json(orient='split', date_format='iso'))
+    return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def measure(func):
+    ''' Returns time (s), peak memory (bytes) and payload size (bytes) of a call '''
+    result = func()
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_REPEAT_TIME and number < 10000:
+        number *= 10
+    call_time = min(timer.repeat(repeat=REPEAT, number=number)) / number
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        memory = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return {"time": call_time, "memory": memory, "payload": payload_size(result)}
+
+
+def mortgage_cases(n, inst_type, rate):
+    m = mD.mortgageData(BANK_RATE, rate - BANK_RATE, LOAN_AMOUNT, n, inst_type)
+    def uncached(name):
+        # memoized property recalculated (data it depends on stays cached)
+        def call():
+            m._cache.pop(name, None)
+            return getattr(m, name)
+        return call
+    yield "calculate_first_installment", m.calculate_first_installment
+    for name in ["df_installments", "df_installments_yr", "df_wibor_effect"] + FIGURE_PROPERTIES:
+        yield name, uncached(name)
+
+
+def callback_cases(n, inst_type, rate):
+    app = CallbackRecorder()
+    data_callbacks(app)
+    output_callbacks(app)
+    cb = app.callbacks
+    bank, wibor = BANK_RATE * 100, (rate - BANK_RATE) * 100
+    grid = [WIBOR_GRID_DEFAULTS[key] for key in ('rate_min', 'rate_max', 'rate_step', 'rows')]
+    stress = [STRESS_PATHS, None, STRESS_DEFAULTS['volatility'], STRESS_DEFAULTS['reset'], STRESS_DEFAULTS['seed']]
+    # inputs of dependent callbacks are results of the callbacks they depend on
+    schedule_args = (LOAN_AMOUNT, n, inst_type, bank, wibor)
+    # monthly view of the amortization table is picked in the browser (schedule.table in assets/figures.js)
+    amort_schedule = cb['kpi_installment.children'](*schedule_args)[2]['monthly']['store']
+    wibor_eff = cb['wibor_eff_store.data'](LOAN_AMOUNT, n, inst_type, bank, *grid)
+    stress_data = cb['wibor_stress_store.data'](2, LOAN_AMOUNT, n, inst_type, bank, wibor, *stress)
+    # offers of the case: different margin & fees, other installment type
+    offers = [{"name": name, "bank_rate": bank + margin, "base_rate": wibor, "term": n, "type": offer_type, "fees": fees}
+              for name, margin, offer_type, fees in (("A", 0, inst_type, 0), ("B", -.3, inst_type, 6000),
+                                                     ("C", 0, "desc" if inst_type == "fixed" else "fixed", 0))]
+    offers_data = cb['offers_store.data'](offers, LOAN_AMOUNT)
+    solver = [SOLVER_DEFAULTS[key] for key in ('target', 'budget', 'budget_min', 'budget_max', 'budget_step')]
+    solver_args = (*solver, LOAN_AMOUNT, n, inst_type, bank, wibor)
+    calls = {
+        'wibor_eff_store.data': (LOAN_AMOUNT, n, inst_type, bank, *grid),
+        'wibor_stress_store.data': (2, LOAN_AMOUNT, n, inst_type, bank, wibor, *stress),
+        'kpi_installment.children': schedule_args,
+        'amort_table_store.data': (1,),
+        'amort_table.data': (amort_schedule, 0, AMORT_PAGE_SIZE, None, None),
+        'wibor_effect_chart_store.data': (wibor_eff, bank),
+        'wiboreff_grid.style': (2,),
+        'wibor_stress_chart_store.data': (stress_data,),
+        'offers_store.data': (offers, LOAN_AMOUNT),
+        'offers_table.data': (1, offers),
+        'offers_summary_store.data': (offers_data,),
+        'solver_store.data': solver_args,
+        'solver_chart_store.data': (cb['solver_store.data'](*solver_args),),
+    }
+    missing = set(cb) - set(calls)
+    if missing:
+        raise ValueError(f"No benchmark inputs for callbacks: {', '.join(sorted(missing))}")
+    for output, args in calls.items():
+        yield output, lambda func=cb[output], args=args: func(*args)
+
+
+def run(terms, selected=None):
+    results = {}
+    for inst_type in engine.INSTALLMENT_TYPES:
+        for n in terms:
+            for rate in RATES:
+                for group, cases in (("mortgage", mortgage_cases), ("callback", callback_cases)):
+                    for name, func in cases(n, inst_type, rate):
+                        case = f"{group}:{name}|{inst_type}|{n}|{rate}"
+                        if selected and selected not in case:
+                            continue
+                        results[case] = measure(func)
+                        yield case, results[case]
+
+
+def compare(result, baseline, time_threshold, size_threshold):
+    ''' Returns list of regressed metrics '''
+    if baseline is None:
+        return []
+    limits = [("time", time_threshold, TIME_SLACK), ("memory", size_threshold, SIZE_SLACK), ("payload", size_threshold, SIZE_SLACK)]
+    return [metric for metric, limit, slack in limits if result[metric] > baseline[metric] * (1 + limit) + slack]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the calculation engine & Dash callbacks")
+    parser.add_argument("--save-baseline", action="store_true", help="save results as new baselines")
+    parser.add_argument("--quick", action="store_true", help=f"only {', '.join(map(str, QUICK_TERMS))} months")
+    parser.add_argument("-k", dest="selected", help="only cases containing the text, e.g. 'callback:' or '|desc|600|'")
+    parser.add_argument("--threshold", type=float, default=TIME_THRESHOLD, help="allowed relative time increase")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baselines file")
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+    regressions = []
+    results = {}
+    print(f"Engine backend: {engine_kernels.BACKEND} (numba: {engine_kernels.NUMBA_VERSION or 'not installed'})")
+    print(f"{'case':<62} {'time [ms]':>10} {'vs base':>8} {'peak [KiB]':>11} {'payload [KiB]':>14}")
+    for case, result in run(QUICK_TERMS if args.quick else TERMS, args.selected):
+        results[case] = result
+        baseline = baselines.get(case)
+        change = f"{result['time'] / baseline['time'] - 1:+8.0%}" if baseline else f"{'new':>8}"
+        regressed = compare(result, baseline, args.threshold, SIZE_THRESHOLD)
+        if regressed:
+            regressions.append((case, regressed))
+        print(f"{case:<62} {result['time'] * 1e3:>10.3f} {change} {result['memory'] / 1024:>11.1f} "
+              f"{result['payload'] / 1024:>14.1f}{'  REGRESSION: ' + ', '.join(regressed) if regressed else ''}")
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baselines, file, indent=1, sort_keys=True)
+        print(f"Baselines of {len(results)} cases saved to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} of {len(results)} cases regressed (time threshold {args.threshold:.0%}):")
+        for case, regressed in regressions:
+            print(f"  {case}: {', '.join(regressed)}")
+        return 1
+    if not baselines:
+        print(f"No baselines in {args.baseline} - save them with --save-baseline (on this machine)")
+        return 0
+    print(f"No regressions in {len(results)} cases")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
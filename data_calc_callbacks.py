@@ -3,166 +3,249 @@ to re-calculculate mortgage data based on
 user's input - the resulting data is stored
 at dcc.Store component in the app layout'''
 
+import math
+
+import numpy as np
+
 from dash import Input, Output, callback
-import pandas as pd
+from dash.exceptions import PreventUpdate
+
+import portfolio
+import rate_stress
+import schedule_engine as engine
+import schedule_store
+from app_cache import memoize
 
 def data_callbacks(app):
     ######### Recalculate all DFs for updated inputs #########
     ### Stores - storing data used for visualization creation
     
-    # 1. Total interest
-    @app.callback(
-        Output('total_interest', 'data'),
-        Input('bank_interest', 'value'),
-        Input('wibor_interest', 'value')
-    )
-    def calc_total_interest(interest_b, interest_w):
-        return (interest_b + interest_w)/100
-    
-    # 2. First installment
+    # 1.-6. Schedule of the loan (first installment, monthly & yearly schedules and their selections) -
+    # calculated together with everything displayed from it in one call, see output_tab.py (callback 1)
+
+    # 7. Custom installment (for WIBOR effect check)
     @app.callback(
-        Output('first_installment', 'data'),
+        Output('wibor_eff_store', 'data'),
         Input('principal_value', 'value'),
         Input('no_of_installments_t', 'value'),
         Input('installments_type', 'value'),
-        Input('total_interest', 'data'),
+        Input('bank_interest', 'value'),
+        Input('grid_rate_min', 'value'),
+        Input('grid_rate_max', 'value'),
+        Input('grid_rate_step', 'value'),
+        Input('grid_rows', 'value'),
     )
-    def calculate_first_installment(principal, install_no, install_type, totalInterestRate):
-        if install_type == "fixed":
-            first_payment = round((principal * totalInterestRate) / (12 * (1 - (12/(12+totalInterestRate)) ** install_no)), 2)
-        elif install_type == "desc":
-            first_payment = round(principal * (1 / install_no + totalInterestRate / 12), 2)
-        return first_payment
-    
-    # 3. Installments dataframe - monthly
+    def df_wibor_effect(loanAmount, no_of_install, inst_type, bank_iterest, rate_min, rate_max, rate_step, rows):
+        return calc_wibor_effect(loanAmount, no_of_install, inst_type, bank_iterest, rate_min, rate_max, rate_step, rows)
+
+    # 8. Base interest stress test (Monte Carlo) - calculated only in stochastic mode
     @app.callback(
-        Output('installments_df', 'data'),
-        Input('first_installment', 'data'),
+        Output('wibor_stress_store', 'data'),
+        Input('wiboreff_mode', 'value'),
         Input('principal_value', 'value'),
         Input('no_of_installments_t', 'value'),
         Input('installments_type', 'value'),
-        Input('total_interest', 'data'),
-    )
-    def df_installments(first_inst, principal_val, install_no, install_type, interest_t):
-        pd.options.display.float_format = '{:,.2f}'.format
-        first_payment = first_inst
-        # create lists
-        data = []
-        total_pay = 0
-        total_interest = 0
-        total_principal = 0
-        for i in range(0, install_no):
-            month = i + 1
-            year = (month - 1) // 12 + 1
-            if month == 1:
-                balance = principal_val
-            else:
-                balance = amount_after_payment
-            interest = round(balance * interest_t / 12, 2) #interest part of the installment
-            if install_type == "desc": #Fixed installments
-                principal = round(principal_val / install_no, 2)
-                installment = principal + interest
-            if install_type == "fixed": #Descending installments
-                installment = first_payment
-                principal = installment - interest
-            amount_after_payment = balance - principal
-            if amount_after_payment < 0:
-                correction = -amount_after_payment
-                amount_after_payment = 0
-                principal -= correction
-                installment -= correction
-            total_pay += installment
-            total_interest += interest
-            total_principal += principal
-            data.append([month, year, balance, installment, interest, principal, total_pay, total_interest, total_principal, amount_after_payment]) #append data to the data list
-        df_installments = pd.DataFrame(data=data, columns=["Month", "Year", "Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"])
-        return df_installments.to_json(orient='split', date_format='iso')
-    
-    # 4. Installments dataframe - annually
-    @app.callback(
-        Output('installments_df_yr', 'data'),
-        Input('installments_df', 'data'),
-        Input('principal_value', 'value')
-    )
-    def df_installments_yr(data, principal_val):
-        df_installments = pd.read_json(data, orient='split')
-        pd.options.display.float_format = '{:,.2f}'.format
-        groups = df_installments.groupby(["Year"]).sum()
-        df_grouped = pd.DataFrame(data=groups, columns=["Installment", "Interest", "Principal"])
-        df_grouped["Ending Balance"] = principal_val - df_grouped["Principal"].cumsum()
-        df_grouped["Balance"] = df_grouped["Ending Balance"] + df_grouped["Principal"]
-        df_grouped["Total Payment"] = df_grouped["Installment"].cumsum()
-        df_grouped["Total Interest"] = df_grouped["Interest"].cumsum()
-        df_grouped["Total Principal"] = df_grouped["Principal"].cumsum()
-        df_grouped = df_grouped[["Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"]]
-        return df_grouped.reset_index().to_json(orient='split', date_format='iso')
-    
-    # 5 Installments dataframe - selected for the scatter plot
-    @app.callback(
-        Output('installments_df_sel', 'data'),
-        Input('installments_df', 'data'),
-        Input('installments_df_yr', 'data'),
-        Input('radioitems-payment_scatter', 'value')
+        Input('bank_interest', 'value'),
+        Input('wibor_interest', 'value'),
+        Input('stress_paths', 'value'),
+        Input('stress_mean', 'value'),
+        Input('stress_volatility', 'value'),
+        Input('stress_reset', 'value'),
+        Input('stress_seed', 'value'),
     )
-    def select_df(df_month, df_year, period):
-        if period == 1:
-            return df_month
-        else:
-            return df_year    
+    def wibor_stress(mode, loanAmount, no_of_install, inst_type, bank_iterest, wibor_interest, paths, mean, volatility, reset, seed):
+        if mode != 2:
+            raise PreventUpdate
+        return calc_wibor_stress(loanAmount, no_of_install, inst_type, bank_iterest, wibor_interest, paths, mean, volatility, reset, seed)
 
-    # 6 Installments dataframe - selected for amortization table
+    # 9. Offers comparison - all offers calculated at once (for the mortgage amount)
     @app.callback(
-        Output('installments_df_sel_amort', 'data'),
-        Input('installments_df', 'data'),
-        Input('installments_df_yr', 'data'),
-        Input('radioitems-payment_table', 'value')
+        Output('offers_store', 'data'),
+        Input('offers_table', 'data'),
+        Input('principal_value', 'value'),
     )
-    def select_df(df_month, df_year, period):
-        if period == 1:
-            return df_month
-        else:
-            return df_year
+    def compare_offers(offers, loanAmount):
+        return calc_offers(loanAmount, offers)
 
-    # 7. Custom installment (for WIBOR effect check)
+    # 10. Inverse calculation - loan amount, term or base interest for a monthly budget (and a grid of budgets)
     @app.callback(
-        Output('wibor_eff_store', 'data'),
+        Output('solver_store', 'data'),
+        Input('solver_target', 'value'),
+        Input('solver_budget', 'value'),
+        Input('solver_budget_min', 'value'),
+        Input('solver_budget_max', 'value'),
+        Input('solver_budget_step', 'value'),
         Input('principal_value', 'value'),
         Input('no_of_installments_t', 'value'),
         Input('installments_type', 'value'),
         Input('bank_interest', 'value'),
+        Input('wibor_interest', 'value'),
     )
-    def df_wibor_effect(loanAmount, no_of_install, inst_type, bank_iterest):
-        # wibor options & amount columns hard-coded
-        wibor = [0, .01, .02, .03, .04, .05, .06, .07, .08, .1, .12, .15]
-        amount = [0.1 * loanAmount, 0.2 * loanAmount, 0.3 * loanAmount, 0.4 * loanAmount, 0.5 * loanAmount, 0.6 * loanAmount, 0.7 * loanAmount, 0.8 * loanAmount, 0.9 * loanAmount, loanAmount]
-        amount.sort(reverse=True)
-        # iterate to find installment value for different loan amounts and Wibor and create column names
-        data = []
-        column_names = ["Loan Amount Left to pay"]  # Only 1st column name assigned
-        for i in range(0, len(amount)):
-            row = [amount[i]]                       # Only 1st column value assigned - amount left to pay
-            for j in range(0, len(wibor)):
-                temp_installment = calculate_first_installment_custom(inst_type, amount[i], bank_iterest/100, no_of_install, wibor[j])
-                row.append(temp_installment)
-                # get column names - wibor amounts
-                if i == 0:
-                    column_names.append(str(round((wibor[j]*100), 1)) + "%")
-            data.append(row)
-        df_wibor_effect = pd.DataFrame(data=data, columns=column_names)
-        # convereted to dictionary:
-        return {'z': df_wibor_effect.iloc[:,1:].values.tolist(),
-                'x': df_wibor_effect.iloc[:,1:].columns.tolist(),
-                'y': df_wibor_effect.iloc[:,0].values.tolist()}
-        
-
-    # Other methods:
-    def calculate_first_installment_custom(installmentsType, amount, bankInterestRate, noOfInstallments, wibor):
-        if installmentsType == "fixed":
-            first_payment = round((amount * (bankInterestRate + wibor)) / (12 * (1 - (12/(12+(bankInterestRate + wibor))) ** noOfInstallments)), 2)
-            return first_payment
-        elif installmentsType == "desc":
-            first_payment = round(amount * (1 / noOfInstallments + (bankInterestRate + wibor) / 12), 2)
-            return first_payment
-        else:
-            print("Please specify installment type correctly")
-            pass
\ No newline at end of file
+    def solve_inverse(target, budget, budget_min, budget_max, budget_step, loanAmount, no_of_install, inst_type, bank_iterest, wibor_interest):
+        return calc_solver(target, budget, budget_min, budget_max, budget_step, loanAmount, no_of_install, inst_type, bank_iterest, wibor_interest)
+
+
+# Base interest effect grid: default settings (%) and maximum number of rows/columns
+WIBOR_GRID_DEFAULTS = {'rate_min': 0, 'rate_max': 15, 'rate_step': 1, 'rows': 10}
+WIBOR_GRID_MAX_SIZE = 500
+
+# Columns of the payments chart (scatter)
+CHART_COLUMNS = ["Balance", "Total Payment", "Total Interest", "Total Principal"]
+
+# Calculations - memoized on canonicalized inputs (see app_cache)
+@memoize
+def calc_first_installment(principal, install_no, install_type, totalInterestRate):
+    return engine.first_installment(principal, totalInterestRate, install_no, install_type)
+
+@memoize
+def calc_installments(first_inst, principal_val, install_no, install_type, interest_t):
+    source = ['installments', [first_inst, principal_val, install_no, install_type, interest_t]]
+    return schedule_store.dump(installments_df(first_inst, principal_val, install_no, install_type, interest_t), source)
+
+@memoize
+def calc_installments_yr(first_inst, principal_val, install_no, install_type, interest_t):
+    source = ['installments_yr', [first_inst, principal_val, install_no, install_type, interest_t]]
+    return schedule_store.dump(installments_yr_df(first_inst, principal_val, install_no, install_type, interest_t), source)
+
+def installments_df(first_inst, principal_val, install_no, install_type, interest_t):
+    return engine.schedule_df(principal_val, interest_t, install_no, install_type, first_inst)
+
+def installments_yr_df(first_inst, principal_val, install_no, install_type, interest_t, monthly=None):
+    # Yearly totals - sums of the monthly schedule (see engine.aggregate_arrays), calculated unless passed
+    return engine.yearly_schedule_df(principal_val, interest_t, install_no, install_type, first_inst, monthly)
+
+@memoize
+def calc_schedule(principal, install_no, install_type, interest_t):
+    ''' Everything derived from one monthly schedule: first installment, totals and - monthly &
+    yearly (sums of the monthly one) - value of the schedule store and series of the payments chart '''
+    first_inst = calc_first_installment(principal, install_no, install_type, interest_t)
+    args = [first_inst, principal, install_no, install_type, interest_t]
+    monthly = installments_df(*args)
+    yearly = installments_yr_df(*args, monthly=monthly)
+    result = {
+        'first_installment': first_inst,
+        'totals': [round(monthly["Total Principal"].max(), 2), round(monthly["Total Interest"].max(), 2)],
+    }
+    for period, name, df, x in (('monthly', 'installments', monthly, 'Month'), ('yearly', 'installments_yr', yearly, 'Year')):
+        result[period] = {
+            'store': schedule_store.dump(df, [name, args]),
+            'x': df[x].tolist(),
+            'y': [df[column].round(2).tolist() for column in CHART_COLUMNS],
+        }
+    return result
+
+def check_schedule_args(args):
+    ''' Raises ValueError if arguments of a schedule (source of a store reference) are not valid '''
+    if len(args) != 5:
+        raise ValueError("Schedule requires 5 arguments")
+    first_inst, principal_val, install_no, install_type, interest_t = args
+    numbers = [first_inst, principal_val, install_no, interest_t]
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) for value in numbers):
+        raise ValueError("Schedule arguments have to be finite numbers")
+    if install_type not in engine.INSTALLMENT_TYPES:
+        raise ValueError(f"Unknown installment type {install_type!r}")
+    if principal_val <= 0 or install_no != int(install_no) or not 1 <= install_no <= portfolio.MAX_TERM:
+        raise ValueError(f"Amount has to be positive and term between 1 and {portfolio.MAX_TERM} months")
+
+# Schedules can be recalculated if missing in the server-side store
+schedule_store.register('installments', installments_df, check_schedule_args)
+schedule_store.register('installments_yr', installments_yr_df, check_schedule_args)
+
+@memoize
+def calc_wibor_effect(loanAmount, no_of_install, inst_type, bank_iterest, rate_min, rate_max, rate_step, rows):
+    # grid settings (in %) - missing or improper values replaced by defaults, grid size limited
+    rate_min = WIBOR_GRID_DEFAULTS['rate_min'] if rate_min is None else max(rate_min, 0)
+    rate_max = max(WIBOR_GRID_DEFAULTS['rate_max'] if rate_max is None or rate_max < rate_min else rate_max, rate_min)
+    rate_step = WIBOR_GRID_DEFAULTS['rate_step'] if not rate_step or rate_step <= 0 else rate_step
+    rate_step = max(rate_step, (rate_max - rate_min) / (WIBOR_GRID_MAX_SIZE - 1))
+    rows = WIBOR_GRID_DEFAULTS['rows'] if not rows or rows < 1 else min(int(rows), WIBOR_GRID_MAX_SIZE)
+    # installment values for all balances & base rates calculated at once - ready for the heatmap
+    return engine.wibor_effect_grid(loanAmount, bank_iterest/100, no_of_install, inst_type, rate_min/100, rate_max/100, rate_step/100, rows)
+
+# Base interest stress test: default settings (rates in %) and maximum number of simulated paths -
+# calculated within the web request (in its worker process, no pool of processes)
+STRESS_DEFAULTS = {'paths': 2000, 'volatility': 1.5, 'reset': 3, 'seed': 1}
+STRESS_MAX_PATHS = rate_stress.POOL_MIN_PATHS // 2
+
+@memoize
+def calc_wibor_stress(loanAmount, no_of_install, inst_type, bank_iterest, wibor_interest, paths, mean, volatility, reset, seed):
+    # missing or improper settings replaced by defaults; long-term mean defaults to current base interest
+    paths = STRESS_DEFAULTS['paths'] if not paths or paths < 1 else min(int(paths), STRESS_MAX_PATHS)
+    mean = wibor_interest if mean is None or mean < 0 else mean
+    volatility = STRESS_DEFAULTS['volatility'] if volatility is None or volatility < 0 else volatility
+    reset = STRESS_DEFAULTS['reset'] if not reset else min(max(int(reset), 1), no_of_install)
+    seed = STRESS_DEFAULTS['seed'] if seed is None or seed < 0 else int(seed)
+    return rate_stress.run_stress(loanAmount, bank_iterest/100, no_of_install, inst_type, wibor_interest/100, paths,
+                                  mean_rate=mean/100, volatility=volatility/100, reset_every=reset, seed=seed, workers=1)
+
+# Maximum number of compared offers
+COMPARE_MAX_OFFERS = 10
+
+@memoize
+def calc_offers(loanAmount, offers):
+    # offers with missing or improper values are skipped (e.g. a row being edited)
+    names, loans, fees = [], [], []
+    for number, offer in enumerate((offers or [])[:COMPARE_MAX_OFFERS], 1):
+        try:
+            loan = portfolio.parse_loan(dict(offer, amount=loanAmount), number)
+            fee = float(offer.get('fees') or 0)
+        except (TypeError, ValueError):
+            continue
+        if not math.isfinite(fee) or fee < 0:
+            continue
+        names.append(str(offer.get('name') or f"#{number}"))
+        loans.append(loan)
+        fees.append(fee)
+    if not loans:
+        return {"x": [], "names": [], "cost": [], "summary": []}
+    values = {field: [loan[field] for loan in loans] for field in portfolio.LOAN_FIELDS}
+    comparison = portfolio.offers_comparison(values["amount"], [rate / 100 for rate in values["bank_rate"]],
+                                             [rate / 100 for rate in values["base_rate"]], values["term"], values["type"], fees)
+    costs = engine.round2(comparison["cost"])
+    best = comparison["Total Cost"].min()
+    summary = [{
+        "name": name,
+        "first_installment": round(float(comparison["First Installment"][i]), 2),
+        "highest_installment": round(float(comparison["Highest Installment"][i]), 2),
+        "total_interest": round(float(comparison["Total Interest"][i]), 2),
+        "fees": round(float(comparison["Fees"][i]), 2),
+        "total_cost": round(float(comparison["Total Cost"][i]), 2),
+        "vs_best": round(float(comparison["Total Cost"][i] - best), 2),
+        "total_payment": round(float(comparison["Total Payment"][i]), 2),
+        "apr": round(float(comparison["APR"][i]), 2),
+    } for i, name in enumerate(names)]
+    # the same months (x) for all offers - curves end with the last installment of an offer
+    return {
+        "x": list(range(1, costs.shape[1] + 1)),
+        "names": names,
+        "cost": [costs[i, :term].tolist() for i, term in enumerate(comparison["terms"])],
+        "summary": summary,
+    }
+
+# Inverse calculation: default monthly budget & grid of budgets (PLN) and maximum number of budgets in the grid
+SOLVER_DEFAULTS = {'target': 'amount', 'budget': 4000, 'budget_min': 2000, 'budget_max': 8000, 'budget_step': 250}
+SOLVER_MAX_BUDGETS = 500
+
+@memoize
+def calc_solver(target, budget, budget_min, budget_max, budget_step, loanAmount, no_of_install, inst_type, bank_iterest, wibor_interest):
+    # missing or improper settings replaced by defaults, grid size limited
+    budget = SOLVER_DEFAULTS['budget'] if not budget or budget <= 0 else budget
+    budget_min = SOLVER_DEFAULTS['budget_min'] if not budget_min or budget_min <= 0 else budget_min
+    budget_max = SOLVER_DEFAULTS['budget_max'] if not budget_max or budget_max < budget_min else budget_max
+    budget_step = SOLVER_DEFAULTS['budget_step'] if not budget_step or budget_step <= 0 else budget_step
+    budget_step = max(budget_step, (budget_max - budget_min) / (SOLVER_MAX_BUDGETS - 1))
+    # the budget and the grid of budgets solved in one call
+    budgets = np.append(engine.grid_axis(budget_min, budget_max, budget_step), budget)
+    total_interest = (bank_iterest + wibor_interest) / 100
+    if target == 'term':
+        values = engine.required_term(budgets, loanAmount, total_interest, inst_type)
+        values[values > portfolio.MAX_TERM] = np.nan
+    elif target == 'rate':
+        # the highest base interest (%) - with the bank interest of the inputs
+        values = engine.max_rate(budgets, loanAmount, no_of_install, inst_type) * 100 - bank_iterest
+        values[values < 0] = np.nan
+    else:
+        target = 'amount'
+        values = engine.max_amount(budgets, total_interest, no_of_install, inst_type)
+    values = [None if np.isnan(value) else round(float(value), 4 if target == 'rate' else 2) for value in values]
+    return {"target": target, "budget": budget, "value": values[-1], "x": budgets[:-1].tolist(), "y": values[:-1]}
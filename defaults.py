@@ -0,0 +1,19 @@
+''' This file contains the default mortgage scenario displayed
+when the application starts - shared by layouts of all tabs
+(figures & tables are calculated by callbacks on page load)'''
+
+DEFAULT_SCENARIO = {
+    'bankInterestRate': .02,
+    'wiborInterestRate': .075,
+    'loanAmount': 300000,
+    'noOfInstallments': 360,
+    'installmentsType': 'fixed',
+}
+
+# Offers compared on the "Compare offers" tab at start - for the mortgage amount
+# of the inputs tab (rates in %, term in months, one-off fees in PLN)
+DEFAULT_OFFERS = [
+    {'name': "A", 'bank_rate': 2.0, 'base_rate': 7.5, 'term': 360, 'type': 'fixed', 'fees': 0},
+    {'name': "B", 'bank_rate': 1.7, 'base_rate': 7.5, 'term': 360, 'type': 'fixed', 'fees': 6000},
+    {'name': "C", 'bank_rate': 2.0, 'base_rate': 7.5, 'term': 300, 'type': 'desc', 'fees': 0},
+]
@@ -0,0 +1,192 @@
+''' This file contains kernels of the schedule engine: the month-by-month
+recurrence (interest rounded every month, installment level recalculated
+at rate resets) written as a plain loop over arrays. Backends:
+- numba: kernels JIT-compiled with numba (used by default if installed),
+- numpy: array engine of schedule_engine - rounded interest propagated
+  over whole arrays (used by default if numba is not installed),
+- python: kernels run by the interpreter (not compiled) - slow, for checks only.
+All backends give exactly the same results as the reference loop
+(schedule_engine.reference_schedule_df) - see cross_check().
+Can be configured with environment variables:
+- MORTGAGE_ENGINE_BACKEND: 'auto' (default), 'numba', 'numpy' or 'python'
+Run:
+  python engine_kernels.py  - cross-check of all available backends with the reference loop'''
+
+import contextlib
+import logging
+import math
+import os
+import sys
+
+import numpy as np
+
+BACKENDS = ("numba", "numpy", "python")
+
+
+def _numba_version():
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.__version__
+
+
+def select_backend(requested):
+    ''' Backend used for the requested one ('auto' - numba if installed, otherwise numpy) '''
+    if requested not in ("auto",) + BACKENDS:
+        raise ValueError(f"Unknown engine backend: {requested!r} (expected 'auto' or one of {', '.join(BACKENDS)})")
+    if requested in ("auto", "numba"):
+        if NUMBA_VERSION is not None:
+            return "numba"
+        if requested == "numba":
+            logging.warning("Engine backend 'numba' requested, but numba is not installed - 'numpy' is used")
+        return "numpy"
+    return requested
+
+
+NUMBA_VERSION = _numba_version()
+BACKEND = select_backend(os.environ.get('MORTGAGE_ENGINE_BACKEND', 'auto').strip().lower())
+
+if NUMBA_VERSION is not None:
+    import numba
+    kernel = numba.njit(cache=True)
+else:
+    def kernel(func):
+        return func
+
+
+def backend_info():
+    return {"backend": BACKEND, "numba": NUMBA_VERSION}
+
+
+@contextlib.contextmanager
+def use_backend(name):
+    ''' Temporarily switches the backend (checks & benchmarks) '''
+    global BACKEND
+    previous, BACKEND = BACKEND, name
+    try:
+        yield
+    finally:
+        BACKEND = previous
+
+
+#### KERNELS - numba-compatible Python (scalars & NumPy arrays only)
+@kernel
+def round2(x):
+    # The same as Python's round(x, 2): x * 100 is calculated exactly as hi + lo (Dekker's
+    # product), so values (almost) at half a grosz are rounded as their exact decimal value
+    hi = x * 100.
+    split = 134217729. * x
+    x_hi = split - (split - x)
+    lo = (x_hi * 100. - hi) + (x - x_hi) * 100.
+    whole = math.floor(hi)
+    above_half = (hi - whole - .5) + lo
+    if above_half > 0 or (above_half == 0 and whole - 2. * math.floor(whole / 2.) == 1.):
+        whole += 1.
+    return whole / 100.
+
+
+@kernel
+def level(balance, rate, months_left, fixed):
+    # Installment (fixed) or principal part (desc) paying off the balance in the remaining months -
+    # the same formula as schedule_engine.first_installment
+    if not fixed:
+        return round2(balance / months_left)
+    if rate == 0:
+        return round2(balance / months_left)
+    return round2((balance * rate) / (12. * (1. - (12. / (12. + rate)) ** float(months_left))))
+
+
+@kernel
+def schedule(balance, rates, fixed, installment_level, extra, relevel, out):
+    # Months of a schedule starting with the balance: interest of the month's rate, installment (fixed)
+    # or principal part (desc) kept at the level, recalculated for the remaining months where `relevel`
+    # is set, extra payments made after each month. out: balance, installment, interest, principal
+    # (rows) - balance going below 0 is not corrected here
+    months = len(rates)
+    for i in range(months):
+        rate = rates[i]
+        if relevel[i]:
+            installment_level = level(balance, rate, months - i, fixed)
+        interest = round2(balance * rate / 12.)
+        if fixed:
+            installment = installment_level
+            principal = installment - interest
+        else:
+            principal = installment_level
+            installment = principal + interest
+        out[0, i] = balance
+        out[1, i] = installment
+        out[2, i] = interest
+        out[3, i] = principal
+        balance = balance - principal - extra[i]
+    return out
+
+
+def _run(balance, rates, fixed, installment_level, extra, relevel):
+    out = np.empty((4, len(rates)))
+    function = schedule if BACKEND == "numba" else getattr(schedule, "py_func", schedule)
+    function(float(balance), rates, bool(fixed), float(installment_level), extra, relevel, out)
+    return out[0], out[1], out[2], out[3]
+
+
+def segment(balance, rate, months, fixed, installment_level, extra=None):
+    ''' As schedule_engine._segment: constant rate & level, optional extra payments '''
+    extra = np.zeros(months) if extra is None else np.ascontiguousarray(extra[-months:], dtype=float)
+    return _run(balance, np.full(months, float(rate)), fixed, installment_level, extra, np.zeros(months, dtype=np.bool_))
+
+
+def rate_path(amount, rates, fixed, installment_level):
+    ''' Schedule for interest rates of every month - fixed installment recalculated at every rate change '''
+    rates = np.ascontiguousarray(rates, dtype=float)
+    relevel = np.r_[True, rates[1:] != rates[:-1]] if fixed else np.zeros(len(rates), dtype=np.bool_)
+    return _run(amount, rates, fixed, installment_level, np.zeros(len(rates)), relevel)
+
+
+#### CROSS-CHECK
+def cross_check(terms=(1, 12, 61, 120, 360, 612), rates=(0, .005, .0313, .095, .2), amounts=(1000, 123456.78, 300000, 2315625)):
+    ''' Compares schedules of every available backend with the reference loop (plain schedules &
+    rate paths) and with the numpy backend (overpayments) - returns list of mismatches '''
+    import schedule_engine as engine
+    backends = [name for name in BACKENDS if name != "numba" or NUMBA_VERSION is not None]
+    mismatches = []
+
+    def compare(case, expected, result):
+        for column in expected:
+            if not np.array_equal(np.asarray(expected[column], dtype=float), np.asarray(result[column], dtype=float)):
+                mismatches.append(f"{case}: {column}")
+                return
+
+    for name in backends:
+        with use_backend(name):
+            for inst_type in engine.INSTALLMENT_TYPES:
+                for n in terms:
+                    for rate in rates:
+                        for amount in amounts:
+                            case = f"{name}|{inst_type}|{n}|{rate}|{amount}"
+                            reference = engine.reference_schedule_df(amount, rate, n, inst_type)
+                            compare(case, reference, engine.schedule_arrays(amount, rate, n, inst_type))
+                    path = engine.rate_path(n, [.07, .065, .08, 0., .1], resets=max(n // 5, 1))
+                    case = f"{name}|rate path|{inst_type}|{n}"
+                    compare(case, engine.reference_rate_path_df(300000, path, inst_type),
+                            engine.rate_path_schedule_arrays(300000, 0., path, n, inst_type))
+                    overpayments = engine.recurring_overpayments(5000, start=3, every=12, n=n)
+                    for strategy in engine.OVERPAYMENT_STRATEGIES:
+                        case = f"{name}|overpayments|{strategy}|{inst_type}|{n}"
+                        with use_backend("numpy"):
+                            expected = engine.overpayment_schedule_arrays(300000, .095, n, inst_type, overpayments, strategy)
+                        compare(case, expected, engine.overpayment_schedule_arrays(300000, .095, n, inst_type, overpayments, strategy))
+    return mismatches
+
+
+def main():
+    print(f"Engine backend: {BACKEND} (numba: {NUMBA_VERSION or 'not installed'})")
+    mismatches = cross_check()
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
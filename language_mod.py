@@ -1,88 +1,42 @@
-''' This file contains callback functions 
-to modify dashboard labels depending on 
-a language selected by a user'''
+''' This file contains clientside callbacks modifying
+dashboard labels depending on a language selected by a user.
+Translations (translations.py) are kept in the browser, so
+switching the language does not call the server at all'''
 
-from dash import Input, Output, callback
+from dash import Input, Output, State, ClientsideFunction
+
+from translations import LABELS
+
+# Figures & tables built on the server with {{key}} placeholders (kept in '<id>_store')
+# and translated in the browser: (component id, property). Pie, scatter & offers charts are
+# put together from templates in the browser (see output_tab.figure_templates), as well as
+# the stress test summary table (assets/figures.js)
+TRANSLATED_OUTPUTS = [
+    ('amort_table', 'columns'),
+    ('wibor_effect_chart', 'figure'),
+    ('wibor_stress_chart', 'figure'),
+    ('offers_summary', 'columns'),
+    ('solver_chart', 'figure'),
+    ('solver_result', 'children'),
+]
 
 def lang_callbacks(app):
-    ### Dashboard title (language change)
-    @app.callback(
-        Output('title_main', 'children'),
-        Input('lang_sel', 'value')        
-    )
-    def header_change_lang(lang):
-        if lang == 1:
-            return "Mortgage Calculation & Analysis"
-        else:
-            return "Symulacja Kosztów Kredytu"
-    #### Inputs tab (langauage change)
-    @app.callback(
-        Output('title_input', 'children'),
-        Output('loan_amount_label', 'children'),
-        Output('mort_duration_label', 'children'),
-        Output('label_no_years', 'children'),
-        Output('label_no_months', 'children'),
-        Output('label_no_total', 'children'),
-        Output('label_inst_type', 'children'),
-        Output('installments_type', 'options'),
-        Output('label_mort_int', 'children'),
-        Output('bank_interest_inp', 'children'),
-        Output('WIBOR_interest_inp', 'children'),
-        Input('lang_sel', 'value')        
-    )
-    def input_change_lang(lang):
-        if lang == 1:
-            return "Input Data", "Mortgage amount", "Mortgage duration (years + months)", "Provide number of years", "Provide number of months", "Total number of installments", "Installment type", [{'label': 'Fixed', 'value': 'fixed'}, {'label': 'Descending', 'value': 'desc'}], "Mortgage total interest", "Bank %", "Base  %"
-        else:
-            return "Dane", "Kwota kredytu", "Czas spłaty (lata i miesiące)", "Podaj liczbę lat", "Podaj liczbę miesięcy", "Całkowita ilość rat", "Rodzaj raty", [{'label': 'Stała', 'value': 'fixed'}, {'label': 'Malejąca', 'value': 'desc'}], "Oprocentowanie całkowite", "Marża %", "WIBOR/WIRON %"
-    #### Outputs tab - menu (langauage change)
-    @app.callback(
-        Output('title_output', 'children'),
-        Output('overview_tab_label', 'label'),
-        Output('payment_tab_label', 'label'),
-        Output('amort_tab_label', 'label'),
-        Output('wiboreff_tab_label', 'label'),
-        Input('lang_sel', 'value')        
-    )
-    def output_change_lang(lang):
-        if lang == 1:
-            return "Details of mortgage simulation", "Overview", "Payment over time", "Amortization schedule", "Base interest change effect"
-        else:
-            return "Wyniki symulacji kredytu", "Podsumowanie", "Struktura płatności", "Harmonogram spłaty", "Wpływ zmian stopy procentowej"
-    #### Output - Overview tab (language change)
-    @app.callback(
-        Output('kpi_label', 'children'),
-        Output('kpi_note', 'children'),
-        Output('pie_label', 'children'),
-        Input('lang_sel', 'value')        
-    )
-    def output_overview_change_lang(lang):
-        if lang == 1:
-            return "Your Installment per Month:", "Please note that for descending installment type, above amount is for 1st installment only.", "Payment Breakdown",
-        else:
-            return "Wysokość Twojej miesięcznej raty:", "Uwaga! Dla raty stałej powyższa kwota dotyczy tylko pierwszej raty (kolejne maleją)", "Składowe Wpłat",
-    #### Output - Payment over time tab (language change)
-    @app.callback(
-        Output('pay_label', 'children'),
-        Output('radioitems-payment_scatter', 'options'),
-        Input('lang_sel', 'value')        
-    )
-    def output_payment_change_lang(lang):
-        if lang == 1:
-            return "Cumulative mortgage payments over time - view by:", [{"label": "Month", "value": 1}, {"label": "Year", "value": 2},]
-        else:
-            return "Suma wpłat na spłatę kredytu w czasie jego trwania - widok:", [{"label": "Miesięczny", "value": 1}, {"label": "Roczny", "value": 2},]
-    #### Output - Amortization schedule tab (language change)
-    @app.callback(
-        Output('amort_label', 'children'),
-        Output('radioitems-payment_table', 'options'),
-        Input('lang_sel', 'value')        
+    ### All dashboard labels (language change)
+    app.clientside_callback(
+        ClientsideFunction(namespace='i18n', function_name='labels'),
+        [Output(component_id, component_property) for component_id, component_property in LABELS],
+        Input('lang_sel', 'value'),
+        State('translations', 'data')
     )
-    def output_schedule_change_lang(lang):
-        if lang == 1:
-            return "Amortization Schedule - view by:", [{"label": "Month", "value": 1}, {"label": "Year", "value": 2},]
-        else:
-            return "Harmonogram spłaty kredytu - widok:", [{"label": "Miesięczny", "value": 1}, {"label": "Roczny", "value": 2},]
+    ### Figures & tables (language change or new data)
+    for component_id, component_property in TRANSLATED_OUTPUTS:
+        app.clientside_callback(
+            ClientsideFunction(namespace='i18n', function_name='translate'),
+            Output(component_id, component_property),
+            Input(component_id + '_store', 'data'),
+            Input('lang_sel', 'value'),
+            State('translations', 'data')
+        )
     # #### Output - Amortization schedule - dataframes language change
     # @app.callback(
     #     Output('installments_df', 'data'),
@@ -2,114 +2,139 @@
 for mortgage data. The class also defines a blueprint for all
 the charts creation'''
 
+import copy
+import functools
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+import schedule_engine as engine
+
+# Loan parameters - any change of them invalidates all cached data & charts
+LOAN_PARAMETERS = ("bankInterestRate", "wiborInterestRate", "loanAmount", "noOfInstallments", "installmentsType")
+
+def memoized_property(func):
+    # Property computed only once per set of loan parameters (cache kept per instance);
+    # a copy is returned, so changes of the returned data frame / figure do not change the cache
+    name = func.__name__
+    @functools.wraps(func)
+    def wrapper(self):
+        if name in self._cache:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            self._cache[name] = func(self)
+        return copy.deepcopy(self._cache[name])
+    return property(wrapper)
+
 class mortgageData:
     def __init__(self, bankInterestRate, wiborInterestRate, loanAmount, noOfInstallments, installmentsType):
+        self._cache = {}
+        self._totalInterestRate = None
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.bankInterestRate = bankInterestRate
         self.wiborInterestRate = wiborInterestRate
         self.loanAmount = loanAmount
         self.noOfInstallments = noOfInstallments
         self.installmentsType = installmentsType
-        self.totalInterestRate = self.bankInterestRate + self.wiborInterestRate
+
+    def __setattr__(self, name, value):
+        if name in LOAN_PARAMETERS and getattr(self, name, None) != value:
+            self.cache_clear()
+            if name in ("bankInterestRate", "wiborInterestRate"):
+                object.__setattr__(self, "_totalInterestRate", None)
+        object.__setattr__(self, name, value)
+
+    @property
+    def totalInterestRate(self):
+        # Sum of the rates - unless set directly (then used until one of the rates is changed)
+        if self._totalInterestRate is not None:
+            return self._totalInterestRate
+        return self.bankInterestRate + self.wiborInterestRate
+
+    @totalInterestRate.setter
+    def totalInterestRate(self, value):
+        if value != self.totalInterestRate:
+            self.cache_clear()
+        object.__setattr__(self, "_totalInterestRate", value)
+
+    def cache_clear(self):
+        self._cache.clear()
+
+    @property
+    def cache_info(self):
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "size": len(self._cache)}
     
     def calculate_first_installment(self):
-        if self.installmentsType == "fixed":
-            first_payment = round((self.loanAmount * self.totalInterestRate) / (12 * (1 - (12/(12+self.totalInterestRate)) ** self.noOfInstallments)), 2)
-            return first_payment
-        elif self.installmentsType == "desc":
-            first_payment = round(self.loanAmount * (1 / self.noOfInstallments + self.totalInterestRate / 12), 2)
-            return first_payment
+        if self.installmentsType in engine.INSTALLMENT_TYPES:
+            return engine.first_installment(self.loanAmount, self.totalInterestRate, self.noOfInstallments, self.installmentsType)
         else:
             print("Please specify installment type correctly")
             pass
 
     def calculate_first_installment_custom(self, amount, wibor):
-        if self.installmentsType == "fixed":
-            first_payment = round((amount * (self.bankInterestRate + wibor)) / (12 * (1 - (12/(12+(self.bankInterestRate + wibor))) ** self.noOfInstallments)), 2)
-            return first_payment
-        elif self.installmentsType == "desc":
-            first_payment = round(amount * (1 / self.noOfInstallments + (self.bankInterestRate + wibor) / 12), 2)
-            return first_payment
+        if self.installmentsType in engine.INSTALLMENT_TYPES:
+            return engine.first_installment(amount, self.bankInterestRate + wibor, self.noOfInstallments, self.installmentsType)
         else:
             print("Please specify installment type correctly")
             pass
 
-    @property
+    @memoized_property
     def df_installments(self):
         pd.options.display.float_format = '{:,.2f}'.format
         first_payment = self.calculate_first_installment()
-        # create lists
-        data = []
-        total_pay = 0
-        total_interest = 0
-        total_principal = 0
-        for i in range(0, self.noOfInstallments):
-            month = i + 1
-            year = (month - 1) // 12 + 1
-            if month == 1:
-                balance = self.loanAmount 
-            else:
-                balance = amount_after_payment
-            interest = round(balance * self.totalInterestRate / 12, 2) #interest part of the installment
-            if self.installmentsType == "desc": #Fixed installments
-                principal = round(self.loanAmount / self.noOfInstallments, 2)
-                installment = principal + interest
-            if self.installmentsType == "fixed": #Descending installments
-                installment = first_payment
-                principal = installment - interest
-            amount_after_payment = balance - principal
-            if amount_after_payment < 0:
-                correction = -amount_after_payment
-                amount_after_payment = 0
-                principal -= correction
-                installment -= correction
-            total_pay += installment
-            total_interest += interest
-            total_principal += principal
-            data.append([month, year, balance, installment, interest, principal, total_pay, total_interest, total_principal, amount_after_payment]) #append data to the data list
-        df_installments = pd.DataFrame(data=data, columns=["Month", "Year", "Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"])
-        return df_installments
+        return engine.schedule_df(self.loanAmount, self.totalInterestRate, self.noOfInstallments, self.installmentsType, first_payment)
     
-    @property 
+    @memoized_property
     def df_installments_yr(self):
+        # Yearly totals - sums of the (cached) monthly schedule (see engine.aggregate_arrays)
         pd.options.display.float_format = '{:,.2f}'.format
-        groups = self.df_installments.groupby(["Year"]).sum()
-        df_grouped = pd.DataFrame(data=groups, columns=["Installment", "Interest", "Principal"])
-        df_grouped["Ending Balance"] = self.loanAmount - df_grouped["Principal"].cumsum()
-        df_grouped["Balance"] = df_grouped["Ending Balance"] + df_grouped["Principal"]
-        df_grouped["Total Payment"] = df_grouped["Installment"].cumsum()
-        df_grouped["Total Interest"] = df_grouped["Interest"].cumsum()
-        df_grouped["Total Principal"] = df_grouped["Principal"].cumsum()
-        df_grouped = df_grouped[["Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"]]
-        return df_grouped.reset_index()
+        first_payment = self.calculate_first_installment()
+        return engine.yearly_schedule_df(self.loanAmount, self.totalInterestRate, self.noOfInstallments, self.installmentsType, first_payment,
+                                         self.df_installments)
+
+    def recalc_after_overpayment(self, overpayments, strategy="shorten"):
+        # overpayments: {month: amount}, e.g. engine.recurring_overpayments(...)
+        # Only months from the first edited overpayment on are recalculated - earlier months
+        # are reused from the previous result (or from the schedule without overpayments)
+        first_payment = self.calculate_first_installment()
+        schedule = self.df_installments
+        base = {column: schedule[column].to_numpy() for column in schedule.columns}
+        base_overpayments = {}
+        previous = self._cache.get("_overpayment")
+        if previous is not None and previous["strategy"] == strategy:
+            base, base_overpayments = previous["schedule"], previous["overpayments"]
+        result = engine.overpayment_schedule_arrays(self.loanAmount, self.totalInterestRate, self.noOfInstallments, self.installmentsType,
+                                                    overpayments, strategy, first_payment, base, base_overpayments)
+        self._cache["_overpayment"] = {"strategy": strategy, "overpayments": dict(overpayments), "schedule": result}
+        return pd.DataFrame({column: result[column] for column in engine.OVERPAYMENT_COLUMNS})
 
-    def recalc_after_overpayment(self):
-        pass
+    def apr(self, fees=0, insurance=0):
+        # Annual percentage rate (RRSO, as a fraction) of the schedule: one-off fees paid out of
+        # the loan amount, insurance paid with every installment (see engine.apr)
+        payments = self.df_installments["Installment"].to_numpy() + insurance
+        return float(engine.apr(self.loanAmount, payments, fees, guess=(1 + self.totalInterestRate / 12) ** 12 - 1))
 
-    @property
+    def df_installments_rate_path(self, wibor_path, resets=None):
+        # Schedule for Wibor changing over time: per-month values or values at reset months (see engine.rate_path)
+        pd.options.display.float_format = '{:,.2f}'.format
+        return engine.rate_path_schedule_df(self.loanAmount, self.bankInterestRate, wibor_path, self.noOfInstallments, self.installmentsType, resets)
+
+    @memoized_property
     def df_wibor_effect(self):
         # wibor options & amount columns hard-coded
         wibor = [0, .01, .02, .03, .04, .05, .06, .07, .08, .1, .12, .15]
-        amount = [0.1 * self.loanAmount, 0.2 * self.loanAmount, 0.3 * self.loanAmount, 0.4 * self.loanAmount, 0.5 * self.loanAmount, 0.6 * self.loanAmount, 0.7 * self.loanAmount, 0.8 * self.loanAmount, 0.9 * self.loanAmount, self.loanAmount]
-        amount.sort(reverse=True)
-        # iterate to find installment value for different loan amounts and Wibor and create column names
-        data = []
-        column_names = ["Loan Amount Left to pay"]  # Only 1st column name assigned
-        for i in range(0, len(amount)):
-            row = [amount[i]]                       # Only 1st column value assigned - amount left to pay
-            for j in range(0, len(wibor)):
-                temp_installment = self.calculate_first_installment_custom(amount[i], wibor[j])
-                row.append(temp_installment)
-                # get column names - wibor amounts
-                if i == 0:
-                    column_names.append(str(round((wibor[j]*100), 1)) + "%")
-            data.append(row)
-        df_wibor_effect = pd.DataFrame(data=data, columns=column_names)
+        amount = self.loanAmount * np.arange(10, 0, -1) / 10
+        # installment value for all loan amounts and Wibor values at once
+        installments = engine.installment_grid(amount, wibor, self.bankInterestRate, self.noOfInstallments, self.installmentsType)
+        column_names = [str(round((w*100), 1)) + "%" for w in wibor]
+        df_wibor_effect = pd.DataFrame(installments, columns=column_names)
+        df_wibor_effect.insert(0, "Loan Amount Left to pay", amount)
         return df_wibor_effect
 
-    @property
+    @memoized_property
     def wibor_effect_to_list(self):
         return {'z': self.df_wibor_effect.iloc[:,1:].values.tolist(),
                 'x': self.df_wibor_effect.iloc[:,1:].columns.tolist(),
@@ -169,7 +194,7 @@ class mortgageData:
                 }
         })
     
-    @property
+    @memoized_property
     def monthlyInstallmentsScatter_fig(self):
         # Data for scatter plot - monthly
         x_series = self.df_installments["Month"]
@@ -187,7 +212,7 @@ class mortgageData:
         plot_installments_def = self.create_plot_installments_def(x_series, trace_balance, trace_totalPay, trace_totalInt, trace_totalPrin, x_axis_title, y_axis_title)
         return go.Figure(plot_installments_def)
     
-    @property
+    @memoized_property
     def yearlyInstallmentsScatter_fig(self):
         # Data for scatter plot - yearly
         x_series = self.df_installments_yr["Year"]
@@ -234,7 +259,7 @@ class mortgageData:
                 }
         })
     
-    @property
+    @memoized_property
     def paymentSplit_piePlot_fig(self):
         # Data for pie plot
         labels_ = ['Total Principal','Total Interest']
@@ -287,7 +312,7 @@ class mortgageData:
             }
         })
    
-    @property
+    @memoized_property
     def wiborEffect_HeatMap_fig(self):
         # Get the plot
         heatMap_def = self.create_heatMap_def(self.wibor_effect_to_list)
@@ -336,6 +361,7 @@ class mortgageData:
         rowOddColor = 'dimgrey'
         # Get basic data for the table
         payment_table_data = self.payment_table_data_def(period_type)
+        rows = len(payment_table_data["values"][0])
         # Return final input to create the table
         return dict({
             "data": [
@@ -361,8 +387,8 @@ class mortgageData:
                     "color": "white",
                     "width": .2
                 },
-                # 2-D list of colors for alternating rows
-                "fill_color": [[rowOddColor,rowEvenColor]*1000],
+                # 2-D list of colors for alternating rows (one color per row)
+                "fill_color": [[[rowOddColor, rowEvenColor][i % 2] for i in range(rows)]],
                 "align": payment_table_data["values_align"],
                 # "font": {
                 #   "color": "white",
@@ -374,14 +400,14 @@ class mortgageData:
             }
         })
     
-    @property
+    @memoized_property
     def installmentsTable_monthly(self):
         period_type = "Month"
         # Get the plot - Monthly installments table
         table_def = self.create_table_installments_def(period_type)
         return go.Figure(table_def)
 
-    @property
+    @memoized_property
     def installmentsTable_yearly(self):
         period_type = "Year"
         # Get the plot - Yearly installments table
@@ -4,21 +4,30 @@ in the visualization. Also included callbacks
 to make input tab (as well entire application 
 reactive to user changes'''
 
-from dash import dcc, html
-from dash import Input, Output, callback
+import json
+import pkgutil
+
+from dash import dcc, html, dash_table
+from dash.dash_table.Format import Format, Group, Scheme, Symbol
+from dash import Input, Output, State, ClientsideFunction, callback
 
 import dash_bootstrap_components as dbc
 
-import pandas as pd
 import plotly.graph_objs as go
 
-from mortgage import mortgageData as mD
-
-# Initial Data:
-mortgage = mD(.02, .075, 300000, 360, 'fixed')
+import schedule_engine as engine
+import schedule_store
+import table_query
+from data_calc_callbacks import calc_schedule, WIBOR_GRID_DEFAULTS, WIBOR_GRID_MAX_SIZE, STRESS_DEFAULTS, STRESS_MAX_PATHS, COMPARE_MAX_OFFERS, SOLVER_DEFAULTS
+from defaults import DEFAULT_OFFERS
+from translations import t
 
 # Set up plots templates:
 plot_template = 'plotly_white'
+# Maximum number of heatmap cells with values displayed
+HEATMAP_MAX_TEXT_CELLS = 400
+# Rows of the amortization schedule sent to the browser at once
+AMORT_PAGE_SIZE = 60
 
 #### OUTPUT DATA TAB - definition of GUI components
 # 1. Ovierview tab content
@@ -43,7 +52,7 @@ overview_content = html.Div([
                 dbc.Label("Payment Breakdown", id="pie_label", color="primary"),
                 html.Br(),
                 html.Hr(className="my-2"),
-                dbc.Spinner(dcc.Graph(id='pie_plot_split', figure=mortgage.paymentSplit_piePlot_fig), size="lg")               
+                dbc.Spinner(dcc.Graph(id='pie_plot_split'), size="lg")               
             ], 
             className="h-100 p-2 text-primary bg-white",
             style={"margin-top": "20px", "margin-right": "10px"})
@@ -63,7 +72,7 @@ payment_content = html.Div([
         id="radioitems-payment_scatter",
         inline=True,
     ),
-    dbc.Spinner(dcc.Graph(id='monthly_install_chart', figure=mortgage.monthlyInstallmentsScatter_fig), size="lg")
+    dbc.Spinner(dcc.Graph(id='monthly_install_chart'), size="lg")
 ])
 
 # 3. Amortization schedule tab content
@@ -79,12 +88,174 @@ amort_content = html.Div([
         inline=True,
     ),
     html.Br(),
-    dbc.Spinner(html.Div(id='table_wrapper', style={"maxHeight": "400px", "overflow": "scroll"}), size="lg")
+    # Filtering, sorting & pagination on the server - only the visible page of rows is sent
+    html.Div(id='table_wrapper', children=dash_table.DataTable(
+        id='amort_table',
+        page_current=0,
+        page_size=AMORT_PAGE_SIZE,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='multi',
+        filter_action='custom',
+        filter_query='',
+        fixed_rows={'headers': True},
+        style_table={"maxHeight": "400px", "overflowY": "auto"},
+        style_header={"fontWeight": "bold"},
+        style_cell={"fontSize": 13, "minWidth": "90px"},
+        style_data_conditional=[{"if": {"row_index": "odd"}, "backgroundColor": "rgba(0, 0, 0, 0.05)"}],
+    ))
 ])
 
 # 4. WIBOR changes sensitivity tab
 wiboreff_content = html.Div([
-    dbc.Spinner(dcc.Graph(id='wibor_effect_chart', figure=mortgage.wiborEffect_HeatMap_fig), size="lg")
+    dbc.RadioItems(
+        id="wiboreff_mode",
+        options=[
+            {"label": "Static grid", "value": 1},
+            {"label": "Stochastic (Monte Carlo)", "value": 2},
+        ],
+        value=1,
+        inline=True,
+        style={"margin-top": "20px"},
+    ),
+    html.Div(id="wiboreff_grid", children=[
+        dbc.Label("Heatmap grid - base interest range & number of balance rows:", id="grid_label", style={"margin-top": "10px"}),
+        dbc.Row([
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="grid_rate_min_inp", children="From %"),
+                dbc.Input(id="grid_rate_min", type="number", min=0, step=0.1, value=WIBOR_GRID_DEFAULTS['rate_min'], debounce=True)],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="grid_rate_max_inp", children="To %"),
+                dbc.Input(id="grid_rate_max", type="number", min=0, step=0.1, value=WIBOR_GRID_DEFAULTS['rate_max'], debounce=True)],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="grid_rate_step_inp", children="Step %"),
+                dbc.Input(id="grid_rate_step", type="number", min=0.01, step=0.01, value=WIBOR_GRID_DEFAULTS['rate_step'], debounce=True)],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="grid_rows_inp", children="Rows"),
+                dbc.Input(id="grid_rows", type="number", min=1, max=WIBOR_GRID_MAX_SIZE, step=1, value=WIBOR_GRID_DEFAULTS['rows'], debounce=True)],
+                size="sm"
+            )),
+        ]),
+        dbc.Spinner(dcc.Graph(id='wibor_effect_chart'), size="lg")
+    ]),
+    html.Div(id="wiboreff_stress", style={"display": "none"}, children=[
+        dbc.Label("Simulated base interest paths (mean-reverting) - settings:", id="stress_label", style={"margin-top": "10px"}),
+        dbc.Row([
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="stress_paths_inp", children="Paths"),
+                dbc.Input(id="stress_paths", type="number", min=1, max=STRESS_MAX_PATHS, step=1, value=STRESS_DEFAULTS['paths'], debounce=True)],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="stress_mean_inp", children="Long-term %"),
+                dbc.Input(id="stress_mean", type="number", min=0, step=0.1, placeholder="current", debounce=True)],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="stress_volatility_inp", children="Volatility %"),
+                dbc.Input(id="stress_volatility", type="number", min=0, step=0.1, value=STRESS_DEFAULTS['volatility'], debounce=True)],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="stress_reset_inp", children="Reset (months)"),
+                dbc.Select(id="stress_reset", options=[{"label": str(m), "value": m} for m in (1, 3, 6, 12)], value=STRESS_DEFAULTS['reset'])],
+                size="sm"
+            )),
+            dbc.Col(dbc.InputGroup([
+                dbc.InputGroupText(id="stress_seed_inp", children="Seed"),
+                dbc.Input(id="stress_seed", type="number", min=0, step=1, value=STRESS_DEFAULTS['seed'], debounce=True)],
+                size="sm"
+            )),
+        ]),
+        dbc.Spinner([
+            dcc.Graph(id='wibor_stress_chart'),
+            html.Div(id='wibor_stress_summary'),
+        ], size="lg"),
+    ]),
+])
+
+# 5. Offers comparison tab - offers edited in the table, all calculated at once
+money_format = Format(precision=2, scheme=Scheme.fixed, group=Group.yes)
+compare_content = html.Div([
+    dbc.Label("Offers for the mortgage amount - bank margin, base interest, term, installment type & one-off fees:",
+              id="offers_label", style={"margin-top": "20px"}),
+    dash_table.DataTable(
+        id='offers_table',
+        columns=[
+            {"name": "Offer", "id": "name"},
+            {"name": "Bank %", "id": "bank_rate", "type": "numeric"},
+            {"name": "Base %", "id": "base_rate", "type": "numeric"},
+            {"name": "Months", "id": "term", "type": "numeric"},
+            {"name": "Installment type", "id": "type", "presentation": "dropdown"},
+            {"name": "Fees, PLN", "id": "fees", "type": "numeric"},
+        ],
+        data=DEFAULT_OFFERS,
+        dropdown={"type": {"options": [{'label': 'Fixed', 'value': 'fixed'}, {'label': 'Descending', 'value': 'desc'}], "clearable": False}},
+        editable=True,
+        row_deletable=True,
+        style_header={"fontWeight": "bold"},
+        style_cell={"fontSize": 13, "minWidth": "70px"},
+        # dropdowns are cut off by the table otherwise
+        css=[{"selector": ".Select-menu-outer", "rule": "display: block !important"}],
+    ),
+    dbc.Button("Add offer", id="offers_add", size="sm", color="secondary", style={"margin-top": "10px"}),
+    dbc.Spinner([
+        dcc.Graph(id='offers_chart'),
+        dash_table.DataTable(
+            id='offers_summary',
+            style_header={"fontWeight": "bold"},
+            style_cell={"fontSize": 13, "minWidth": "90px"},
+            # the cheapest offer (total cost) in bold
+            style_data_conditional=[{"if": {"filter_query": "{vs_best} = 0"}, "fontWeight": "bold"}],
+        ),
+    ], size="lg"),
+])
+
+# 6. Affordability tab - inverse calculation for a monthly budget (other values from the input data)
+solver_content = html.Div([
+    dbc.Label("Calculate for a monthly budget (other values are taken from the input data):", id="solver_label", style={"margin-top": "20px"}),
+    dbc.RadioItems(
+        id="solver_target",
+        options=[
+            {"label": "Maximum loan amount", "value": "amount"},
+            {"label": "Required number of installments", "value": "term"},
+            {"label": "Maximum base interest", "value": "rate"},
+        ],
+        value=SOLVER_DEFAULTS['target'],
+        inline=True,
+    ),
+    dbc.Row([
+        dbc.Col(dbc.InputGroup([
+            dbc.InputGroupText(id="solver_budget_inp", children="Budget, PLN"),
+            dbc.Input(id="solver_budget", type="number", min=0, step=100, value=SOLVER_DEFAULTS['budget'], debounce=True)],
+            size="sm"
+        )),
+        dbc.Col(dbc.InputGroup([
+            dbc.InputGroupText(id="solver_budget_min_inp", children="Chart from"),
+            dbc.Input(id="solver_budget_min", type="number", min=0, step=100, value=SOLVER_DEFAULTS['budget_min'], debounce=True)],
+            size="sm"
+        )),
+        dbc.Col(dbc.InputGroup([
+            dbc.InputGroupText(id="solver_budget_max_inp", children="To"),
+            dbc.Input(id="solver_budget_max", type="number", min=0, step=100, value=SOLVER_DEFAULTS['budget_max'], debounce=True)],
+            size="sm"
+        )),
+        dbc.Col(dbc.InputGroup([
+            dbc.InputGroupText(id="solver_budget_step_inp", children="Step"),
+            dbc.Input(id="solver_budget_step", type="number", min=0, step=50, value=SOLVER_DEFAULTS['budget_step'], debounce=True)],
+            size="sm"
+        )),
+    ], style={"margin-top": "10px"}),
+    dbc.Spinner([
+        html.Div(id='solver_result', className="p-2 text-primary bg-light border rounded-3", style={"margin-top": "10px"}),
+        dcc.Graph(id='solver_chart'),
+    ], size="lg"),
 ])
 
 ###### Apply layout of Output panel as a composition of tabs defined above ######
@@ -97,155 +268,111 @@ outputs = html.Div([
         dbc.Tab(payment_content, id="payment_tab_label", label="Payment over time"),
         dbc.Tab(amort_content, id="amort_tab_label", label="Amortization schedule"),
         dbc.Tab(wiboreff_content, id="wiboreff_tab_label", label="Base interest effect"),
+        dbc.Tab(compare_content, id="compare_tab_label", label="Compare offers"),
+        dbc.Tab(solver_content, id="solver_tab_label", label="Affordability"),
     ])
 ],style = {"margin-left": "7px", "margin-top": "7px", "margin-right": "7px"})
 
 
 #### CALLBACKS ####
+# Figures & tables are built with text placeholders (translations.t) and kept in '<id>_store' -
+# texts of the selected language are put in the browser (see language_mod.py)
 def output_callbacks(app):
 
-    # 1. Installment KPI - display of 1st installment definition & update
+    # 1. Schedule of the loan - KPI, pie chart data and monthly & yearly results (scatter chart series and
+    # the schedule of the amortization table) in one call from the inputs (figures are built in the browser
+    # from the stores, see figure_templates)
     @app.callback(
         Output('kpi_installment', 'children'),
-        Input('first_installment', 'data'),
-        Input('lang_sel', 'value')
+        Output('pie_plot_split_store', 'data'),
+        Output('schedule_periods', 'data'),
+        Input('principal_value', 'value'),
+        Input('no_of_installments_t', 'value'),
+        Input('installments_type', 'value'),
+        Input('bank_interest', 'value'),
+        Input('wibor_interest', 'value'),
     )
-    def display_KPI_installment(data, lang):
-        return f"{data:,.2f}" + " zł"
+    def update_schedule(principal, install_no, install_type, interest_b, interest_w):
+        schedule = calc_schedule(principal, install_no, install_type, (interest_b + interest_w) / 100)
+        return (f"{schedule['first_installment']:,.2f}" + " zł",
+                {"values": schedule['totals']},
+                {period: schedule[period] for period in ('monthly', 'yearly')})
 
-    # 2. Pie plot - payments split - chart definition & update
-    @app.callback(
+    # 2. Monthly / yearly view of the scatter chart - picked in the browser from the stored results
+    # (no server call when the view is switched)
+    app.clientside_callback(
+        ClientsideFunction(namespace='schedule', function_name='chart'),
+        Output('monthly_install_chart_store', 'data'),
+        Input('schedule_periods', 'data'),
+        Input('radioitems-payment_scatter', 'value')
+    )
+
+    # 3. Monthly / yearly view of the amortization table - schedule picked in the browser from the stored results
+    app.clientside_callback(
+        ClientsideFunction(namespace='schedule', function_name='table'),
+        Output('installments_df_sel_amort', 'data'),
+        Input('schedule_periods', 'data'),
+        Input('radioitems-payment_table', 'value')
+    )
+
+    # 4. Pie plot - payments split - only values are sent (see figure_templates)
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='pie'),
         Output('pie_plot_split', 'figure'),
-        Input('installments_df', 'data'),
-        Input('lang_sel', 'value')
+        Input('pie_plot_split_store', 'data'),
+        Input('lang_sel', 'value'),
+        State('translations', 'data'),
+        State('figure_templates', 'data')
     )
-    def update_pie_plot(data, lang):
-        df_installments = pd.read_json(data, orient='split')
-        # Data for pie plot
-        labels = ['Total Principal','Total Interest'] if lang == 1 else ['Całkowity kapitał','Suma odsetek']
-        values = [df_installments["Total Principal"].max(), df_installments["Total Interest"].max()]
-        colors_ = ['#18BC9C', '#2C3E50']
-        chart_title = "Payment breakdown" if lang == 1 else "Składowe wpłat"
-        # Get the plot
-        piePlot_def = dict({
-            "data": [
-                {
-                    "type": "pie",
-                    "labels": labels,
-                    "values": values,
-                    "textinfo": "label+percent",
-                    "texttemplate": "<b>%{label}</b><br>%{value:,.2f} zł<br><b>(%{percent})</b>",
-                    "insidetextorientation": "radial",
-                    "hovertemplate": "<b>%{label}</b><br>%{value:,.2f} zł<br><b>(%{percent})</b><extra></extra>",    
-                    "hoverinfo": "label+percent+value",
-                    "hole": .4,
-                    "marker": {"colors": colors_}                          
-                }],
-            "layout": 
-                {
-                    # "title": 
-                    #     {
-                    #         "text": chart_title
-                    #     },
-                    "legend": {
-                        "yanchor": "bottom",
-                        "y": -.1,
-                        "xanchor": "center",
-                        "x": .5,
-                        "orientation": "h"
-                    },
-                    "margin": {"t": 0},
-                    "template" : plot_template,
-                }
-        })
-        return go.Figure(piePlot_def)
 
-    # 3. Payment over time - scatter chart definition & update
-    @app.callback(
+    # 5. Payment over time - scatter chart - only x & y arrays are sent (see figure_templates)
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='scatter'),
         Output('monthly_install_chart', 'figure'),
-        Input('installments_df_sel', 'data'),
+        Input('monthly_install_chart_store', 'data'),
         Input('lang_sel', 'value'),
-        Input('radioitems-payment_scatter', 'value')
+        State('translations', 'data'),
+        State('figure_templates', 'data')
     )
-    def update_scatter(data, lang, period):
-        if period == 1:
-            df_installments = pd.read_json(data, orient='split')
-            x_series = df_installments["Month"]
-            trace_balance = df_installments["Balance"]
-            trace_totalPay = df_installments["Total Payment"]
-            trace_totalInt = df_installments["Total Interest"]
-            trace_totalPrin = df_installments["Total Principal"]
-            chart_title = "Cumulative mortgage payments over time" if lang == 1 else "Suma wpłat na spłatę kredytu w czasie jego trwania"
-            x_axis_title = "Month" if lang == 1 else "Miesiąc"
-            y_axis_title = "Cumulative payment, PLN" if lang == 1 else "Suma wpłat, PLN"
-            balance_name = "Balance" if lang == 1 else "Kapitał do spłaty"
-            total_pay_name = "Total payment" if lang == 1 else "Suma wpłat"
-            tot_interest = "Total Interest" if lang == 1 else "Suma odsetek"
-            tot_principal = "Total Principal" if lang == 1 else "Suma spłaconego kapitału"
-            traces = [trace_balance, trace_totalPay, trace_totalInt, trace_totalPrin]
-            traces_names = [balance_name, total_pay_name, tot_interest, tot_principal]
-            axes_names = [x_axis_title, y_axis_title]
-            hovertemplates = ["<b>Month</b>: %{x}"+"<br>"+"<b>Balance: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Miesiąc</b>: %{x}"+"<br>"+"<b>Kapitał do spłaty: </b>: %{y:,.2f} zł<extra></extra>",
-            "<b>Month</b>: %{x}"+"<br>"+"<b>Total Payment: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Miesiąc</b>: %{x}"+"<br>"+"<b>Suma wpłat: </b>: %{y:,.2f} zł<extra></extra>",
-            "<b>Month</b>: %{x}"+"<br>"+"<b>Total Interest paid: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Miesiąc</b>: %{x}"+"<br>"+"<b>Suma zapłaconych odsetek: </b>: %{y:,.2f} zł<extra></extra>",
-            "<b>Month</b>: %{x}"+"<br>"+"<b>Total Principal paid: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Miesiąc</b>: %{x}"+"<br>"+"<b>Spłacony kapitał: </b>: %{y:,.2f} zł<extra></extra>"]
-            fig_def = create_scatter_definition(x_series, traces, traces_names, chart_title, axes_names, hovertemplates)    
-        else:
-            df_installments_yr = pd.read_json(data, orient='split')
-            x_series = df_installments_yr["Year"]
-            trace_balance = df_installments_yr["Balance"]
-            trace_totalPay = df_installments_yr["Total Payment"]
-            trace_totalInt = df_installments_yr["Total Interest"]
-            trace_totalPrin = df_installments_yr["Total Principal"]
-            chart_title = "Cumulative mortgage payments over time" if lang == 1 else "Suma wpłat na spłatę kredytu w czasie jego trwania"
-            x_axis_title = "Year" if lang == 1 else "Rok"
-            y_axis_title = "Cumulative payment, PLN" if lang == 1 else "Suma wpłat, PLN"
-            balance_name = "Balance" if lang == 1 else "Kapitał do spłaty"
-            total_pay_name = "Total payment" if lang == 1 else "Suma wpłat"
-            tot_interest = "Total Interest" if lang == 1 else "Suma odsetek"
-            tot_principal = "Total Principal" if lang == 1 else "Suma spłaconego kapitału"
-            traces = [trace_balance, trace_totalPay, trace_totalInt, trace_totalPrin]
-            traces_names = [balance_name, total_pay_name, tot_interest, tot_principal]
-            axes_names = [x_axis_title, y_axis_title]
-            hovertemplates = ["<b>Year</b>: %{x}"+"<br>"+"<b>Balance: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Rok</b>: %{x}"+"<br>"+"<b>Kapitał do spłaty: </b>: %{y:,.2f} zł<extra></extra>",
-            "<b>Year</b>: %{x}"+"<br>"+"<b>Total Payment: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Rok</b>: %{x}"+"<br>"+"<b>Suma wpłat: </b>: %{y:,.2f} zł<extra></extra>",
-            "<b>Year</b>: %{x}"+"<br>"+"<b>Total Interest paid: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Rok</b>: %{x}"+"<br>"+"<b>Suma zapłaconych odsetek: </b>: %{y:,.2f} zł<extra></extra>",
-            "<b>Year</b>: %{x}"+"<br>"+"<b>Total Principal paid: </b>: %{y:,.2f} zł<extra></extra>" if lang == 1 else "<b>Rok</b>: %{x}"+"<br>"+"<b>Spłacony kapitał: </b>: %{y:,.2f} zł<extra></extra>"]
-            fig_def = create_scatter_definition(x_series, traces, traces_names, chart_title, axes_names, hovertemplates)
-        return go.Figure(fig_def)
-
-    # 4. Amortization schedule table
+
+    # 6. Amortization schedule table - columns (monthly / yearly view)
     @app.callback(
-        Output('table_wrapper', 'children'),
-        Input('installments_df_sel_amort', 'data'),
-        Input('lang_sel', 'value'),
+        Output('amort_table_store', 'data'),
         Input('radioitems-payment_table', 'value')
     )
-    def update_table(data, lang, period):
-        df_en = pd.read_json(data, orient='split')
-        if lang == 1:
-            df = df_en
-        else:
-            df_pl = df_en.copy()
-            if period == 1:
-                df_pl.rename(columns = {"Year":'Rok', "Balance":'Do spłaty', 'Installment':'Rata', "Interest": "Odsetki", "Principal": "Kapitał", "Total Payment": "Suma wpłat", "Total Interest": "Zapłacone odsetki", "Total Principal": "Spłacony kapitał", "Ending Balance": "Do spłaty - po"}, inplace = True)
-            else:
-                df_pl.rename(columns = {"Month": "Miesiąc", "Year":'Rok', "Balance":'Do spłaty', 'Installment':'Rata', "Interest": "Odsetki", "Principal": "Kapitał", "Total Payment": "Suma wpłat", "Total Interest": "Zapłacone odsetki", "Total Principal": "Spłacony kapitał", "Ending Balance": "Do spłaty - po"}, inplace = True)
-            df = df_pl
-        return dbc.Table.from_dataframe(df.round(2), id="amort_table", striped=True, bordered=True, hover=True, index=False, size="sm"),
-
-    # 5. WIBOR effect chart - definition & update
+    def update_table_columns(period):
+        columns = engine.SCHEDULE_COLUMNS if period == 1 else ["Year"] + engine.AGGREGATE_COLUMNS
+        money = Format(precision=2, scheme=Scheme.fixed, group=Group.yes)
+        return [dict({"name": t("col." + column), "id": column, "type": "numeric"}, **({} if column in ("Month", "Year") else {"format": money}))
+                for column in columns]
+
+    # 7. Amortization schedule table - rows of the current page (schedule taken from the server-side store)
+    @app.callback(
+        Output('amort_table', 'data'),
+        Output('amort_table', 'page_count'),
+        Input('installments_df_sel_amort', 'data'),
+        Input('amort_table', 'page_current'),
+        Input('amort_table', 'page_size'),
+        Input('amort_table', 'sort_by'),
+        Input('amort_table', 'filter_query')
+    )
+    def update_table(data, page_current, page_size, sort_by, filter_query):
+        df = schedule_store.load(data)
+        return table_query.table_page(df, page_current, page_size, sort_by, filter_query)
+
+    # 8. WIBOR effect chart - definition & update
     @app.callback(
-        Output('wibor_effect_chart', 'figure'),
+        Output('wibor_effect_chart_store', 'data'),
         Input('wibor_eff_store', 'data'),
         Input('bank_interest', 'value'),
-        Input('lang_sel', 'value')
     )
-    def create_heatMap_plot(wibor_data, bank_interest, lang):
-        chart_title = f"Base interest impact on installment value (bank interest: {bank_interest}%)" if lang == 1 else f"Wpływ wysokości stopy procentowej (WIRON/WIBOR) na ratę kredytu (marża banku: {bank_interest}%)"
-        xaxis_title = "Base interest, %" if lang == 1 else "Wysokość stopy procentowej (WIRON/WIBOR), %"
-        yaxis_title = "Mortgage balanace to pay" if lang == 1 else "Kwota pozostała do spłacenia"
-        legend_title = "Installment value" if lang == 1 else "Wysokość raty"
+    def create_heatMap_plot(wibor_data, bank_interest):
+        chart_title = t('heatmap_title') + f" {bank_interest}%)"
+        xaxis_title = t('heatmap_xaxis')
+        yaxis_title = t('heatmap_yaxis')
+        legend_title = t('heatmap_legend')
+        # values are displayed in cells only if the grid is small enough to read them
+        show_text = len(wibor_data["x"]) * len(wibor_data["y"]) <= HEATMAP_MAX_TEXT_CELLS
         heatmap_plot_def = dict({
             "data": [
                 {
@@ -255,15 +382,12 @@ def output_callbacks(app):
                     "z": wibor_data["z"],
                     "text": wibor_data["z"],
                     "colorscale": "rdbu_r",
-                    "texttemplate": "%{text}",
+                    "texttemplate": "%{text}" if show_text else "",
                     "textfont": {"size":10},
                     "name": "Balance",
-                    "hovertemplate": "<b>Base interest</b>: %{x}"+
-                                        "<br><b>Principal left to pay</b>: %{y} zł<br>"+
-                                        "<b>Installment:</b> %{z} zł"+
-                                        "<extra></extra>" if lang == 1 else "<b>Stopa procentowa (WIRON/WIBOR)</b>: %{x}"+
-                                        "<br><b>Kapitał do spłacenia</b>: %{y} zł<br>"+
-                                        "<b>Rata:</b> %{z} zł"+
+                    "hovertemplate": "<b>" + t('hover_base_interest') + "</b>: %{x}%"+
+                                        "<br><b>" + t('hover_principal_left') + "</b>: %{y} zł<br>"+
+                                        "<b>" + t('hover_installment') + "</b> %{z} zł"+
                                         "<extra></extra>"
                 }],
             "layout": {
@@ -278,6 +402,7 @@ def output_callbacks(app):
                     "text": xaxis_title,
                     "font_size": 16
                 },
+                "xaxis_ticksuffix": "%",
                 "yaxis_title": {
                     "text": yaxis_title,
                     "font_size": 16
@@ -292,48 +417,243 @@ def output_callbacks(app):
         # Get the plot
         return go.Figure(heatmap_plot_def)
     
-    ###### Other methods:
-    def create_scatter_definition(x_series, traces, traces_names, chart_title, axes_names, hovertemplates):
-        colors = ["#18BC9C", "#2C3E50","#F39C12", "#3498DB", "#E74C3C"]
-        fig_def = dict({
-            "data": [],
-            "layout": 
-                {
-                    # "title": 
-                    #     {
-                    #         "text": chart_title,
-                    #         "font": {
-                    #             # "family": "OpenSans"
-                    #             # "family": "Times New Roman"
-                    #             "family": "Roboto",
-                    #             # "style": "normal",
-                    #             # "weight": 400
-                    #         }
-                    #     },
-                    "xaxis":
-                        {
-                            "title": axes_names[0],
-                            "title_font_size": 16,
-                            # "title_font_family": "Roboto",
-                        },
-                    "yaxis":
-                        {
-                            "title": axes_names[1],
-                            "title_font_size": 16,
-                            # "title_font_family": "Roboto",
-                        },
-                    "legend": {
-                        "yanchor": "bottom",
-                        "y": -0.25,
-                        "xanchor": "center",
-                        "x": .5,
-                        "orientation": "h",
-                        "font_size": 14,
+    # 9. Base interest effect - static grid or stochastic mode
+    @app.callback(
+        Output('wiboreff_grid', 'style'),
+        Output('wiboreff_stress', 'style'),
+        Input('wiboreff_mode', 'value')
+    )
+    def switch_wiboreff_mode(mode):
+        if mode == 2:
+            return {"display": "none"}, {}
+        return {}, {"display": "none"}
+
+    # 10. Base interest stress test - installment distribution chart & summary table data
+    @app.callback(
+        Output('wibor_stress_chart_store', 'data'),
+        Output('wibor_stress_summary_store', 'data'),
+        Input('wibor_stress_store', 'data'),
+    )
+    def create_stress_plot(stress):
+        if not stress:
+            return go.Figure(), None
+        percentiles = stress["percentiles"]
+        installment = stress["installment"]
+        x_axis_title = t('year')
+        y_axis_title = t('average_installment')
+        worst_name = t('worst_case')
+        colors = ["#18BC9C", "#2C3E50", "#E74C3C"]
+        data = []
+        # bands between symmetric percentiles (e.g. 5-95, 25-75) and the median line
+        for i in range(len(percentiles) // 2):
+            low, high = installment[i], installment[-1 - i]
+            band_name = f"{percentiles[i]}-{percentiles[-1 - i]}%"
+            data.append({"type": "scatter", "x": stress["years"], "y": low, "mode": "lines", "line": {"width": 0},
+                         "showlegend": False, "hoverinfo": "skip"})
+            data.append({"type": "scatter", "x": stress["years"], "y": high, "mode": "lines", "line": {"width": 0},
+                         "fill": "tonexty", "fillcolor": f"rgba(24, 188, 156, {.2 + .2 * i})", "name": band_name, "hoverinfo": "skip"})
+        if len(percentiles) % 2:
+            data.append({"type": "scatter", "x": stress["years"], "y": installment[len(percentiles) // 2], "name": t('median'),
+                         "line": {"color": colors[1], "width": 3}, "hovertemplate": "%{y:,.2f} zł<extra></extra>"})
+        data.append({"type": "scatter", "x": stress["years"], "y": stress["worst_case"]["installment"], "name": worst_name,
+                     "line": {"color": colors[2], "width": 2, "dash": "dot"}, "hovertemplate": "%{y:,.2f} zł<extra></extra>"})
+        fig_def = {
+            "data": data,
+            "layout": {
+                "xaxis": {"title": x_axis_title, "title_font_size": 16},
+                "yaxis": {"title": y_axis_title, "title_font_size": 16},
+                "legend": {"yanchor": "bottom", "y": -0.3, "xanchor": "center", "x": .5, "orientation": "h"},
+                "hovermode": "x unified",
+                "margin": {"t": 20},
+                "template": plot_template,
+            }
+        }
+        # plain data - the table is put together in the browser (figures.summary)
+        rows = [[f"{p}%", total, highest] for p, total, highest in zip(percentiles, stress["total_interest"], stress["max_installment"])]
+        rows.append([worst_name, stress["worst_case"]["total_interest"], stress["worst_case"]["max_installment"]])
+        summary = {"header": ["", t('total_interest'), t('highest_installment')], "rows": rows}
+        return go.Figure(fig_def), summary
+
+    # 11. Base interest stress test - summary table put together in the browser (see assets/figures.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='summary'),
+        Output('wibor_stress_summary', 'children'),
+        Input('wibor_stress_summary_store', 'data'),
+        Input('lang_sel', 'value'),
+        State('translations', 'data')
+    )
+
+    # 12. Offers comparison - new offer (copy of the last one, to be edited)
+    @app.callback(
+        Output('offers_table', 'data'),
+        Input('offers_add', 'n_clicks'),
+        State('offers_table', 'data'),
+        prevent_initial_call=True,
+    )
+    def add_offer(n_clicks, offers):
+        offers = offers or []
+        if len(offers) >= COMPARE_MAX_OFFERS:
+            return offers
+        offer = dict(offers[-1] if offers else DEFAULT_OFFERS[0])
+        offer['name'] = f"#{len(offers) + 1}"
+        return offers + [offer]
+
+    # 13. Offers comparison - cumulative cost curves: only x & y arrays are sent (see figure_templates)
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='offers'),
+        Output('offers_chart', 'figure'),
+        Input('offers_store', 'data'),
+        Input('lang_sel', 'value'),
+        State('translations', 'data'),
+        State('figure_templates', 'data')
+    )
+
+    # 14. Offers comparison - summary table
+    @app.callback(
+        Output('offers_summary_store', 'data'),
+        Output('offers_summary', 'data'),
+        Input('offers_store', 'data'),
+    )
+    def update_offers_summary(offers):
+        columns = [{"name": t('offer'), "id": "name"}]
+        columns += [{"name": t(column), "id": column, "type": "numeric", "format": money_format}
+                    for column in ("first_installment", "highest_installment", "total_interest", "fees", "total_cost", "vs_best", "total_payment")]
+        columns.append({"name": t('apr'), "id": "apr", "type": "numeric", "format": Format(precision=2, scheme=Scheme.fixed, symbol=Symbol.yes, symbol_suffix="%")})
+        return columns, offers["summary"]
+
+    # 15. Affordability - result for the budget & chart of results for the grid of budgets
+    @app.callback(
+        Output('solver_chart_store', 'data'),
+        Output('solver_result_store', 'data'),
+        Input('solver_store', 'data'),
+    )
+    def create_solver_plot(solution):
+        target, value = solution["target"], solution["value"]
+        if value is None:
+            text = t('solver_impossible')
+        elif target == 'term':
+            text = f"{value:.0f} ({value // 12:.0f} {t('solver_years')} {value % 12:.0f} {t('solver_months')})"
+        elif target == 'rate':
+            text = f"{value:.2f}%"
+        else:
+            text = f"{value:,.2f} zł"
+        hover = {"amount": "%{y:,.2f} zł", "term": "%{y:.0f}", "rate": "%{y:.2f}%"}[target]
+        fig_def = {
+            "data": [
+                {"type": "scatter", "x": solution["x"], "y": solution["y"], "mode": "lines", "name": t('solver_' + target),
+                 "line": {"color": "#18BC9C", "width": 3}, "hovertemplate": "%{x:,.0f} zł: " + hover + "<extra></extra>"},
+                {"type": "scatter", "x": [solution["budget"]], "y": [value], "mode": "markers", "name": t('solver_budget'),
+                 "marker": {"color": "#E74C3C", "size": 12}, "hovertemplate": "%{x:,.0f} zł: " + hover + "<extra></extra>"},
+            ],
+            "layout": {
+                "xaxis": {"title": {"text": t('solver_budget_axis'), "font": {"size": 16}}},
+                "yaxis": {"title": {"text": t('solver_' + target), "font": {"size": 16}}},
+                "legend": {"yanchor": "bottom", "y": -0.3, "xanchor": "center", "x": .5, "orientation": "h"},
+                "margin": {"t": 20},
+                "template": plot_template,
+            }
+        }
+        result = [
+            dbc.Label(t('solver_result_' + target) + f" {solution['budget']:,.2f} zł:", color="primary"),
+            html.H3(text, className="display-7"),
+        ]
+        return go.Figure(fig_def), result
+
+
+# Static parts of the pie, scatter & offers figures (layout, colors, texts) - sent to the browser once
+# (dcc.Store 'figure_templates'); callbacks send only values which are put into the templates
+def pie_plot_definition():
+    colors_ = ['#18BC9C', '#2C3E50']
+    return dict({
+        "data": [
+            {
+                "type": "pie",
+                "labels": [t('total_principal'), t('total_interest')],
+                "textinfo": "label+percent",
+                "texttemplate": "<b>%{label}</b><br>%{value:,.2f} zł<br><b>(%{percent})</b>",
+                "insidetextorientation": "radial",
+                "hovertemplate": "<b>%{label}</b><br>%{value:,.2f} zł<br><b>(%{percent})</b><extra></extra>",
+                "hoverinfo": "label+percent+value",
+                "hole": .4,
+                "marker": {"colors": colors_}
+            }],
+        "layout":
+            {
+                "legend": {
+                    "yanchor": "bottom",
+                    "y": -.1,
+                    "xanchor": "center",
+                    "x": .5,
+                    "orientation": "h"
+                },
+                "margin": {"t": 0},
+            }
+    })
+
+def scatter_definition(period):
+    period_name = t('month') if period == 1 else t('year')
+    traces_names = [t('balance'), t('total_payment'), t('total_interest'), t('total_principal_paid')]
+    axes_names = [period_name, t('cumulative_payment')]
+    hovertemplates = ["<b>" + period_name + "</b>: %{x}" + "<br>" + "<b>" + t(key) + "</b>: %{y:,.2f} zł<extra></extra>"
+                      for key in ('hover_balance', 'hover_total_payment', 'hover_total_interest', 'hover_total_principal')]
+    return create_scatter_definition([], [[]] * len(traces_names), traces_names, axes_names, hovertemplates)
+
+def offers_plot_definition():
+    # one line per offer - the trace is copied for every offer in the browser
+    fig_def = create_scatter_definition([], [], [], [t('month'), t('cumulative_cost')], [])
+    fig_def["layout"]["hovermode"] = "x unified"
+    fig_def["trace"] = {"type": "scatter", "mode": "lines", "hovertemplate": "%{y:,.2f} zł", "line": {"width": 2}}
+    return fig_def
+
+def figure_templates():
+    # Plain plotly.js definitions; the theme, read from plotly package data, is added in the browser
+    theme = json.loads(pkgutil.get_data('plotly', f'package_data/templates/{plot_template}.json'))
+    return {
+        "theme": theme,
+        "pie": pie_plot_definition(),
+        "scatter": {period: scatter_definition(period) for period in (1, 2)},
+        "offers": offers_plot_definition(),
+    }
+
+###### Other methods:
+def create_scatter_definition(x_series, traces, traces_names, axes_names, hovertemplates):
+    colors = ["#18BC9C", "#2C3E50","#F39C12", "#3498DB", "#E74C3C"]
+    fig_def = dict({
+        "data": [],
+        "layout": 
+            {
+                # "title": 
+                #     {
+                #         "text": chart_title,
+                #         "font": {
+                #             # "family": "OpenSans"
+                #             # "family": "Times New Roman"
+                #             "family": "Roboto",
+                #             # "style": "normal",
+                #             # "weight": 400
+                #         }
+                #     },
+                "xaxis":
+                    {
+                        "title": {"text": axes_names[0], "font": {"size": 16}},
+                        # "title_font_family": "Roboto",
                     },
-                    "margin": {"t": 20},
-                    "template" : plot_template
-                }
-        })
-        for i in range (0, len(traces)):
-            fig_def["data"].append({"type": "scatter", "x": x_series, "y": traces[i], "name": traces_names[i], "hovertemplate": hovertemplates[i], "marker": {"color": colors[i]}, "line": {"width": 3}})    
-        return fig_def
+                "yaxis":
+                    {
+                        "title": {"text": axes_names[1], "font": {"size": 16}},
+                        # "title_font_family": "Roboto",
+                    },
+                "legend": {
+                    "yanchor": "bottom",
+                    "y": -0.25,
+                    "xanchor": "center",
+                    "x": .5,
+                    "orientation": "h",
+                    "font": {"size": 14},
+                },
+                "margin": {"t": 20},
+            }
+    })
+    for i in range (0, len(traces)):
+        fig_def["data"].append({"type": "scatter", "x": x_series, "y": traces[i], "name": traces_names[i], "hovertemplate": hovertemplates[i], "marker": {"color": colors[i]}, "line": {"width": 3}})    
+    return fig_def
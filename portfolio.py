@@ -0,0 +1,304 @@
+''' This file contains batch (portfolio) API of the schedule engine.
+Schedules of many loans are calculated at once as 2-D arrays
+(loan x month). Loans with shorter terms are padded with zeros
+after their last installment (see 'mask'). Rounding is exactly
+the same as for a single loan in schedule_engine.'''
+
+import numpy as np
+
+import schedule_engine as engine
+
+SUMMARY_COLUMNS = ["First Installment", "Total Interest", "Total Payment", "Total Principal", "APR"]
+# Fields of a loan definition (files, HTTP API): rates in %, as in the dashboard
+LOAN_FIELDS = ["amount", "bank_rate", "base_rate", "term", "type"]
+# Optional costs of a loan definition (PLN, 0 if missing): one-off fees paid out of the amount
+# and insurance paid with every installment - included in the APR
+COST_FIELDS = ["fees", "insurance"]
+# Longest term (months) of a loan definition - as in the dashboard (50 years and 12 months)
+MAX_TERM = 612
+
+
+def _as_arrays(amounts, bank_rates, base_rates, terms, types):
+    amounts = np.atleast_1d(np.asarray(amounts, dtype=float))
+    size = len(amounts)
+    bank_rates = np.broadcast_to(np.asarray(bank_rates, dtype=float), size)
+    base_rates = np.broadcast_to(np.asarray(base_rates, dtype=float), size)
+    terms = np.broadcast_to(np.asarray(terms, dtype=int), size)
+    types = np.broadcast_to(np.asarray(types), size)
+    unknown = set(np.unique(types)) - set(engine.INSTALLMENT_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown installment type(s): {sorted(unknown)}")
+    return amounts, bank_rates + base_rates, terms, types == "fixed"
+
+
+def first_installments(amounts, rates, terms, fixed):
+    payment = np.empty(len(amounts))
+    payment[fixed] = engine.first_installment(amounts[fixed], rates[fixed], terms[fixed], "fixed")
+    payment[~fixed] = engine.first_installment(amounts[~fixed], rates[~fixed], terms[~fixed], "desc")
+    return payment
+
+
+def _balance_before(amounts, principal):
+    balance = np.empty(principal.shape)
+    balance[:, 0] = amounts
+    balance[:, 1:] = principal[:, :-1]
+    return np.subtract.accumulate(balance, axis=1, out=balance)
+
+
+def batch_schedules(amounts, bank_rates, base_rates, terms, types, fixed_point=False):
+    ''' Returns dictionary of 2-D arrays (loan x month) for all loans
+    padded to the longest term; single values are used for all loans.
+    fixed_point: calculated in int64 grosz (see engine.fixed_point_schedule_arrays) '''
+    amounts, rates, terms, fixed = _as_arrays(amounts, bank_rates, base_rates, terms, types)
+    if fixed_point:
+        return fixed_point_schedules(amounts, rates, terms, fixed)
+    months = np.arange(max(terms.max(initial=0), 1))
+    mask = months[None, :] < terms[:, None]
+    monthly_rate = rates[:, None] / 12
+    payment = first_installments(amounts, rates, terms, fixed)
+    # Descending installments: the same principal part every month
+    principal_part = engine.round2(amounts / np.maximum(terms, 1))
+    installment = np.where(mask & fixed[:, None], payment[:, None], 0.)
+    # Closed-form annuity balance (without rounding) is a starting point for fixed installments,
+    # then rounded interest is propagated until it does not change (as in schedule_engine)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + monthly_rate) ** months
+        balance = np.where(monthly_rate > 0, amounts[:, None] * growth - payment[:, None] * (growth - 1) / monthly_rate,
+                           amounts[:, None] - payment[:, None] * months)
+    balance = np.where(fixed[:, None], balance, amounts[:, None] - principal_part[:, None] * months)
+    interest = np.where(mask, engine.round2(balance * rates[:, None] / 12), 0.)
+    principal = np.where(fixed[:, None], installment - interest, np.where(mask, principal_part[:, None], 0.))
+    balance = _balance_before(amounts, principal)
+    # Loans are independent - only loans changed in the previous pass are recalculated
+    active = np.arange(len(amounts))
+    start = 0
+    while active.size:
+        interest_next = np.where(mask[active, start:], engine.round2(balance[active, start:] * rates[active, None] / 12), 0.)
+        changed = interest_next != interest[active, start:]
+        changed_rows = np.flatnonzero(changed.any(axis=1))
+        if not changed_rows.size:
+            break
+        shift = np.flatnonzero(changed[changed_rows].any(axis=0))[0]
+        active, start = active[changed_rows], start + shift
+        interest[active, start:] = interest_next[changed_rows, shift:]
+        principal[active, start:] = np.where(fixed[active, None], installment[active, start:] - interest[active, start:], principal[active, start:])
+        balance[active, start:] = _balance_before(balance[active, start], principal[active, start:])
+    installment = np.where(fixed[:, None], installment, principal + interest)
+    ending_balance = balance - principal
+    # Last installment is corrected, so that the balance does not go below 0
+    overpaid = (ending_balance < 0) & mask
+    rows = np.flatnonzero(overpaid.any(axis=1))
+    if rows.size:
+        cols = overpaid[rows].argmax(axis=1)
+        correction = -ending_balance[rows, cols]
+        principal[rows, cols] -= correction
+        installment[rows, cols] -= correction
+        ending_balance[rows, cols] = 0
+        after = months[None, :] > cols[:, None]
+        for column in (balance, interest, principal, installment, ending_balance):
+            column[rows] = np.where(after, 0., column[rows])
+    # Padding after the last installment
+    balance = np.where(mask, balance, 0.)
+    ending_balance = np.where(mask, ending_balance, 0.)
+    return {
+        "mask": mask,
+        "terms": terms,
+        "first_installment": payment,
+        "Balance": balance,
+        "Installment": installment,
+        "Interest": interest,
+        "Principal": principal,
+        "Total Payment": np.cumsum(installment, axis=1),
+        "Total Interest": np.cumsum(interest, axis=1),
+        "Total Principal": np.cumsum(principal, axis=1),
+        "Ending Balance": ending_balance,
+    }
+
+
+def _grosz_loans(amounts, rates, terms, fixed):
+    # Loan parameters converted to grosz & rate units once per loan (exact decimal arithmetic)
+    amounts = np.array([engine.to_grosz(amount) for amount in amounts], dtype=np.int64)
+    rates = np.array([engine.to_rate_units(rate) for rate in rates], dtype=np.int64)
+    levels = [engine.installment_level_grosz(amount, rate, n, "fixed" if is_fixed else "desc")
+              for amount, rate, n, is_fixed in zip(amounts, rates, terms, fixed)]
+    return amounts, rates, terms, fixed, levels
+
+
+def fixed_point_schedules(amounts, rates, terms, fixed):
+    schedules = _grosz_schedules(*_grosz_loans(amounts, rates, terms, fixed))
+    months = np.arange(schedules["Balance"].shape[1])
+    result = {"mask": months[None, :] < terms[:, None], "terms": terms,
+              # first installment as paid (for descending installments: principal part + interest of the 1st month)
+              "first_installment": schedules["Installment"][:, 0] / engine.GROSZ}
+    for column in ["Balance", "Installment", "Interest", "Principal"]:
+        result[column] = schedules[column] / engine.GROSZ
+    for column in ["Installment", "Interest", "Principal"]:
+        result["Total " + ("Payment" if column == "Installment" else column)] = np.cumsum(schedules[column], axis=1) / engine.GROSZ
+    result["Ending Balance"] = schedules["Ending Balance"] / engine.GROSZ
+    return result
+
+
+def _grosz_schedules(amounts, rates, terms, fixed, levels):
+    # As batch_schedules in int64 grosz (see engine._grosz_segment): amounts & levels (fixed installment /
+    # principal part) in grosz, annual rates in engine.RATE_SCALE units
+    amounts = np.asarray(amounts, dtype=np.int64)
+    rates = np.asarray(rates, dtype=np.int64)
+    terms = np.asarray(terms, dtype=np.int64)
+    fixed = np.asarray(fixed, dtype=bool)
+    levels = np.asarray(levels, dtype=np.int64)
+    divisor = 12 * engine.RATE_SCALE
+    if amounts.size and int(amounts.max()) * int(rates.max()) + divisor > np.iinfo(np.int64).max:
+        raise ValueError("Amount and interest rate too large for the fixed-point mode")
+    months = np.arange(max(int(terms.max(initial=0)), 1))
+    mask = months[None, :] < terms[:, None]
+
+    def interest_of(balance, rows):
+        return np.where(mask[rows, -balance.shape[1]:], (balance * rates[rows, None] + divisor // 2) // divisor, 0)
+
+    def principal_of(interest, rows):
+        return np.where(mask[rows, -interest.shape[1]:], np.where(fixed[rows, None], levels[rows, None] - interest, levels[rows, None]), 0)
+
+    def balance_before(balance_start, principal):
+        balance = np.empty(principal.shape, dtype=np.int64)
+        balance[:, 0] = 0
+        np.cumsum(principal[:, :-1], axis=1, out=balance[:, 1:])
+        return balance_start[:, None] - balance
+
+    rows = np.arange(len(amounts))
+    # Starting point: exact balance (desc) or closed-form annuity balance (fixed)
+    monthly_rate = rates[:, None] / divisor
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + monthly_rate) ** months
+        annuity = np.where(monthly_rate > 0, amounts[:, None] * growth - levels[:, None] * (growth - 1) / monthly_rate,
+                           amounts[:, None] - levels[:, None] * months)
+    balance = np.where(fixed[:, None], np.rint(np.nan_to_num(annuity)).clip(0, amounts[:, None]), amounts[:, None] - levels[:, None] * months)
+    balance = balance.astype(np.int64)
+    interest = interest_of(balance, rows)
+    principal = principal_of(interest, rows)
+    balance = balance_before(amounts, principal)
+    # Only loans changed in the previous pass are recalculated, from the first changed month
+    active = rows[fixed]
+    start = 0
+    while active.size:
+        interest_next = interest_of(balance[active, start:], active)
+        changed = interest_next != interest[active, start:]
+        changed_rows = np.flatnonzero(changed.any(axis=1))
+        if not changed_rows.size:
+            break
+        shift = np.flatnonzero(changed[changed_rows].any(axis=0))[0]
+        active, start = active[changed_rows], start + shift
+        interest[active, start:] = interest_next[changed_rows, shift:]
+        principal[active, start:] = principal_of(interest[active, start:], active)
+        balance[active, start:] = balance_before(balance[active, start], principal[active, start:])
+    installment = np.where(mask, principal + interest, 0)
+    ending_balance = balance - principal
+    # Last installment is corrected, so that the balance does not go below 0 - following months are zeroed
+    overpaid = (ending_balance < 0) & mask
+    corrected = np.flatnonzero(overpaid.any(axis=1))
+    if corrected.size:
+        cols = overpaid[corrected].argmax(axis=1)
+        correction = ending_balance[corrected, cols]
+        principal[corrected, cols] += correction
+        installment[corrected, cols] += correction
+        ending_balance[corrected, cols] = 0
+        after = months[None, :] > cols[:, None]
+        for column in (balance, interest, principal, installment, ending_balance):
+            column[corrected] = np.where(after, 0, column[corrected])
+    balance = np.where(mask, balance, 0)
+    ending_balance = np.where(mask, ending_balance, 0)
+    return {
+        "Balance": balance,
+        "Installment": installment,
+        "Interest": interest,
+        "Principal": principal,
+        "Ending Balance": ending_balance,
+    }
+
+
+def _apr(amounts, rates, installments, mask, fees, insurance):
+    # APR (%) of calculated schedules - the effective rate of the nominal interest is
+    # a close starting point of Newton steps (the same for loans without any costs)
+    payments = installments + np.where(mask, np.broadcast_to(insurance, amounts.shape)[:, None], 0.)
+    return engine.apr(amounts, payments, fees, guess=(1 + rates / 12) ** 12 - 1) * 100
+
+
+def batch_summary(amounts, bank_rates, base_rates, terms, types, chunk_size=500, fixed_point=False, fees=0., insurance=0.):
+    ''' Returns per-loan summary (dictionary of 1-D arrays) without building data frames.
+    Loans are processed in chunks of similar terms, which keeps both padding and memory low.
+    APR (%) includes one-off fees & monthly insurance (single values or per loan) '''
+    amounts, rates, terms, fixed = _as_arrays(amounts, bank_rates, base_rates, terms, types)
+    fees = np.broadcast_to(np.asarray(fees, dtype=float), amounts.shape)
+    insurance = np.broadcast_to(np.asarray(insurance, dtype=float), amounts.shape)
+    summary = {column: np.empty(len(amounts)) for column in SUMMARY_COLUMNS}
+    order = np.argsort(terms, kind="stable")
+    for first in range(0, len(order), chunk_size):
+        idx = order[first:first + chunk_size]
+        if fixed_point:
+            # totals summed in grosz - without cumulative columns
+            schedules = _grosz_schedules(*_grosz_loans(amounts[idx], rates[idx], terms[idx], fixed[idx]))
+            summary["First Installment"][idx] = schedules["Installment"][:, 0] / engine.GROSZ
+            summary["Total Interest"][idx] = schedules["Interest"].sum(axis=1) / engine.GROSZ
+            summary["Total Payment"][idx] = schedules["Installment"].sum(axis=1) / engine.GROSZ
+            summary["Total Principal"][idx] = schedules["Principal"].sum(axis=1) / engine.GROSZ
+            mask = np.arange(schedules["Installment"].shape[1])[None, :] < terms[idx, None]
+            summary["APR"][idx] = _apr(amounts[idx], rates[idx], schedules["Installment"] / engine.GROSZ, mask, fees[idx], insurance[idx])
+            continue
+        schedules = batch_schedules(amounts[idx], rates[idx], 0., terms[idx], np.where(fixed[idx], "fixed", "desc"))
+        summary["First Installment"][idx] = schedules["first_installment"]
+        summary["Total Interest"][idx] = schedules["Total Interest"][:, -1]
+        summary["Total Payment"][idx] = schedules["Total Payment"][:, -1]
+        summary["Total Principal"][idx] = schedules["Total Principal"][:, -1]
+        summary["APR"][idx] = _apr(amounts[idx], rates[idx], schedules["Installment"], schedules["mask"], fees[idx], insurance[idx])
+    return summary
+
+
+def offers_comparison(amounts, bank_rates, base_rates, terms, types, fees):
+    ''' Returns cumulative cost (one-off fees + interest paid) of every offer - 2-D array (offer x month),
+    constant after the last installment - and totals of offers; all offers are calculated at once '''
+    schedules = batch_schedules(amounts, bank_rates, base_rates, terms, types)
+    amounts, rates = _as_arrays(amounts, bank_rates, base_rates, terms, types)[:2]
+    fees = np.broadcast_to(np.asarray(fees, dtype=float), schedules["terms"].shape)
+    cost = fees[:, None] + schedules["Total Interest"]
+    return {
+        "terms": schedules["terms"],
+        "cost": cost,
+        "First Installment": schedules["Installment"][:, 0],
+        "Highest Installment": schedules["Installment"].max(axis=1, initial=0),
+        "Total Interest": schedules["Total Interest"][:, -1],
+        "Fees": fees,
+        "Total Cost": cost[:, -1],
+        "Total Payment": schedules["Total Payment"][:, -1] + fees,
+        "APR": _apr(amounts, rates, schedules["Installment"], schedules["mask"], fees, 0.),
+    }
+
+
+def parse_loan(row, number):
+    ''' Returns loan (dictionary) defined by a row (strings or numbers) - ValueError if not valid '''
+    missing = [field for field in LOAN_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Loan {number}: missing {', '.join(missing)}")
+    try:
+        loan = {
+            "id": row.get("id") or number,
+            "amount": float(row["amount"]),
+            "bank_rate": float(row["bank_rate"]),
+            "base_rate": float(row["base_rate"]),
+            "term": float(row["term"]),
+            "type": str(row["type"]).strip(),
+        }
+        loan.update((field, 0. if row.get(field) in (None, '') else float(row[field])) for field in COST_FIELDS)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Loan {number}: {error}") from None
+    # term in whole months - also written as a float (e.g. "360.0" exported from a data frame)
+    if not loan["term"].is_integer():
+        raise ValueError(f"Loan {number}: term has to be a whole number of months")
+    loan["term"] = int(loan["term"])
+    if loan["type"] not in engine.INSTALLMENT_TYPES:
+        raise ValueError(f"Loan {number}: unknown installment type {loan['type']!r}")
+    if not np.isfinite([loan["amount"], loan["bank_rate"], loan["base_rate"]]).all():
+        raise ValueError(f"Loan {number}: amount and rates have to be finite")
+    if loan["amount"] <= 0 or not 1 <= loan["term"] <= MAX_TERM:
+        raise ValueError(f"Loan {number}: amount has to be positive and term between 1 and {MAX_TERM} months")
+    if not all(np.isfinite(loan[field]) and loan[field] >= 0 for field in COST_FIELDS):
+        raise ValueError(f"Loan {number}: {' and '.join(COST_FIELDS)} have to be finite and not negative")
+    return loan
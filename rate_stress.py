@@ -0,0 +1,190 @@
+''' This file contains Monte Carlo stress test of a loan against
+base interest rate (WIBOR / WIRON) changes. Rate paths are simulated
+with a mean-reverting (Ornstein-Uhlenbeck / Vasicek) process, kept
+constant between resets, and the loan is calculated over all paths
+at once as 2-D arrays (path x month) - with the same rounding as
+schedule_engine.rate_path_schedule_arrays for a single path.
+Paths are generated in blocks with their own random streams (spawned
+from one seed), so results are reproducible whatever the number of
+worker processes or the memory budget. Settings (environment):
+- MORTGAGE_STRESS_WORKERS: number of worker processes (default: number of CPUs)
+- MORTGAGE_STRESS_MEMORY_MB: memory budget for arrays of a single worker (default 256)'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import schedule_engine as engine
+
+STRESS_WORKERS = int(os.environ.get('MORTGAGE_STRESS_WORKERS', os.cpu_count() or 1))
+STRESS_MEMORY_MB = int(os.environ.get('MORTGAGE_STRESS_MEMORY_MB', 256))
+# Paths generated with one random stream (and calculated by one task)
+PATH_BLOCK = 1000
+# Runs with fewer paths are calculated in the current process
+POOL_MIN_PATHS = 20000
+# Approximate number of (path x month) float arrays alive during calculation
+ARRAYS_PER_PATH = 12
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def simulate_base_rates(n_paths, n, start_rate, mean_rate=None, speed=.3, volatility=.01, reset_every=3, floor=0., rng=None):
+    ''' Returns base rate paths (paths x months): rate is reset every `reset_every` months following
+    mean-reverting process (exact transition of Ornstein-Uhlenbeck), starting from current rate.
+    Speed of reversion and volatility are annual, rates are floored (0 by default) '''
+    rng = np.random.default_rng(rng)
+    mean_rate = start_rate if mean_rate is None else mean_rate
+    resets = -(-n // reset_every)
+    dt = reset_every / 12
+    decay = np.exp(-speed * dt)
+    scale = volatility * np.sqrt((1 - decay ** 2) / (2 * speed) if speed > 0 else dt)
+    shocks = rng.standard_normal((n_paths, resets - 1))
+    rates = np.empty((n_paths, resets))
+    rates[:, 0] = start_rate
+    for j in range(1, resets):
+        rates[:, j] = mean_rate + (rates[:, j - 1] - mean_rate) * decay + scale * shocks[:, j - 1]
+    rates = np.maximum(rates, floor)
+    return np.repeat(rates, reset_every, axis=1)[:, :n]
+
+
+def _balance_before(amount, principal):
+    balance = np.empty(principal.shape)
+    balance[:, 0] = amount
+    balance[:, 1:] = principal[:, :-1]
+    return np.subtract.accumulate(balance, axis=1, out=balance)
+
+
+def stress_schedules(amount, bank_rate, base_rates, n, inst_type):
+    ''' Returns installment & interest (paths x months) for every base rate path (paths x months).
+    Fixed installment is recalculated whenever the rate changes (see engine.rate_path_schedule_arrays) '''
+    if inst_type not in engine.INSTALLMENT_TYPES:
+        raise ValueError(f"Unknown installment type: {inst_type}")
+    rates = bank_rate + np.asarray(base_rates, dtype=float)
+    paths = len(rates)
+    if inst_type == "desc":
+        principal = np.full((paths, n), round(amount / n, 2))
+        balance = _balance_before(amount, principal[:1])
+        interest = engine.round2(balance * rates / 12)
+        installment = principal + interest
+    else:
+        # Segments between months in which rate of any path changes; within a path,
+        # installment is carried over from the last segment with a different rate
+        starts = np.flatnonzero(np.r_[True, (rates[:, 1:] != rates[:, :-1]).any(axis=0)])
+        lengths = np.diff(np.r_[starts, n])
+        start_rates = rates[:, starts]
+        rate_changed = np.c_[np.ones(paths, dtype=bool), start_rates[:, 1:] != start_rates[:, :-1]]
+        last_change = np.maximum.accumulate(np.where(rate_changed, np.arange(len(starts)), 0), axis=1)
+        with np.errstate(divide='ignore'):
+            denominator = np.where(start_rates == 0, n - starts, 12 * (1 - (12 / (12 + start_rates)) ** (n - starts)))
+        numerator_rates = np.where(start_rates == 0, 1., start_rates)
+        segment_rows = np.arange(paths)[:, None]
+
+        def levels(active, segment, balance):
+            # installments of segments from the given one (not carried over from earlier segments)
+            return engine.round2(balance[:, starts[segment:]] * numerator_rates[active, segment:] / denominator[active, segment:])
+
+        balance = _guess(amount, rates, starts, lengths, n)
+        interest = engine.round2(balance * rates / 12)
+        level = levels(slice(None), 0, balance)
+        installment = np.repeat(level[segment_rows, last_change], lengths, axis=1)
+        principal = installment - interest
+        balance = _balance_before(amount, principal)
+        # Paths are independent - only paths changed in the previous pass are recalculated,
+        # from the first changed month (months before it are final)
+        active = np.arange(paths)
+        start = 0
+        while True:
+            segment = np.searchsorted(starts, start)
+            interest_next = engine.round2(balance[active, start:] * rates[active, start:] / 12)
+            level_next = levels(active, segment, balance[active])
+            changed_interest = interest_next != interest[active, start:]
+            changed_level = (level_next != level[active, segment:]) & rate_changed[active, segment:]
+            interest[active, start:] = interest_next
+            level[active, segment:] = level_next
+            changed = changed_interest.any(axis=1) | changed_level.any(axis=1)
+            if not changed.any():
+                break
+            active, changed_interest, changed_level = active[changed], changed_interest[changed], changed_level[changed]
+            first_interest = start + changed_interest.any(axis=0).argmax() if changed_interest.any() else n
+            first_level = starts[segment + changed_level.any(axis=0).argmax()] if changed_level.any() else n
+            start = min(first_interest, first_level)
+            installment[active, start:] = np.repeat(level[active][segment_rows[:len(active)], last_change[active]], lengths, axis=1)[:, start:]
+            principal[active, start:] = installment[active, start:] - interest[active, start:]
+            balance[active, start:] = _balance_before(balance[active, start], principal[active, start:])
+    # Last installment is corrected, so that the balance does not go below 0
+    ending_balance = balance - principal
+    overpaid = ending_balance < 0
+    if overpaid.any():
+        first = np.where(overpaid.any(axis=1), overpaid.argmax(axis=1), n)
+        after = np.arange(n)[None, :] > first[:, None]
+        corrected = np.flatnonzero(first < n)
+        installment[corrected, first[corrected]] += ending_balance[corrected, first[corrected]]
+        installment = np.where(after, 0., installment)
+        interest = np.where(after, 0., interest)
+    return installment, interest
+
+
+def _guess(amount, rates, starts, lengths, n):
+    # Balance (not rounded) of loans re-annuitized at every segment start - see engine._rate_path_guess
+    monthly = rates[:, starts] / 12
+    remaining = n - starts
+    offset = np.arange(n) - np.repeat(starts, lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_all = (1 + monthly) ** remaining
+        ratio = np.where(monthly > 0, (growth_all - (1 + monthly) ** lengths) / (growth_all - 1), 1 - lengths / remaining)
+        segment_balance = amount * np.c_[np.ones(len(rates)), np.cumprod(ratio[:, :-1], axis=1)]
+        monthly = rates / 12
+        remaining, growth_all = (np.repeat(values, lengths, axis=-1) for values in (remaining, growth_all))
+        within = np.where(monthly > 0, (growth_all - (1 + monthly) ** offset) / (growth_all - 1), 1 - offset / remaining)
+    return np.repeat(segment_balance, lengths, axis=1) * within
+
+
+def _stress_block(task):
+    # One block of paths (own random stream) calculated in chunks fitting the memory budget
+    loan, scenario, paths, seed, chunk = task
+    base_rates = simulate_base_rates(paths, loan['n'], rng=np.random.default_rng(seed), **scenario)
+    edges = engine.bucket_edges(loan['n'], 12)
+    result = {'total_interest': [], 'max_installment': [], 'yearly_installment': []}
+    for first in range(0, paths, chunk):
+        installment, interest = stress_schedules(loan['amount'], loan['bank_rate'], base_rates[first:first + chunk], loan['n'], loan['inst_type'])
+        result['total_interest'].append(interest.sum(axis=1))
+        result['max_installment'].append(installment.max(axis=1))
+        result['yearly_installment'].append(np.add.reduceat(installment, edges[:-1], axis=1) / np.diff(edges))
+    return {key: np.concatenate(values) for key, values in result.items()}
+
+
+def run_stress(amount, bank_rate, n, inst_type, start_rate, n_paths=10000, mean_rate=None, speed=.3, volatility=.01,
+               reset_every=3, seed=None, percentiles=PERCENTILES, workers=STRESS_WORKERS, memory_mb=STRESS_MEMORY_MB):
+    ''' Returns distributions of installment & total interest over simulated base rate paths:
+    percentiles of average installment in every year, of total interest and of the highest installment,
+    together with the worst case - the path with the highest total interest (all values as lists,
+    ready to be kept in dcc.Store) '''
+    if n_paths < 1:
+        raise ValueError("Number of paths has to be positive")
+    loan = {'amount': amount, 'bank_rate': bank_rate, 'n': n, 'inst_type': inst_type}
+    scenario = {'start_rate': start_rate, 'mean_rate': mean_rate, 'speed': speed, 'volatility': volatility, 'reset_every': reset_every}
+    workers = max(1, min(workers, -(-n_paths // PATH_BLOCK))) if n_paths >= POOL_MIN_PATHS else 1
+    chunk = max(1, memory_mb * 2 ** 20 // (n * 8 * ARRAYS_PER_PATH))
+    blocks = [min(PATH_BLOCK, n_paths - first) for first in range(0, n_paths, PATH_BLOCK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    tasks = [(loan, scenario, paths, block_seed, chunk) for paths, block_seed in zip(blocks, seeds)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_stress_block, tasks))
+    else:
+        results = [_stress_block(task) for task in tasks]
+    total_interest = np.concatenate([r['total_interest'] for r in results])
+    max_installment = np.concatenate([r['max_installment'] for r in results])
+    yearly_installment = np.concatenate([r['yearly_installment'] for r in results])
+    worst = np.argmax(total_interest)
+    return {
+        'paths': n_paths,
+        'percentiles': list(percentiles),
+        'years': list(range(1, yearly_installment.shape[1] + 1)),
+        'installment': np.round(np.percentile(yearly_installment, percentiles, axis=0), 2).tolist(),
+        'total_interest': np.round(np.percentile(total_interest, percentiles), 2).tolist(),
+        'max_installment': np.round(np.percentile(max_installment, percentiles), 2).tolist(),
+        'mean': {'total_interest': round(float(total_interest.mean()), 2), 'max_installment': round(float(max_installment.mean()), 2)},
+        'worst_case': {'total_interest': round(float(total_interest[worst]), 2), 'max_installment': round(float(max_installment[worst]), 2),
+                       'installment': np.round(yearly_installment[worst], 2).tolist()},
+    }
@@ -0,0 +1,731 @@
+''' This file contains array-based (NumPy) engine used to
+calculate mortgage installments schedule. Balance, interest,
+principal and all the cumulative columns are calculated on
+whole arrays instead of a month-by-month loop, while keeping
+exactly the same rounding as the original loop (kept here as
+a reference implementation). With a JIT backend (see engine_kernels)
+the recurrence of a schedule runs as a compiled loop instead.
+Fixed-point mode (fixed_point=True) calculates schedules in int64 grosz
+instead of floats: interest is rounded half up with integer arithmetic
+and balances & totals are exact integer sums, so results do not depend
+on float noise and are the same on every machine.'''
+
+from decimal import Decimal, ROUND_HALF_UP, localcontext
+
+import numpy as np
+
+import engine_kernels as kernels
+
+# pandas is imported only by functions returning data frames - it is not needed to start the application
+
+SCHEDULE_COLUMNS = ["Month", "Year", "Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"]
+OVERPAYMENT_COLUMNS = ["Month", "Year", "Balance", "Installment", "Interest", "Principal", "Overpayment", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"]
+RATE_PATH_COLUMNS = ["Month", "Year", "Interest Rate", "Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"]
+OVERPAYMENT_STRATEGIES = ("shorten", "lower")
+AGGREGATE_COLUMNS = ["Balance", "Installment", "Interest", "Principal", "Total Payment", "Total Interest", "Total Principal", "Ending Balance"]
+INSTALLMENT_TYPES = ("fixed", "desc")
+# Fixed-point mode: amounts in grosz (1/100 PLN), annual interest rates in units of 1e-8
+GROSZ = 100
+RATE_SCALE = 10 ** 8
+
+
+def round2(values):
+    # np.round scales by 100 before rounding, so values laying (almost) exactly at half a grosz
+    # can be rounded differently than by Python's round() - those few are rounded one by one
+    values = np.asarray(values, dtype=float)
+    scaled = np.atleast_1d(values * 100)
+    rounded_scaled = np.rint(scaled)
+    ties = np.abs(scaled - rounded_scaled) > .4999
+    rounded = rounded_scaled / 100
+    if ties.any():
+        rounded[ties] = [round(float(v), 2) for v in np.atleast_1d(values)[ties]]
+    return rounded.reshape(values.shape)
+
+
+def first_installment(amount, rate, n, inst_type):
+    # Works for single values as well as for (broadcastable) arrays of loans
+    if inst_type == "fixed":
+        if np.ndim(rate) == 0 and not rate:
+            payment = amount / n
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                payment = np.where(rate == 0, amount / n, (amount * rate) / (12 * (1 - (12/(12+rate)) ** n)))
+    elif inst_type == "desc":
+        payment = amount * (1 / n + rate / 12)
+    else:
+        raise ValueError(f"Unknown installment type: {inst_type}")
+    if np.ndim(payment) == 0:
+        return round(float(payment), 2)
+    return round2(payment)
+
+
+def _balance_before(amount, principal):
+    # Balance at the beginning of each month - subtracted one by one (as in the loop),
+    # so that float results are exactly the same
+    balance = np.empty(len(principal))
+    balance[0] = amount
+    balance[1:] = principal[:-1]
+    return np.subtract.accumulate(balance, out=balance)
+
+
+def grid_axis(start, stop, step):
+    # Evenly spaced values from start to stop (inclusive)
+    return np.round(np.arange(start, stop + step / 2, step), 10)
+
+
+def installment_grid(amounts, base_rates, bank_rate, n, inst_type):
+    ''' First installment for every pair of balance (rows) and base rate (columns) - one broadcasted pass '''
+    amounts = np.asarray(amounts, dtype=float)[:, None]
+    rates = bank_rate + np.asarray(base_rates, dtype=float)[None, :]
+    return first_installment(amounts, rates, n, inst_type)
+
+
+def wibor_effect_grid(loan_amount, bank_rate, n, inst_type, rate_min=0, rate_max=.15, rate_step=.01, balance_steps=10):
+    ''' Rate-sensitivity grid ready for the heatmap: x - base rates (%), y - balance left to pay, z - installments '''
+    rates = grid_axis(rate_min, rate_max, rate_step)
+    amounts = loan_amount * np.arange(balance_steps, 0, -1) / balance_steps
+    installments = installment_grid(amounts, rates, bank_rate, n, inst_type)
+    return {'x': np.round(rates * 100, 4).tolist(), 'y': np.round(amounts, 2).tolist(), 'z': installments.tolist()}
+
+
+def bisect(func, low, high, tolerance=1e-12, max_iterations=200):
+    ''' Vectorized bisection: roots of increasing func (array -> array) for every pair of
+    bounds low & high (func(low) <= 0 <= func(high)) - all roots are searched at once '''
+    low, high = np.broadcast_arrays(np.asarray(low, dtype=float), np.asarray(high, dtype=float))
+    low, high = low.copy(), high.copy()
+    for _ in range(max_iterations):
+        middle = (low + high) / 2
+        below = func(middle) < 0
+        low = np.where(below, middle, low)
+        high = np.where(below, high, middle)
+        if np.all(high - low <= tolerance):
+            break
+    return (low + high) / 2
+
+
+def _unrounded_installment(amount, rate, n, inst_type):
+    # (first) installment before rounding - increasing with amount & rate, decreasing with n
+    if inst_type == "desc":
+        return amount * (1 / n + rate / 12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(rate == 0, amount / n, (amount * rate) / (12 * (1 - (12/(12+rate)) ** n)))
+
+
+# Inverse solvers: the (first) installment is given, one of the loan parameters is calculated.
+# Arrays are broadcast (e.g. a grid of installments / budgets) and solved at once.
+def max_amount(installment, rate, n, inst_type):
+    ''' Highest loan amount (in full grosz) with the (first) installment not above `installment` '''
+    installment, rate, n = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (installment, rate, n)))
+    # closed form: installment is proportional to the amount; amounts with installment rounded
+    # down to `installment` are allowed - then corrected by grosze where rounding goes the other way
+    per_unit = _unrounded_installment(1., rate, n, inst_type)
+    grosze = np.maximum(np.floor((installment + .005) / per_unit * GROSZ), 0)
+    over = (grosze > 0) & (first_installment(grosze / GROSZ, rate, n, inst_type) > installment)
+    while over.any():
+        grosze = np.where(over, grosze - 1, grosze)
+        over = (grosze > 0) & (first_installment(grosze / GROSZ, rate, n, inst_type) > installment)
+    under = first_installment((grosze + 1) / GROSZ, rate, n, inst_type) <= installment
+    while under.any():
+        grosze = np.where(under, grosze + 1, grosze)
+        under = first_installment((grosze + 1) / GROSZ, rate, n, inst_type) <= installment
+    return grosze / GROSZ
+
+
+def required_term(installment, amount, rate, inst_type):
+    ''' Lowest number of installments with the (first) installment not above `installment`;
+    inf if not possible at any term (installment not higher than the first month interest) '''
+    installment, amount, rate = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (installment, amount, rate)))
+    interest = amount * rate / 12
+    # closed form for installments rounded down to `installment`, then corrected by a month
+    # where rounding goes the other way
+    limit = installment + .005
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if inst_type == "desc":
+            n = amount / (limit - interest)
+        else:
+            n = np.where(rate == 0, amount / limit, -np.log1p(-interest / limit) / np.log1p(rate / 12))
+    possible = (installment > interest) & np.isfinite(n)
+    n = np.where(possible, np.maximum(np.ceil(n - 1e-9), 1), 1)
+    over = possible & (first_installment(amount, rate, n, inst_type) > installment)
+    while over.any():
+        n = np.where(over, n + 1, n)
+        over = possible & (first_installment(amount, rate, n, inst_type) > installment)
+    under = possible & (n > 1) & (first_installment(amount, rate, np.maximum(n - 1, 1), inst_type) <= installment)
+    while under.any():
+        n = np.where(under, n - 1, n)
+        under = possible & (n > 1) & (first_installment(amount, rate, np.maximum(n - 1, 1), inst_type) <= installment)
+    return np.where(possible, n, np.inf)
+
+
+def max_rate(installment, amount, n, inst_type):
+    ''' Highest annual interest rate with the (first) installment not above `installment`;
+    nan if not possible even without interest (installment lower than amount / n) '''
+    installment, amount, n = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (installment, amount, n)))
+    possible = installment * n >= amount
+    if inst_type == "desc":
+        rate = 12 * (installment / amount - 1 / n)
+    else:
+        # annuity installment is higher than the interest alone - 12 * installment / amount bounds the rate
+        rate = bisect(lambda r: _unrounded_installment(amount, r, n, inst_type) - installment,
+                      0., np.where(possible, 12 * installment / amount, 0.))
+    return np.where(possible, np.maximum(rate, 0), np.nan)
+
+
+def apr(amounts, payments, fees=0., guess=.05, tolerance=1e-10, max_iterations=100):
+    ''' Annual percentage rate (RRSO) - annual rate X at which payments (loan x month, month k paid
+    k/12 years after the payout) discounted with (1 + X) ** (-k/12) are equal to the amount paid out
+    (amount less up-front fees); nan if nothing is paid out or paid back. Newton steps for all loans
+    at once - loans stop being calculated when they converge. Discounted payments are a convex,
+    decreasing function of X, so after the first step Newton approaches the root from below and
+    only the lower bound (X > -1) has to be guarded by bisection '''
+    payments = np.asarray(payments, dtype=float)
+    single = payments.ndim == 1
+    payments = np.atleast_2d(payments)
+    paid_out = np.broadcast_to(np.asarray(amounts, dtype=float) - np.asarray(fees, dtype=float), payments.shape[:1])
+    years = np.arange(1, payments.shape[1] + 1) / 12
+    rate = np.array(np.broadcast_to(np.asarray(guess, dtype=float), paid_out.shape))
+    valid = (paid_out > 0) & (payments.sum(axis=1) > 0)
+    active = np.flatnonzero(valid)
+    low = -.99
+    for _ in range(max_iterations):
+        if not active.size:
+            break
+        flows = payments[active] * np.exp(-years * np.log1p(rate[active])[:, None])
+        value = flows.sum(axis=1) - paid_out[active]
+        derivative = -(flows @ years) / (1 + rate[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new_rate = rate[active] - value / derivative
+        new_rate = np.where(new_rate > low, new_rate, (rate[active] + low) / 2)
+        converged = np.abs(new_rate - rate[active]) <= tolerance * (1 + np.abs(new_rate))
+        rate[active] = new_rate
+        active = active[~converged]
+    rate[~valid] = np.nan
+    return rate[0] if single else rate
+
+
+def _balance_before_extra(amount, principal, extra):
+    # As _balance_before, with extra payments (overpayments) subtracted after principal of each month
+    balance = np.empty(2 * len(principal))
+    balance[0] = amount
+    balance[1::2] = principal
+    balance[2::2] = extra[:-1]
+    return np.subtract.accumulate(balance, out=balance)[::2]
+
+
+def _segment(balance, rate, months, inst_type, level, extra=None):
+    # Consecutive months of the schedule starting with the given balance, with installment (fixed)
+    # or principal part (desc) kept at the given level and optional extra payments made after
+    # each month. Returns balance (at the beginning of each month), installment, interest and
+    # principal - balance going below 0 is not corrected here
+    if kernels.BACKEND != "numpy":
+        return kernels.segment(balance, rate, months, inst_type == "fixed", level, extra)
+    if extra is None:
+        balance_before = _balance_before
+    else:
+        balance_before = lambda amount, principal: _balance_before_extra(amount, principal, extra[-len(principal):])
+    if inst_type == "desc":
+        principal = np.full(months, float(level))
+        # balance decreases by the same principal part every month
+        balance = balance_before(balance, principal)
+        interest = round2(balance * rate / 12)
+        return balance, principal + interest, interest, principal
+    amount = balance
+    installment = np.full(months, float(level))
+    # Closed-form annuity balance (without rounding) is a starting point...
+    if rate:
+        growth = (1 + rate / 12) ** np.arange(months)
+        balance = amount * growth - level * (growth - 1) / (rate / 12)
+    else:
+        balance = amount - level * np.arange(months, dtype=float)
+    interest = round2(balance * rate / 12)
+    # ...then rounded interest is propagated until it does not change anymore. Months before
+    # the first changed one are already final, so every pass starts from that month
+    principal = installment - interest
+    balance = balance_before(amount, principal)
+    start = 0
+    while True:
+        interest_next = round2(balance[start:] * rate / 12)
+        changed = np.flatnonzero(interest_next != interest[start:])
+        if not changed.size:
+            break
+        start += changed[0]
+        interest[start:] = interest_next[changed[0]:]
+        principal[start:] = installment[start:] - interest[start:]
+        balance[start:] = balance_before(balance[start], principal[start:])
+    return balance, installment, interest, principal
+
+
+def _correct_last(balance, installment, interest, principal):
+    # Last installment is corrected, so that the balance does not go below 0 - following months are zeroed.
+    # Returns ending balance and index of the month in which the loan is repaid (None if not corrected)
+    ending_balance = balance - principal
+    overpaid = np.flatnonzero(ending_balance < 0)
+    if not overpaid.size:
+        return ending_balance, None
+    k = overpaid[0]
+    correction = -ending_balance[k]
+    principal[k] -= correction
+    installment[k] -= correction
+    ending_balance[k] = 0
+    for column in (balance, interest, principal, installment, ending_balance):
+        column[k + 1:] = 0
+    return ending_balance, k
+
+
+def schedule_arrays(amount, rate, n, inst_type, first_payment=None, fixed_point=False):
+    ''' Returns dictionary of schedule columns (NumPy arrays) '''
+    if inst_type not in INSTALLMENT_TYPES:
+        raise ValueError(f"Unknown installment type: {inst_type}")
+    if fixed_point:
+        return fixed_point_schedule_arrays(amount, rate, n, inst_type, first_payment)
+    months = np.arange(1, n + 1)
+    if inst_type == "desc":
+        level = round(amount / n, 2)
+    elif first_payment is None:
+        level = first_installment(amount, rate, n, inst_type)
+    else:
+        level = first_payment
+    balance, installment, interest, principal = _segment(amount, rate, n, inst_type, level)
+    ending_balance, _ = _correct_last(balance, installment, interest, principal)
+    return {
+        "Month": months,
+        "Year": (months - 1) // 12 + 1,
+        "Balance": balance.astype(float),
+        "Installment": installment,
+        "Interest": interest,
+        "Principal": principal,
+        "Total Payment": np.cumsum(installment),
+        "Total Interest": np.cumsum(interest),
+        "Total Principal": np.cumsum(principal),
+        "Ending Balance": ending_balance,
+    }
+
+
+def schedule_df(amount, rate, n, inst_type, first_payment=None, fixed_point=False):
+    import pandas as pd
+    # dictionary keeps the order of columns (passing columns= makes pandas much slower)
+    return pd.DataFrame(schedule_arrays(amount, rate, n, inst_type, first_payment, fixed_point))
+
+
+def _to_fixed_point(value, digits):
+    # Decimal value as written (shortest repr of the float) scaled by 10**digits and rounded half up
+    return int(Decimal(repr(float(value))).scaleb(digits).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_grosz(amount):
+    return _to_fixed_point(amount, 2)
+
+
+def to_rate_units(rate):
+    return _to_fixed_point(rate, 8)
+
+
+def installment_level_grosz(amount, rate, n, inst_type):
+    ''' Fixed installment or principal part (desc) in grosz for amount in grosz & rate in RATE_SCALE units.
+    Calculated with decimal arithmetic (once per loan) and rounded half up - the same on every machine '''
+    if inst_type != "fixed" or not rate:
+        # amount / n rounded half up - integer arithmetic is enough
+        return (2 * int(amount) + int(n)) // (2 * int(n))
+    with localcontext() as context:
+        context.prec = 50
+        amount, rate = Decimal(int(amount)), Decimal(int(rate)) / RATE_SCALE
+        if inst_type == "fixed" and rate:
+            level = (amount * rate) / (12 * (1 - (12 / (12 + rate)) ** int(n)))
+        else:
+            level = amount / int(n)
+        return int(level.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _grosz_segment(amount, rate, inst_type, level, balance, installment, interest, principal):
+    # As _segment, in int64 grosz (columns filled in place): interest rounded half up with integer
+    # arithmetic, balance as exact integer sums - recalculated until interest does not change
+    divisor = 12 * RATE_SCALE
+    if amount * rate + divisor > np.iinfo(np.int64).max:
+        raise ValueError("Amount and interest rate too large for the fixed-point mode")
+    months = np.arange(len(balance))
+    if inst_type == "desc":
+        principal.fill(level)
+        np.multiply(months, -level, out=balance)
+        balance += amount
+        np.multiply(balance, rate, out=interest)
+        interest += divisor // 2
+        interest //= divisor
+        np.add(principal, interest, out=installment)
+        return
+    installment.fill(level)
+    monthly_rate = rate / divisor
+    if monthly_rate:
+        growth = (1 + monthly_rate) ** months
+        guess = amount * growth - level * (growth - 1) / monthly_rate
+    else:
+        guess = amount - level * months.astype(float)
+    interest[:] = np.rint(guess)
+    interest *= rate
+    interest += divisor // 2
+    interest //= divisor
+    np.subtract(level, interest, out=principal)
+    balance[0] = 0
+    np.cumsum(principal[:-1], out=balance[1:])
+    np.subtract(amount, balance, out=balance)
+    start = 0
+    while True:
+        interest_next = (balance[start:] * rate + divisor // 2) // divisor
+        changed = np.flatnonzero(interest_next != interest[start:])
+        if not changed.size:
+            break
+        start += changed[0]
+        interest[start:] = interest_next[changed[0]:]
+        principal[start:] = level - interest[start:]
+        paid = np.cumsum(principal[start:-1])
+        balance[start + 1:] = balance[start] - paid
+
+
+def fixed_point_schedule_arrays(amount, rate, n, inst_type, first_payment=None):
+    ''' As schedule_arrays, calculated in int64 grosz (see _grosz_segment) - values in PLN '''
+    amount, rate = to_grosz(amount), to_rate_units(rate)
+    if inst_type == "fixed" and first_payment is not None:
+        level = to_grosz(first_payment)
+    else:
+        level = installment_level_grosz(amount, rate, n, inst_type)
+    # all columns (in the order of SCHEDULE_COLUMNS after Month & Year) in one block of grosz -
+    # converted to PLN with a single division
+    columns = np.empty((len(SCHEDULE_COLUMNS) - 2, n), dtype=np.int64)
+    balance, installment, interest, principal, total_payment, total_interest, total_principal, ending_balance = columns
+    _grosz_segment(amount, rate, inst_type, level, balance, installment, interest, principal)
+    ending_balance[:], _ = _correct_last(balance, installment, interest, principal)
+    np.cumsum(interest, out=total_interest)
+    np.cumsum(principal, out=total_principal)
+    np.add(total_interest, total_principal, out=total_payment)
+    months = np.arange(1, n + 1)
+    result = {"Month": months, "Year": (months - 1) // 12 + 1}
+    result.update(zip(SCHEDULE_COLUMNS[2:], columns / GROSZ))
+    return result
+
+
+def recurring_overpayments(amount, start, every=1, end=None, n=600):
+    # The same overpayment every `every` months from month `start` until month `end` (or `n`) - {month: amount}
+    return {month: amount for month in range(start, (end or n) + 1, every)}
+
+
+def merge_overpayments(*overpayments):
+    merged = {}
+    for events in overpayments:
+        for month, amount in events.items():
+            merged[month] = merged.get(month, 0) + amount
+    return merged
+
+
+def installment_level(balance, rate, months_left, inst_type):
+    # Installment (fixed) or principal part (desc) paying off the balance in the remaining months
+    if inst_type == "desc":
+        return round(balance / months_left, 2)
+    return first_installment(balance, rate, months_left, inst_type)
+
+
+def overpayment_schedule_arrays(amount, rate, n, inst_type, overpayments, strategy="shorten", first_payment=None, base=None, base_overpayments=None):
+    ''' Returns schedule (dictionary of arrays) with overpayments: {month: amount} paid together with
+    the installment of the month. Strategy "shorten" keeps the installment (the loan ends earlier),
+    "lower" keeps the end date (installment is recalculated after every overpayment).
+    Only the tail of the schedule from the first affected month is calculated - earlier months are
+    taken from `base`: schedule of the same loan with `base_overpayments` (e.g. without overpayments,
+    or previous result when only some overpayments are edited) '''
+    if strategy not in OVERPAYMENT_STRATEGIES:
+        raise ValueError(f"Unknown overpayment strategy: {strategy}")
+    overpayments = {int(month): amount for month, amount in overpayments.items() if 1 <= int(month) <= n and amount > 0}
+    base_overpayments = base_overpayments or {}
+    if base is None:
+        base, base_overpayments = schedule_arrays(amount, rate, n, inst_type, first_payment), {}
+    changed = [month for month in set(overpayments) | set(base_overpayments) if overpayments.get(month) != base_overpayments.get(month)]
+    if not changed:
+        # the same columns as with overpayments (base may be a schedule without them)
+        return {column: base[column] if column in base else np.zeros(len(base["Month"])) for column in OVERPAYMENT_COLUMNS}
+    # Months before the first changed overpayment are the same as in the base schedule
+    start = min(min(changed) - 1, len(base["Month"]))
+    prefix = {column: base[column][:start] for column in base}
+    prefix.setdefault("Overpayment", np.zeros(start))
+    if inst_type == "desc":
+        level = round(amount / n, 2)
+    else:
+        level = first_installment(amount, rate, n, inst_type) if first_payment is None else first_payment
+    earlier = [month for month in overpayments if month <= start]
+    if strategy == "lower" and earlier:
+        last = max(earlier)
+        level = installment_level(base["Ending Balance"][last - 1], rate, n - last, inst_type)
+    balance = base["Ending Balance"][start - 1] if start else amount
+    # Tail calculated in one go - or, if installment is recalculated after overpayments ("lower"),
+    # segment by segment between consecutive overpayments
+    extra = np.zeros(n)
+    for month, value in overpayments.items():
+        extra[month - 1] = value
+    if strategy == "lower":
+        segment_ends = sorted(m for m in overpayments if m > start) + [n]
+    else:
+        segment_ends = [n]
+    segments = []
+    position = start
+    for month in segment_ends:
+        if balance <= 0 or position >= n:
+            break
+        columns = _segment(balance, rate, month - position, inst_type, level, extra[position:month])
+        ending_balance = columns[0] - columns[3]
+        # overpayment cannot exceed the balance left to pay
+        overpayment = np.where(ending_balance > 0, np.minimum(extra[position:month], ending_balance), 0.)
+        ending_balance = ending_balance - overpayment
+        repaid = np.flatnonzero(ending_balance <= 0)
+        if repaid.size:
+            k = repaid[0]
+            columns = [c[:k + 1] for c in columns]
+            _correct_last(*columns)
+            segments.append(columns + [overpayment[:k + 1], np.r_[ending_balance[:k], 0.]])
+            break
+        segments.append(list(columns) + [overpayment, ending_balance])
+        balance, position = ending_balance[-1], month
+        if strategy == "lower" and position < n:
+            level = installment_level(balance, rate, n - position, inst_type)
+    tail = [np.concatenate([segment[i] for segment in segments]) if segments else np.zeros(0) for i in range(6)]
+    balance, installment, interest, principal, overpayment, ending_balance = tail
+    months = np.arange(start + 1, start + len(balance) + 1)
+
+    def running_total(column, values):
+        # continued from the last total of the prefix - the same result as summing the whole column
+        initial = prefix[column][-1] if start else 0.
+        return np.cumsum(np.r_[initial, values])[1:]
+
+    tail = {
+        "Month": months,
+        "Year": (months - 1) // 12 + 1,
+        "Balance": balance,
+        "Installment": installment,
+        "Interest": interest,
+        "Principal": principal,
+        "Overpayment": overpayment,
+        "Total Payment": running_total("Total Payment", installment + overpayment),
+        "Total Interest": running_total("Total Interest", interest),
+        "Total Principal": running_total("Total Principal", principal + overpayment),
+        "Ending Balance": ending_balance,
+    }
+    return {column: np.concatenate([prefix[column], tail[column]]) for column in OVERPAYMENT_COLUMNS}
+
+
+def overpayment_schedule_df(amount, rate, n, inst_type, overpayments, strategy="shorten", first_payment=None):
+    import pandas as pd
+    return pd.DataFrame(overpayment_schedule_arrays(amount, rate, n, inst_type, overpayments, strategy, first_payment))
+
+
+def rate_path(n, rates, resets=None):
+    ''' Returns interest rate of each of n months. Rates are given as a single value, values of consecutive
+    months (the last one is kept until the end) or values applied from reset months: list of months
+    (1-based, increasing) or number of months between resets, e.g. rate_path(360, [.06, .065, .07], resets=6) '''
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    if not rates.size:
+        raise ValueError("Rate path is empty")
+    if resets is None:
+        return np.r_[rates[:n], np.full(max(n - len(rates), 0), rates[-1])]
+    if np.ndim(resets) == 0:
+        resets = np.arange(len(rates)) * int(resets) + 1
+    resets = np.asarray(resets, dtype=int)
+    if len(resets) != len(rates):
+        raise ValueError("Every reset month needs a rate")
+    if resets[0] < 1 or np.any(np.diff(resets) <= 0):
+        raise ValueError("Reset months have to be increasing, starting from 1")
+    index = np.searchsorted(resets, np.arange(1, n + 1), side="right") - 1
+    return rates[np.maximum(index, 0)]
+
+
+def _rate_path_guess(amount, rates, starts, lengths, n):
+    # Balance (not rounded) of a loan re-annuitized at every rate change: within a segment the balance
+    # follows the annuity over the remaining months, so balances at resets are a product of ratios
+    monthly = rates[starts] / 12
+    remaining = n - starts
+    offset = np.arange(n) - np.repeat(starts, lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_all = (1 + monthly) ** remaining
+        ratio = np.where(monthly > 0, (growth_all - (1 + monthly) ** lengths) / (growth_all - 1), 1 - lengths / remaining)
+        segment_balance = amount * np.r_[1., np.cumprod(ratio[:-1])]
+        monthly, remaining, growth_all = (np.repeat(values, lengths) for values in (monthly, remaining, growth_all))
+        within = np.where(monthly > 0, (growth_all - (1 + monthly) ** offset) / (growth_all - 1), 1 - offset / remaining)
+    return np.repeat(segment_balance, lengths) * within
+
+
+def rate_path_schedule_arrays(amount, bank_rate, base_rates, n, inst_type, resets=None):
+    ''' Returns schedule (dictionary of arrays) for a base rate (WIBOR / WIRON) changing over time,
+    see rate_path. Fixed installment is recalculated at every rate change for the remaining months,
+    descending installments keep the principal part. Whole schedule is calculated at once - rounded
+    installments and interest are propagated until they do not change (as in _segment) '''
+    if inst_type not in INSTALLMENT_TYPES:
+        raise ValueError(f"Unknown installment type: {inst_type}")
+    rates = bank_rate + rate_path(n, base_rates, resets)
+    months = np.arange(1, n + 1)
+    if inst_type == "desc":
+        principal = np.full(n, round(amount / n, 2))
+        balance = _balance_before(amount, principal)
+        interest = round2(balance * rates / 12)
+        installment = principal + interest
+    elif kernels.BACKEND != "numpy":
+        balance, installment, interest, principal = kernels.rate_path(amount, rates, True, 0.)
+    else:
+        starts = np.flatnonzero(np.r_[True, rates[1:] != rates[:-1]])
+        lengths = np.diff(np.r_[starts, n])
+        start_rates = rates[starts]
+        # the same formula as first_installment, with the part not depending on balance calculated once
+        with np.errstate(divide='ignore'):
+            denominator = np.where(start_rates == 0, n - starts, 12 * (1 - (12 / (12 + start_rates)) ** (n - starts)))
+        numerator_rates = np.where(start_rates == 0, 1., start_rates)
+
+        def levels(segment):
+            return round2(balance[starts[segment:]] * numerator_rates[segment:] / denominator[segment:])
+
+        balance = _rate_path_guess(amount, rates, starts, lengths, n)
+        interest = round2(balance * rates / 12)
+        level = levels(0)
+        installment = np.repeat(level, lengths)
+        principal = installment - interest
+        balance = _balance_before(amount, principal)
+        start = 0
+        while True:
+            # months before `start` are final - installments of segments starting later may change
+            segment = np.searchsorted(starts, start)
+            interest_next = round2(balance[start:] * rates[start:] / 12)
+            level_next = levels(segment)
+            changed_interest = interest_next != interest[start:]
+            changed_level = level_next != level[segment:]
+            if not (changed_interest.any() or changed_level.any()):
+                break
+            interest[start:] = interest_next
+            level[segment:] = level_next
+            start = min(start + changed_interest.argmax() if changed_interest.any() else n,
+                        starts[segment + changed_level.argmax()] if changed_level.any() else n)
+            installment[start:] = np.repeat(level, lengths)[start:]
+            principal[start:] = installment[start:] - interest[start:]
+            balance[start:] = _balance_before(balance[start], principal[start:])
+    ending_balance, _ = _correct_last(balance, installment, interest, principal)
+    return {
+        "Month": months,
+        "Year": (months - 1) // 12 + 1,
+        "Interest Rate": rates,
+        "Balance": balance,
+        "Installment": installment,
+        "Interest": interest,
+        "Principal": principal,
+        "Total Payment": np.cumsum(installment),
+        "Total Interest": np.cumsum(interest),
+        "Total Principal": np.cumsum(principal),
+        "Ending Balance": ending_balance,
+    }
+
+
+def rate_path_schedule_df(amount, bank_rate, base_rates, n, inst_type, resets=None):
+    import pandas as pd
+    return pd.DataFrame(rate_path_schedule_arrays(amount, bank_rate, base_rates, n, inst_type, resets))
+
+
+def bucket_edges(n, bucket=12):
+    # Months at which buckets start (+ end of the last one): bucket size (12 - year, 3 - quarter)
+    # or custom list of months closing consecutive buckets, e.g. [24, 60, 360]
+    if np.ndim(bucket) == 0:
+        edges = np.arange(0, n, int(bucket))
+    else:
+        edges = np.r_[0, np.asarray(bucket, dtype=int)]
+        edges = edges[edges < n]
+    return np.r_[edges, n]
+
+
+def aggregate_arrays(amount, rate, n, inst_type, first_payment=None, bucket=12, monthly=None):
+    ''' Returns schedule totals per bucket of months (year, quarter or custom) - sums of the
+    monthly schedule (rounded every month), so totals are the same as in the monthly schedule.
+    The monthly schedule (arrays or data frame) is calculated unless passed '''
+    if monthly is None:
+        monthly = schedule_arrays(amount, rate, n, inst_type, first_payment)
+    monthly = {column: np.asarray(monthly[column]) for column in SCHEDULE_COLUMNS}
+    edges = bucket_edges(n, bucket)
+    start, end = edges[:-1], edges[1:]
+    result = {
+        "Period": np.arange(1, len(start) + 1),
+        "Start Month": start + 1,
+        "End Month": end,
+        "Balance": round2(monthly["Balance"][start]),
+    }
+    # values in grosz with float noise (sums, balances) are rounded
+    result.update((column, round2(np.add.reduceat(monthly[column], start))) for column in ("Installment", "Interest", "Principal"))
+    result.update((column, round2(monthly[column][end - 1])) for column in ("Total Payment", "Total Interest", "Total Principal", "Ending Balance"))
+    return result
+
+
+def yearly_schedule_df(amount, rate, n, inst_type, first_payment=None, monthly=None):
+    import pandas as pd
+    data = aggregate_arrays(amount, rate, n, inst_type, first_payment, bucket=12, monthly=monthly)
+    data["Year"] = data["Period"]
+    return pd.DataFrame({column: data[column] for column in ["Year"] + AGGREGATE_COLUMNS})
+
+
+def reference_schedule_df(amount, rate, n, inst_type, first_payment=None):
+    ''' Original month-by-month loop - used for checks & benchmarks only '''
+    import pandas as pd
+    if first_payment is None:
+        first_payment = first_installment(amount, rate, n, inst_type)
+    data = []
+    total_pay = 0
+    total_interest = 0
+    total_principal = 0
+    for i in range(0, n):
+        month = i + 1
+        year = (month - 1) // 12 + 1
+        if month == 1:
+            balance = amount
+        else:
+            balance = amount_after_payment
+        interest = round(balance * rate / 12, 2)
+        if inst_type == "desc":
+            principal = round(amount / n, 2)
+            installment = principal + interest
+        if inst_type == "fixed":
+            installment = first_payment
+            principal = installment - interest
+        amount_after_payment = balance - principal
+        if amount_after_payment < 0:
+            correction = -amount_after_payment
+            amount_after_payment = 0
+            principal -= correction
+            installment -= correction
+        total_pay += installment
+        total_interest += interest
+        total_principal += principal
+        data.append([month, year, balance, installment, interest, principal, total_pay, total_interest, total_principal, amount_after_payment])
+    return pd.DataFrame(data=data, columns=SCHEDULE_COLUMNS)
+
+
+def reference_rate_path_df(amount, rates, inst_type):
+    ''' Month-by-month loop for a rate changing every month (rates: one value per month) -
+    fixed installment is recalculated whenever the rate changes. Used for checks & benchmarks only '''
+    import pandas as pd
+    n = len(rates)
+    data = []
+    total_pay = 0
+    total_interest = 0
+    total_principal = 0
+    balance = amount
+    for i in range(0, n):
+        month = i + 1
+        year = (month - 1) // 12 + 1
+        rate = float(rates[i])
+        if inst_type == "fixed" and (i == 0 or rate != rates[i - 1]):
+            installment_fixed = first_installment(balance, rate, n - i, inst_type)
+        interest = round(balance * rate / 12, 2)
+        if inst_type == "desc":
+            principal = round(amount / n, 2)
+            installment = principal + interest
+        if inst_type == "fixed":
+            installment = installment_fixed
+            principal = installment - interest
+        amount_after_payment = balance - principal
+        if amount_after_payment < 0:
+            correction = -amount_after_payment
+            amount_after_payment = 0
+            principal -= correction
+            installment -= correction
+        total_pay += installment
+        total_interest += interest
+        total_principal += principal
+        data.append([month, year, rate, balance, installment, interest, principal, total_pay, total_interest, total_principal, amount_after_payment])
+        balance = amount_after_payment
+    return pd.DataFrame(data=data, columns=RATE_PATH_COLUMNS)
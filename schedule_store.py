@@ -0,0 +1,97 @@
+''' This file contains server-side store of schedules (data frames).
+Instead of shipping whole data frames as JSON to the browser (and back
+with every dependent callback), dcc.Store components hold only a short
+reference: content-addressed key of the schedule kept in the application
+cache in a compact binary columnar form. Missing schedule (e.g. expired)
+is recalculated from the source saved within the reference - references
+come back from the browser, so the source is validated (registered
+producer, checked arguments) and the result is stored only if it matches
+the key.
+The mode can be switched off with MORTGAGE_SERVER_SIDE_STORE=0 - data
+frames are then stored as JSON, as before.'''
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+from app_cache import cache, cache_ready
+
+SERVER_SIDE_STORE = os.environ.get('MORTGAGE_SERVER_SIDE_STORE', '1') == '1'
+
+KEY_PATTERN = re.compile(r'schedule:[0-9a-f]{20}')
+
+# Functions used to recalculate schedules missing in the cache: name -> (function(*args) returning data frame,
+# function(args) raising ValueError if arguments are not valid)
+producers = {}
+
+
+def register(name, func, check):
+    producers[name] = (func, check)
+
+
+def content_key(blob):
+    return 'schedule:' + hashlib.sha1(blob).hexdigest()[:20]
+
+
+def pack(df):
+    # Header (columns, dtypes, rows) followed by raw bytes of every column
+    header = json.dumps({'columns': list(df.columns), 'dtypes': [str(dt) for dt in df.dtypes], 'rows': len(df)}).encode()
+    columns = [np.ascontiguousarray(df[column].to_numpy()).tobytes() for column in df.columns]
+    return len(header).to_bytes(4, 'little') + header + b''.join(columns)
+
+
+def unpack(blob):
+    import pandas as pd  # imported on first use (faster start of the application)
+    header_len = int.from_bytes(blob[:4], 'little')
+    header = json.loads(blob[4:4 + header_len])
+    data = {}
+    offset = 4 + header_len
+    for column, dtype in zip(header['columns'], header['dtypes']):
+        values = np.frombuffer(blob, dtype=dtype, count=header['rows'], offset=offset)
+        data[column] = values
+        offset += values.nbytes
+    return pd.DataFrame(data, columns=header['columns'])
+
+
+def is_reference(data):
+    return isinstance(data, dict) and 'key' in data
+
+
+def dump(df, source=None):
+    ''' Returns value to be kept in dcc.Store: reference (server-side mode) or JSON '''
+    if not (SERVER_SIDE_STORE and cache_ready()):
+        return df.to_json(orient='split', date_format='iso')
+    blob = pack(df)
+    key = content_key(blob)
+    cache.set(key, blob)
+    return {'key': key, 'source': source}
+
+
+def load(data):
+    ''' Returns data frame for a value kept in dcc.Store '''
+    if not is_reference(data):
+        import pandas as pd
+        return pd.read_json(data, orient='split')
+    key = data['key']
+    if not isinstance(key, str) or not KEY_PATTERN.fullmatch(key):
+        raise ValueError("Not valid schedule reference")
+    blob = cache.get(key)
+    if blob is not None:
+        return unpack(blob)
+    logging.info("Schedule %s not found in the cache - recalculating", key)
+    source = data.get('source')
+    if not (isinstance(source, list) and len(source) == 2 and source[0] in producers and isinstance(source[1], list)):
+        raise ValueError("Not valid source of schedule reference")
+    func, check = producers[source[0]]
+    check(source[1])
+    df = func(*source[1])
+    blob = pack(df)
+    # content-addressed: a reference with a source not giving this schedule is not stored
+    if content_key(blob) != key:
+        raise ValueError("Schedule reference does not match its source")
+    cache.set(key, blob)
+    return df
@@ -0,0 +1,75 @@
+''' This file contains server-side filtering, sorting and
+pagination of the amortization schedule table (DataTable with
+custom page/sort/filter actions) - only the visible page of rows
+is sent to the browser.'''
+
+import math
+
+# Filter operators of the DataTable filter query (e.g. "{Balance} > 1000") - longest first
+FILTER_OPERATORS = [
+    ('ge ', '>='), ('le ', '<='), ('lt ', '<'), ('gt ', '>'), ('ne ', '!='), ('eq ', '='),
+    ('contains ', None), ('datestartswith ', None),
+]
+# Operators comparing numbers - the value is parsed as a number
+COMPARISON_OPERATORS = ('eq', 'ne', 'lt', 'le', 'gt', 'ge')
+
+
+def split_filter_part(filter_part):
+    # "{column} operator value" -> (column, operator, value); (None, None, None) if not recognized
+    for operators in FILTER_OPERATORS:
+        for operator in operators:
+            if operator is None or operator not in filter_part:
+                continue
+            name_part, value_part = filter_part.split(operator, 1)
+            name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+            operator_name = operators[0].strip()
+            value_part = value_part.strip()
+            if value_part and value_part[0] == value_part[-1] and value_part[0] in ("'", '"', '`'):
+                value = value_part[1:-1]
+            elif operator_name in COMPARISON_OPERATORS:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+            else:
+                # text operators (contains, datestartswith) - value as typed
+                value = value_part
+            return name, operator_name, value
+    return None, None, None
+
+
+def filter_rows(df, filter_query):
+    # Rows matching all parts of the filter query ("... && ...")
+    if not filter_query:
+        return df
+    for filter_part in filter_query.split(' && '):
+        name, operator, value = split_filter_part(filter_part)
+        if name not in df.columns:
+            continue
+        column = df[name]
+        if operator in COMPARISON_OPERATORS:
+            if isinstance(value, str):
+                continue
+            df = df.loc[getattr(column, operator)(value)]
+        elif operator == 'contains':
+            df = df.loc[column.astype(str).str.contains(str(value), regex=False)]
+        elif operator == 'datestartswith':
+            df = df.loc[column.astype(str).str.startswith(str(value))]
+    return df
+
+
+def sort_rows(df, sort_by):
+    columns = [col for col in (sort_by or []) if col['column_id'] in df.columns]
+    if not columns:
+        return df
+    return df.sort_values([col['column_id'] for col in columns],
+                          ascending=[col['direction'] == 'asc' for col in columns], kind='mergesort')
+
+
+def table_page(df, page_current, page_size, sort_by=None, filter_query=None):
+    ''' Returns rows (records) of the requested page after filtering & sorting, and number of pages '''
+    df = sort_rows(filter_rows(df, filter_query), sort_by)
+    page_count = max(math.ceil(len(df) / page_size), 1)
+    page_current = min(page_current or 0, page_count - 1)
+    rows = df.iloc[page_current * page_size: (page_current + 1) * page_size]
+    return rows.round(2).to_dict('records'), page_count
@@ -0,0 +1,77 @@
+''' Tests of coalescing of callback requests (see app_coalesce) on a minimal Flask application '''
+
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import app_coalesce
+
+
+@pytest.fixture()
+def client():
+    server = Flask(__name__)
+    server.release = threading.Event()
+    app_coalesce.init_coalescing(server)
+
+    @server.route('/_dash-update-component', methods=['POST'])
+    def update_component():
+        server.release.wait(5)
+        return "{}"
+
+    yield server.test_client()
+    server.release.set()
+    app_coalesce.latest.clear()
+
+
+def post(client, counter, index=1, tab="tab1"):
+    outputs = {"id": {"type": "row", "index": index}, "property": "children"}
+    body = {"output": '{"index":["MATCH"],"type":"row"}.children', "outputs": outputs, "inputs": []}
+    return client.post('/_dash-update-component', data=json.dumps(body), content_type='application/json',
+                       headers={app_coalesce.TAB_HEADER: f"{tab}.{counter}"}).status_code
+
+
+def post_in_thread(client, statuses, counter, **kwargs):
+    thread = threading.Thread(target=lambda: statuses.__setitem__(counter, post(client, counter, **kwargs)))
+    thread.start()
+    return thread
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(.005)
+
+
+def test_request_with_lower_counter_is_dropped(client):
+    client.application.release.set()
+    assert post(client, 5) == 200
+    assert post(client, 3) == 204
+    assert post(client, 6) == 200
+    assert post(client, 2, tab="tab2") == 200
+    assert not app_coalesce.pending
+
+
+def test_requests_of_other_matched_components_are_not_dropped(client):
+    client.application.release.set()
+    assert post(client, 5, index=1) == 200
+    assert post(client, 4, index=2) == 200
+
+
+def test_only_the_latest_of_concurrent_requests_is_sent(client):
+    statuses = {}
+    running = post_in_thread(client, statuses, 1)
+    wait_until(lambda: any(state['running'] for state in app_coalesce.pending.values()))
+    waiting = post_in_thread(client, statuses, 2)
+    wait_until(lambda: sum(state['requests'] for state in app_coalesce.pending.values()) == 2)
+    latest = post_in_thread(client, statuses, 3)
+    waiting.join(5)
+    assert statuses == {2: 204}
+    client.application.release.set()
+    running.join(5)
+    latest.join(5)
+    assert statuses == {1: 204, 2: 204, 3: 200}
+    assert not app_coalesce.pending
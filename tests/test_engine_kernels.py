@@ -0,0 +1,65 @@
+''' Tests of the engine backends (see engine_kernels) against the month-by-month reference loop '''
+
+import math
+import random
+
+import pytest
+
+import engine_kernels as kernels
+import schedule_engine as engine
+from test_schedule_engine import assert_same, reference_overpayment_df, scenarios
+
+BACKENDS = [pytest.param(name, marks=pytest.mark.skipif(name == "numba" and kernels.NUMBA_VERSION is None,
+                                                        reason="numba not installed"))
+            for name in kernels.BACKENDS]
+
+
+def test_round2_same_as_python_round():
+    rng = random.Random(0)
+    values = [rng.uniform(0, 1e7) for _ in range(20000)] + [i / 8 for i in range(-2000, 20000)]
+    values += [x + d for x in (2315.625, .125, 1.005, 2.675) for d in (0, 1e-13, -1e-13)]
+    for value in values:
+        assert kernels.round2(value) == round(value, 2), value
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        kernels.select_backend("gpu")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_backend_schedule_same_as_reference_loop(backend, inst_type):
+    with kernels.use_backend(backend):
+        for amount, rate, n in scenarios(30, 11):
+            expected = engine.reference_schedule_df(amount, rate, n, inst_type)
+            assert_same(expected, engine.schedule_arrays(amount, rate, n, inst_type), engine.SCHEDULE_COLUMNS)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_backend_rate_path_same_as_reference_loop(backend, inst_type):
+    with kernels.use_backend(backend):
+        for amount, rate, n in scenarios(20, 12):
+            base_rates = [rate, max(0., rate - .01), rate + .015, 0., rate]
+            resets = max(1, math.ceil(n / len(base_rates)))
+            rates = .02 + engine.rate_path(n, base_rates, resets)
+            expected = engine.reference_rate_path_df(amount, rates, inst_type)
+            result = engine.rate_path_schedule_arrays(amount, .02, base_rates, n, inst_type, resets)
+            assert_same(expected, result, engine.RATE_PATH_COLUMNS)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("strategy", engine.OVERPAYMENT_STRATEGIES)
+def test_backend_overpayments_same_as_reference_loop(backend, strategy):
+    with kernels.use_backend(backend):
+        for inst_type in engine.INSTALLMENT_TYPES:
+            for amount, rate, n in scenarios(10, 13):
+                overpayments = engine.recurring_overpayments(float(round(amount * .03, 2)), start=2, every=12, n=n)
+                expected = reference_overpayment_df(amount, rate, n, inst_type, overpayments, strategy)
+                result = engine.overpayment_schedule_arrays(amount, rate, n, inst_type, overpayments, strategy)
+                assert_same(expected, result, engine.OVERPAYMENT_COLUMNS)
+
+
+def test_cross_check_without_mismatches():
+    assert kernels.cross_check(terms=(1, 61, 360), rates=(0, .095), amounts=(123456.78,)) == []
@@ -0,0 +1,95 @@
+''' Tests of the fixed-point (int64 grosz) mode against an integer month-by-month loop and the float engine '''
+
+import numpy as np
+import pytest
+
+import portfolio
+import schedule_engine as engine
+from test_schedule_engine import assert_same, scenarios
+
+
+def reference_grosz_schedule(amount, rate, n, inst_type):
+    # Month-by-month loop in integer grosz: interest rounded half up, balance corrected in the last month
+    amount, rate = engine.to_grosz(amount), engine.to_rate_units(rate)
+    level = engine.installment_level_grosz(amount, rate, n, inst_type)
+    divisor = 12 * engine.RATE_SCALE
+    rows = []
+    balance = amount
+    for _ in range(n):
+        interest = (balance * rate + divisor // 2) // divisor
+        if inst_type == "desc":
+            principal, installment = level, level + interest
+        else:
+            principal, installment = level - interest, level
+        ending_balance = balance - principal
+        if ending_balance < 0:
+            principal += ending_balance
+            installment += ending_balance
+            ending_balance = 0
+        rows.append((balance, installment, interest, principal, ending_balance))
+        balance = ending_balance
+    balance, installment, interest, principal, ending_balance = (np.array(column) for column in zip(*rows))
+    return {
+        "Balance": balance / engine.GROSZ,
+        "Installment": installment / engine.GROSZ,
+        "Interest": interest / engine.GROSZ,
+        "Principal": principal / engine.GROSZ,
+        "Total Payment": np.cumsum(installment) / engine.GROSZ,
+        "Total Interest": np.cumsum(interest) / engine.GROSZ,
+        "Total Principal": np.cumsum(principal) / engine.GROSZ,
+        "Ending Balance": ending_balance / engine.GROSZ,
+    }
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_fixed_point_same_as_integer_loop(inst_type):
+    for amount, rate, n in scenarios(60, 21):
+        expected = reference_grosz_schedule(amount, rate, n, inst_type)
+        assert_same(expected, engine.schedule_arrays(amount, rate, n, inst_type, fixed_point=True), engine.AGGREGATE_COLUMNS)
+
+
+def is_half_grosz(numerator, denominator):
+    # numerator / denominator (grosz) is exactly half a grosz above a whole one (up to a unit of float noise)
+    return abs(numerator % denominator - denominator / 2) <= 1
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_fixed_point_same_as_float_engine_until_exact_tie(inst_type):
+    # Float engine rounds as Python's round (exact ties by float noise / half to even), the fixed-point
+    # mode half up - schedules are the same until the first exact tie (a grosz apart from then on)
+    divisor = 12 * engine.RATE_SCALE
+    for amount, rate, n in scenarios(150, 22):
+        amount_grosz, rate_units = engine.to_grosz(amount), engine.to_rate_units(rate)
+        level = engine.installment_level_grosz(amount_grosz, rate_units, n, inst_type)
+        if inst_type == "desc":
+            float_level = round(amount / n, 2)
+            if engine.to_grosz(float_level) != level:
+                assert is_half_grosz(2 * amount_grosz, 2 * n)
+                continue
+        else:
+            float_level = engine.first_installment(amount, rate, n, inst_type)
+            assert abs(engine.to_grosz(float_level) - level) <= 1
+        float_schedule = engine.schedule_arrays(amount, rate, n, inst_type, float_level)
+        grosz_schedule = engine.schedule_arrays(amount, rate, n, inst_type, float_level, fixed_point=True)
+        differing = np.zeros(n, dtype=bool)
+        for column in ("Balance", "Installment", "Interest", "Principal"):
+            differing |= np.abs(float_schedule[column] - grosz_schedule[column]) > .005
+        if differing.any():
+            month = np.flatnonzero(differing)[0]
+            assert float_schedule["Balance"][month] == pytest.approx(grosz_schedule["Balance"][month], abs=.001)
+            assert is_half_grosz(engine.to_grosz(grosz_schedule["Balance"][month]) * rate_units, divisor)
+
+
+def test_fixed_point_batch_same_as_single_loans():
+    loans = scenarios(40, 23)
+    types = [engine.INSTALLMENT_TYPES[i % 2] for i in range(len(loans))]
+    amounts, rates, terms = (list(values) for values in zip(*loans))
+    arrays = portfolio.batch_schedules(amounts, rates, 0., terms, types, fixed_point=True)
+    for i, (amount, rate, n) in enumerate(loans):
+        expected = engine.schedule_arrays(amount, rate, n, types[i], fixed_point=True)
+        assert_same(expected, {column: arrays[column][i][:n] for column in engine.AGGREGATE_COLUMNS}, engine.AGGREGATE_COLUMNS)
+
+
+def test_fixed_point_overflow():
+    with pytest.raises(ValueError):
+        engine.schedule_arrays(1e15, .2, 12, "fixed", fixed_point=True)
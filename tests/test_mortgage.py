@@ -0,0 +1,27 @@
+''' Tests of the per-instance cache of mortgageData (see mortgage.memoized_property) '''
+
+from mortgage import mortgageData
+
+
+def test_cached_data_is_not_changed_by_callers():
+    mortgage = mortgageData(.02, .0585, 300000, 360, 'fixed')
+    installment = mortgage.df_installments.loc[0, "Installment"]
+    mortgage.df_installments.loc[0, "Installment"] = 0
+    mortgage.paymentSplit_piePlot_fig.update_layout(title="changed")
+    assert mortgage.df_installments.loc[0, "Installment"] == installment
+    assert mortgage.paymentSplit_piePlot_fig.layout.title.text != "changed"
+    assert mortgage.cache_info["misses"] == 2
+
+
+def test_total_interest_rate_setter_invalidates_cache():
+    mortgage = mortgageData(.02, .0585, 300000, 360, 'fixed')
+    installment = mortgage.df_installments.loc[0, "Installment"]
+    mortgage.totalInterestRate = .05
+    assert mortgage.totalInterestRate == .05
+    assert mortgage.df_installments.loc[0, "Installment"] == mortgage.calculate_first_installment() != installment
+    # a change of one of the rates makes the total their sum again
+    mortgage.wiborInterestRate = .0585
+    assert mortgage.totalInterestRate == .05
+    mortgage.bankInterestRate = .03
+    assert mortgage.totalInterestRate == .03 + .0585
+    assert mortgage.df_installments.loc[0, "Installment"] == mortgage.calculate_first_installment()
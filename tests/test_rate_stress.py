@@ -0,0 +1,21 @@
+''' Tests of the base interest stress test (see rate_stress) '''
+
+import numpy as np
+import pytest
+
+import rate_stress
+
+
+@pytest.mark.parametrize("inst_type", ["fixed", "desc"])
+def test_worst_case_is_one_path(inst_type):
+    result = rate_stress.run_stress(300000., .02, 360, inst_type, .0585, n_paths=300, volatility=.02, seed=3,
+                                    percentiles=(0, 100), workers=1)
+    worst = result["worst_case"]
+    # the path with the highest total interest ...
+    assert worst["total_interest"] == result["total_interest"][-1]
+    # ... and its own installments: yearly averages not above its highest installment
+    assert worst["max_installment"] <= result["max_installment"][-1]
+    assert max(worst["installment"]) <= worst["max_installment"]
+    assert np.all(np.array(worst["installment"]) <= np.array(result["installment"][-1]))
+    # installments of the path pay off the amount and its total interest (yearly averages rounded to grosz)
+    assert sum(worst["installment"]) * 12 == pytest.approx(300000. + worst["total_interest"], abs=.01 * 12 * 30)
@@ -0,0 +1,133 @@
+''' Tests of the array-based schedule engine against the month-by-month reference loop '''
+
+import numpy as np
+import pytest
+
+import portfolio
+import schedule_engine as engine
+
+TERMS = (1, 12, 13, 61, 360, 612)
+RATES = (0., .03, .12, .2)
+
+
+def scenarios(count, seed):
+    # Random loans (Python floats, as from the dashboard or the API) - with rate 0 and a single installment
+    rng = np.random.default_rng(seed)
+    loans = [(300000., 0., 360), (300000., .095, 1), (1000., 0., 1)]
+    for _ in range(count):
+        amount = float(round(rng.uniform(1000, 3000000), 2))
+        rate = 0. if rng.random() < .1 else float(round(rng.uniform(.001, .2), 4))
+        loans.append((amount, rate, int(rng.integers(1, portfolio.MAX_TERM + 1))))
+    return loans
+
+
+def assert_same(expected, result, columns):
+    for column in columns:
+        assert np.array_equal(np.asarray(expected[column], dtype=float), np.asarray(result[column], dtype=float)), column
+
+
+def reference_overpayment_df(amount, rate, n, inst_type, overpayments, strategy):
+    # Month-by-month loop with overpayments paid after the installment of the month (capped at the
+    # balance left); "lower" recalculates the installment for the remaining months after each of them
+    import pandas as pd
+    level = round(amount / n, 2) if inst_type == "desc" else engine.first_installment(amount, rate, n, inst_type)
+    data = []
+    total_pay = total_interest = total_principal = 0
+    balance = amount
+    for month in range(1, n + 1):
+        interest = round(balance * rate / 12, 2)
+        if inst_type == "desc":
+            principal = level
+            installment = principal + interest
+        else:
+            installment = level
+            principal = installment - interest
+        ending_balance = balance - principal
+        if ending_balance < 0:
+            principal += ending_balance
+            installment += ending_balance
+            ending_balance = 0.
+        overpayment = min(overpayments.get(month, 0.), ending_balance) if ending_balance > 0 else 0.
+        ending_balance = ending_balance - overpayment
+        total_pay += installment + overpayment
+        total_interest += interest
+        total_principal += principal + overpayment
+        data.append([month, (month - 1) // 12 + 1, balance, installment, interest, principal, overpayment,
+                     total_pay, total_interest, total_principal, ending_balance])
+        if ending_balance <= 0:
+            data[-1][-1] = 0.
+            break
+        if strategy == "lower" and month in overpayments and month < n:
+            level = engine.installment_level(ending_balance, rate, n - month, inst_type)
+        balance = ending_balance
+    return pd.DataFrame(data, columns=engine.OVERPAYMENT_COLUMNS)
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_schedule_arrays_same_as_reference_loop(inst_type):
+    for amount, rate, n in scenarios(60, 1):
+        expected = engine.reference_schedule_df(amount, rate, n, inst_type)
+        assert_same(expected, engine.schedule_arrays(amount, rate, n, inst_type), engine.SCHEDULE_COLUMNS)
+
+
+def test_batch_schedules_same_as_reference_loop():
+    loans = scenarios(60, 2)
+    types = [engine.INSTALLMENT_TYPES[i % 2] for i in range(len(loans))]
+    amounts, rates, terms = (list(values) for values in zip(*loans))
+    # total rate split into bank margin & base rate as in the dashboard
+    arrays = portfolio.batch_schedules(amounts, [min(rate, .02) for rate in rates],
+                                       [rate - min(rate, .02) for rate in rates], terms, types)
+    for i, (amount, rate, n) in enumerate(loans):
+        rate = min(rate, .02) + (rate - min(rate, .02))
+        expected = engine.reference_schedule_df(amount, rate, n, types[i])
+        assert_same(expected, {column: arrays[column][i][:n] for column in engine.AGGREGATE_COLUMNS}, engine.AGGREGATE_COLUMNS)
+        assert not arrays["mask"][i][n:].any()
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+@pytest.mark.parametrize("strategy", engine.OVERPAYMENT_STRATEGIES)
+def test_overpayment_schedule_same_as_reference_loop(inst_type, strategy):
+    rng = np.random.default_rng(3)
+    for amount, rate, n in scenarios(30, 3):
+        overpayments = engine.merge_overpayments(
+            engine.recurring_overpayments(float(round(amount * .02, 2)), start=int(rng.integers(1, n + 1)), every=12, n=n),
+            {int(rng.integers(1, n + 1)): float(round(rng.uniform(0, amount / 2), 2))})
+        expected = reference_overpayment_df(amount, rate, n, inst_type, overpayments, strategy)
+        result = engine.overpayment_schedule_arrays(amount, rate, n, inst_type, overpayments, strategy)
+        assert_same(expected, result, engine.OVERPAYMENT_COLUMNS)
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_overpayment_schedule_without_overpayments_same_as_reference_loop(inst_type):
+    for amount, rate, n in scenarios(10, 4):
+        expected = engine.reference_schedule_df(amount, rate, n, inst_type)
+        assert_same(expected, engine.overpayment_schedule_arrays(amount, rate, n, inst_type, {}), engine.SCHEDULE_COLUMNS)
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+def test_rate_path_schedule_same_as_reference_loop(inst_type):
+    rng = np.random.default_rng(5)
+    for amount, rate, n in scenarios(40, 5):
+        resets = int(rng.choice([1, 3, 6, 12]))
+        base_rates = [max(0., float(round(rate + rng.normal(0, .01), 4))) for _ in range(-(-n // resets))]
+        rates = .02 + engine.rate_path(n, base_rates, resets)
+        expected = engine.reference_rate_path_df(amount, rates, inst_type)
+        result = engine.rate_path_schedule_arrays(amount, .02, base_rates, n, inst_type, resets)
+        assert_same(expected, result, engine.RATE_PATH_COLUMNS)
+
+
+@pytest.mark.parametrize("inst_type", engine.INSTALLMENT_TYPES)
+@pytest.mark.parametrize("n", TERMS)
+@pytest.mark.parametrize("rate", RATES)
+def test_yearly_schedule_sums_monthly_schedule(inst_type, n, rate):
+    monthly = engine.schedule_df(300000., rate, n, inst_type)
+    yearly = engine.yearly_schedule_df(300000., rate, n, inst_type)
+    years = monthly.groupby("Year")
+    assert np.array_equal(yearly["Year"], years.size().index)
+    for column in ("Installment", "Interest", "Principal"):
+        assert np.array_equal(yearly[column], engine.round2(years[column].sum().to_numpy()))
+    for column in ("Total Payment", "Total Interest", "Total Principal", "Ending Balance"):
+        assert np.array_equal(yearly[column], engine.round2(years[column].last().to_numpy()))
+    assert np.array_equal(yearly["Balance"], engine.round2(years["Balance"].first().to_numpy()))
+    # the monthly schedule already calculated gives the same result
+    assert yearly.equals(engine.yearly_schedule_df(300000., rate, n, inst_type, monthly=monthly))
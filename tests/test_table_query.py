@@ -0,0 +1,18 @@
+''' Tests of filtering of the amortization schedule table (see table_query) '''
+
+import schedule_engine as engine
+import table_query
+
+
+def test_split_filter_part():
+    assert table_query.split_filter_part('{Balance} >= 1000') == ('Balance', 'ge', 1000.)
+    assert table_query.split_filter_part('{Year} eq 3') == ('Year', 'eq', 3.)
+    # text operators keep the value as typed
+    assert table_query.split_filter_part('{Year} contains 3') == ('Year', 'contains', '3')
+    assert table_query.split_filter_part('{Year} datestartswith 20') == ('Year', 'datestartswith', '20')
+
+
+def test_filter_rows():
+    df = engine.schedule_df(300000., .07, 360, 'fixed')
+    assert sorted(set(table_query.filter_rows(df, '{Year} contains 3')["Year"])) == [3, 13, 23, 30]
+    assert list(table_query.filter_rows(df, '{Month} > 12 && {Month} le 14')["Month"]) == [13, 14]
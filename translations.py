@@ -0,0 +1,164 @@
+''' This file contains translation table of the dashboard (EN / PL).
+The table is sent to the browser once (dcc.Store 'translations'),
+so that language is switched by clientside callbacks only (see
+language_mod.py and assets/i18n.js):
+- LABELS: texts of components - (component id, property): (EN, PL)
+- TEXTS: texts used in figures & tables - key: (EN, PL). Figures are
+  built with placeholders ({{key}}, see t()) replaced in the browser.'''
+
+# Values of the language selector (lang_sel)
+LANGUAGES = (1, 2)
+
+LABELS = {
+    # Header
+    ('title_main', 'children'): ("Mortgage Calculation & Analysis", "Symulacja Kosztów Kredytu"),
+    # Inputs tab
+    ('title_input', 'children'): ("Input Data", "Dane"),
+    ('loan_amount_label', 'children'): ("Mortgage amount", "Kwota kredytu"),
+    ('mort_duration_label', 'children'): ("Mortgage duration (years + months)", "Czas spłaty (lata i miesiące)"),
+    ('label_no_years', 'children'): ("Provide number of years", "Podaj liczbę lat"),
+    ('label_no_months', 'children'): ("Provide number of months", "Podaj liczbę miesięcy"),
+    ('label_no_total', 'children'): ("Total number of installments", "Całkowita ilość rat"),
+    ('label_inst_type', 'children'): ("Installment type", "Rodzaj raty"),
+    ('installments_type', 'options'): ([{'label': 'Fixed', 'value': 'fixed'}, {'label': 'Descending', 'value': 'desc'}],
+                                       [{'label': 'Stała', 'value': 'fixed'}, {'label': 'Malejąca', 'value': 'desc'}]),
+    ('label_mort_int', 'children'): ("Mortgage total interest", "Oprocentowanie całkowite"),
+    ('bank_interest_inp', 'children'): ("Bank %", "Marża %"),
+    ('WIBOR_interest_inp', 'children'): ("Base  %", "WIBOR/WIRON %"),
+    # Outputs tab - menu
+    ('title_output', 'children'): ("Details of mortgage simulation", "Wyniki symulacji kredytu"),
+    ('overview_tab_label', 'label'): ("Overview", "Podsumowanie"),
+    ('payment_tab_label', 'label'): ("Payment over time", "Struktura płatności"),
+    ('amort_tab_label', 'label'): ("Amortization schedule", "Harmonogram spłaty"),
+    ('wiboreff_tab_label', 'label'): ("Base interest change effect", "Wpływ zmian stopy procentowej"),
+    ('compare_tab_label', 'label'): ("Compare offers", "Porównanie ofert"),
+    ('solver_tab_label', 'label'): ("Affordability", "Zdolność spłaty"),
+    # Output - Overview tab
+    ('kpi_label', 'children'): ("Your Installment per Month:", "Wysokość Twojej miesięcznej raty:"),
+    ('kpi_note', 'children'): ("Please note that for descending installment type, above amount is for 1st installment only.",
+                               "Uwaga! Dla raty stałej powyższa kwota dotyczy tylko pierwszej raty (kolejne maleją)"),
+    ('pie_label', 'children'): ("Payment Breakdown", "Składowe Wpłat"),
+    # Output - Payment over time tab
+    ('pay_label', 'children'): ("Cumulative mortgage payments over time - view by:", "Suma wpłat na spłatę kredytu w czasie jego trwania - widok:"),
+    ('radioitems-payment_scatter', 'options'): ([{"label": "Month", "value": 1}, {"label": "Year", "value": 2}],
+                                                [{"label": "Miesięczny", "value": 1}, {"label": "Roczny", "value": 2}]),
+    # Output - Amortization schedule tab
+    ('amort_label', 'children'): ("Amortization Schedule - view by:", "Harmonogram spłaty kredytu - widok:"),
+    ('radioitems-payment_table', 'options'): ([{"label": "Month", "value": 1}, {"label": "Year", "value": 2}],
+                                              [{"label": "Miesięczny", "value": 1}, {"label": "Roczny", "value": 2}]),
+    # Output - Base interest effect tab
+    ('grid_label', 'children'): ("Heatmap grid - base interest range & number of balance rows:",
+                                 "Siatka wykresu - zakres stopy procentowej i liczba wierszy kwoty do spłaty:"),
+    ('grid_rate_min_inp', 'children'): ("From %", "Od %"),
+    ('grid_rate_max_inp', 'children'): ("To %", "Do %"),
+    ('grid_rate_step_inp', 'children'): ("Step %", "Krok %"),
+    ('grid_rows_inp', 'children'): ("Rows", "Wiersze"),
+    ('wiboreff_mode', 'options'): ([{"label": "Static grid", "value": 1}, {"label": "Stochastic (Monte Carlo)", "value": 2}],
+                                   [{"label": "Siatka", "value": 1}, {"label": "Symulacja (Monte Carlo)", "value": 2}]),
+    ('stress_label', 'children'): ("Simulated base interest paths (mean-reverting) - settings:",
+                                   "Symulowane ścieżki stopy procentowej (powrót do średniej) - ustawienia:"),
+    ('stress_paths_inp', 'children'): ("Paths", "Ścieżki"),
+    ('stress_mean_inp', 'children'): ("Long-term %", "Średnia długoterminowa %"),
+    ('stress_volatility_inp', 'children'): ("Volatility %", "Zmienność %"),
+    ('stress_reset_inp', 'children'): ("Reset (months)", "Zmiana co (miesięcy)"),
+    ('stress_seed_inp', 'children'): ("Seed", "Ziarno"),
+    # Output - Compare offers tab
+    ('offers_label', 'children'): ("Offers for the mortgage amount - bank margin, base interest, term, installment type & one-off fees:",
+                                   "Oferty dla kwoty kredytu - marża, stopa procentowa, liczba rat, rodzaj raty i opłaty jednorazowe:"),
+    ('offers_table', 'columns'): ([{"name": "Offer", "id": "name"}, {"name": "Bank %", "id": "bank_rate", "type": "numeric"},
+                                   {"name": "Base %", "id": "base_rate", "type": "numeric"}, {"name": "Months", "id": "term", "type": "numeric"},
+                                   {"name": "Installment type", "id": "type", "presentation": "dropdown"},
+                                   {"name": "Fees, PLN", "id": "fees", "type": "numeric"}],
+                                  [{"name": "Oferta", "id": "name"}, {"name": "Marża %", "id": "bank_rate", "type": "numeric"},
+                                   {"name": "WIBOR/WIRON %", "id": "base_rate", "type": "numeric"}, {"name": "Liczba rat", "id": "term", "type": "numeric"},
+                                   {"name": "Rodzaj raty", "id": "type", "presentation": "dropdown"},
+                                   {"name": "Opłaty, PLN", "id": "fees", "type": "numeric"}]),
+    ('offers_table', 'dropdown'): ({"type": {"options": [{'label': 'Fixed', 'value': 'fixed'}, {'label': 'Descending', 'value': 'desc'}], "clearable": False}},
+                                   {"type": {"options": [{'label': 'Stała', 'value': 'fixed'}, {'label': 'Malejąca', 'value': 'desc'}], "clearable": False}}),
+    ('offers_add', 'children'): ("Add offer", "Dodaj ofertę"),
+    # Output - Affordability tab
+    ('solver_label', 'children'): ("Calculate for a monthly budget (other values are taken from the input data):",
+                                   "Oblicz dla miesięcznego budżetu (pozostałe wartości z danych kredytu):"),
+    ('solver_target', 'options'): ([{"label": "Maximum loan amount", "value": "amount"}, {"label": "Required number of installments", "value": "term"},
+                                    {"label": "Maximum base interest", "value": "rate"}],
+                                   [{"label": "Maksymalna kwota kredytu", "value": "amount"}, {"label": "Potrzebna liczba rat", "value": "term"},
+                                    {"label": "Maksymalna stopa procentowa", "value": "rate"}]),
+    ('solver_budget_inp', 'children'): ("Budget, PLN", "Budżet, PLN"),
+    ('solver_budget_min_inp', 'children'): ("Chart from", "Wykres od"),
+    ('solver_budget_max_inp', 'children'): ("To", "Do"),
+    ('solver_budget_step_inp', 'children'): ("Step", "Krok"),
+}
+
+TEXTS = {
+    # Pie plot
+    'total_principal': ("Total Principal", "Całkowity kapitał"),
+    'total_interest': ("Total Interest", "Suma odsetek"),
+    # Payment over time
+    'month': ("Month", "Miesiąc"),
+    'year': ("Year", "Rok"),
+    'cumulative_payment': ("Cumulative payment, PLN", "Suma wpłat, PLN"),
+    'balance': ("Balance", "Kapitał do spłaty"),
+    'total_payment': ("Total payment", "Suma wpłat"),
+    'total_principal_paid': ("Total Principal", "Suma spłaconego kapitału"),
+    'hover_balance': ("Balance: ", "Kapitał do spłaty: "),
+    'hover_total_payment': ("Total Payment: ", "Suma wpłat: "),
+    'hover_total_interest': ("Total Interest paid: ", "Suma zapłaconych odsetek: "),
+    'hover_total_principal': ("Total Principal paid: ", "Spłacony kapitał: "),
+    # Amortization schedule - columns
+    'col.Month': ("Month", "Miesiąc"),
+    'col.Year': ("Year", "Rok"),
+    'col.Balance': ("Balance", "Do spłaty"),
+    'col.Installment': ("Installment", "Rata"),
+    'col.Interest': ("Interest", "Odsetki"),
+    'col.Principal': ("Principal", "Kapitał"),
+    'col.Total Payment': ("Total Payment", "Suma wpłat"),
+    'col.Total Interest': ("Total Interest", "Zapłacone odsetki"),
+    'col.Total Principal': ("Total Principal", "Spłacony kapitał"),
+    'col.Ending Balance': ("Ending Balance", "Do spłaty - po"),
+    # Base interest effect - heatmap
+    'heatmap_title': ("Base interest impact on installment value (bank interest:",
+                      "Wpływ wysokości stopy procentowej (WIRON/WIBOR) na ratę kredytu (marża banku:"),
+    'heatmap_xaxis': ("Base interest, %", "Wysokość stopy procentowej (WIRON/WIBOR), %"),
+    'heatmap_yaxis': ("Mortgage balanace to pay", "Kwota pozostała do spłacenia"),
+    'heatmap_legend': ("Installment value", "Wysokość raty"),
+    'hover_base_interest': ("Base interest", "Stopa procentowa (WIRON/WIBOR)"),
+    'hover_principal_left': ("Principal left to pay", "Kapitał do spłacenia"),
+    'hover_installment': ("Installment:", "Rata:"),
+    # Base interest effect - stress test
+    'average_installment': ("Average monthly installment, PLN", "Średnia rata miesięczna, PLN"),
+    'median': ("Median", "Mediana"),
+    'worst_case': ("Worst case", "Najgorszy przypadek"),
+    'highest_installment': ("Highest installment", "Najwyższa rata"),
+    # Compare offers
+    'cumulative_cost': ("Cumulative cost (interest & fees), PLN", "Koszt narastająco (odsetki i opłaty), PLN"),
+    'offer': ("Offer", "Oferta"),
+    'first_installment': ("First installment", "Pierwsza rata"),
+    'fees': ("Fees", "Opłaty"),
+    'total_cost': ("Total cost", "Całkowity koszt"),
+    'vs_best': ("Above the cheapest", "Więcej niż najtańsza"),
+    'apr': ("APR", "RRSO"),
+    # Affordability
+    'solver_result_amount': ("Maximum loan amount for a monthly installment of", "Maksymalna kwota kredytu dla miesięcznej raty"),
+    'solver_result_term': ("Required number of installments for a monthly installment of", "Potrzebna liczba rat dla miesięcznej raty"),
+    'solver_result_rate': ("Maximum base interest for a monthly installment of", "Maksymalna stopa procentowa (WIBOR/WIRON) dla miesięcznej raty"),
+    'solver_impossible': ("Not possible", "Niemożliwe"),
+    'solver_years': ("years", "lat"),
+    'solver_months': ("months", "mies."),
+    'solver_amount': ("Maximum loan amount, PLN", "Maksymalna kwota kredytu, PLN"),
+    'solver_term': ("Number of installments", "Liczba rat"),
+    'solver_rate': ("Maximum base interest, %", "Maksymalna stopa procentowa, %"),
+    'solver_budget': ("Your budget", "Twój budżet"),
+    'solver_budget_axis': ("Monthly installment (budget), PLN", "Miesięczna rata (budżet), PLN"),
+}
+
+
+def t(key):
+    # Placeholder of a text - replaced in the browser with translation of the selected language
+    return "{{" + key + "}}"
+
+
+def translation_table():
+    # {lang: {'labels': values of LABELS (in order), 'texts': {key: text}}}
+    return {lang: {'labels': [values[i] for values in LABELS.values()],
+                   'texts': {key: values[i] for key, values in TEXTS.items()}}
+            for i, lang in enumerate(LANGUAGES)}